@@ -0,0 +1,240 @@
+"""Offline throughput and latency benchmark of the advice endpoints.
+
+Drives the combined service in ``server.py`` in-process with the local model
+stand-in (``LLM_BACKEND=fake``) and reports, per endpoint, the throughput,
+p50/p95/p99 latency, status codes, the process's memory and, in-process,
+the prompt tokens sent per request and the share the model's prefix cache
+served. Runs are
+repeatable with ``--seed``, so a caching or concurrency change can be compared
+with the run before it:
+
+    python bench/advice_endpoints.py --requests 200 --concurrency 32
+    python bench/advice_endpoints.py --unique 10 --error-rate 0.05 --json after.json
+
+``--unique`` sets how many distinct payloads each endpoint cycles through; a
+small number measures the cached path, the default (one per request) the
+uncached one. ``--url`` sends the same load to a running ``server.py``
+instead; start that with ``LLM_BACKEND=fake`` to keep it offline.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+
+import httpx
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+OCCUPATIONS = ("Tailoring", "Dairy Farming", "Kirana Store", "Poultry", "Handloom Weaving", "Mobile Repair",
+               "Street Food", "Beekeeping")
+LOCATIONS = ("Cuttack", "Pune", "Jaipur", "Madurai", "Patna", "Guwahati", "Nashik", "Mysuru")
+STATES = ("Odisha", "Maharashtra", "Rajasthan", "Tamil Nadu", "Bihar", "Assam", "Karnataka", "Kerala")
+GOALS = ("Buy a sewing machine", "Expand the shop", "Pay for school fees", "Repay a moneylender",
+         "Build an emergency fund", "Buy two more cows")
+QUERY_TYPES = ("business_advice", "savings", "loan", "government_schemes", "investment", "insurance", "general")
+SCHEMES = ("Pradhan Mantri Mudra Yojana", "Stand-Up India", "PM SVANidhi", "Kisan Credit Card",
+           "Atal Pension Yojana", "Rural Self Employment Training Institute", "Solar Pump Subsidy")
+
+
+def _pick(options, i: int, salt: int = 0):
+    return options[(i * 7 + salt) % len(options)]
+
+
+def advanced_query(i: int) -> dict:
+    return {
+        "query_type": _pick(QUERY_TYPES, i),
+        "question": f"I run {_pick(OCCUPATIONS, i, 1).lower()} in {_pick(LOCATIONS, i, 2)} "
+                    f"and want to {_pick(GOALS, i, 3).lower()}; how much should I put aside each month?",
+        "monthly_income": 6000 + 750 * i,
+        "location": _pick(LOCATIONS, i, 2),
+        "age": 22 + i % 40,
+        "family_size": 2 + i % 5,
+    }
+
+
+def profile(i: int) -> dict:
+    return {
+        "name": f"User {i}", "age": 22 + i % 40, "location": _pick(LOCATIONS, i, 2), "preferred_language": "English",
+        "monthly_income": 6000 + 750 * i, "family_size": 2 + i % 5, "business_type": _pick(OCCUPATIONS, i, 1),
+        "existing_savings": 2000 + 500 * i, "financial_goal": _pick(GOALS, i, 3),
+        "risk_tolerance": _pick(("low", "medium", "high"), i),
+    }
+
+
+def scheme_user(i: int) -> dict:
+    return {"age": 20 + i % 45, "income": 50000 + 9000 * i, "state": _pick(STATES, i, 4),
+            "occupation": _pick(OCCUPATIONS, i, 1), "category": _pick(("General", "OBC", "SC", "ST"), i)}
+
+
+def scheme_name(i: int) -> dict:
+    return {"scheme_name": f"{_pick(SCHEMES, i)}" + (f" ({_pick(STATES, i, 4)})" if i >= len(SCHEMES) else "")}
+
+
+# Endpoint name -> (path on server.py, payload for the i-th distinct request)
+ENDPOINTS = {
+    "get-advice": ("/get-advice", advanced_query),
+    "get-financial-advice": ("/basic/get-financial-advice", profile),
+    "financial-advice": ("/fy/api/financial-advice", profile),
+    "recommend-scheme": ("/gov/api/recommend-scheme", scheme_user),
+    "scheme-details": ("/gov/api/scheme-details", scheme_name),
+}
+
+
+def configure_offline(args) -> None:
+    """Environment for the in-process service; must run before ``server`` is imported"""
+    os.environ.update({
+        "LLM_BACKEND": "fake",
+        "FAKE_LLM_TTFT_SECONDS": str(args.ttft),
+        "FAKE_LLM_TOKENS_PER_SECOND": str(args.tokens_per_second),
+        "FAKE_LLM_PREFILL_TOKENS_PER_SECOND": str(args.prefill_tokens_per_second),
+        "FAKE_LLM_OUTPUT_TOKENS": str(args.output_tokens),
+        "FAKE_LLM_ERROR_RATE": str(args.error_rate),
+        "FAKE_LLM_SEED": str(args.seed),
+        # The quota is not what is being measured unless asked for
+        "LLM_RPM": str(args.rpm),
+        "LLM_TPM": str(args.rpm * 10000),
+        "LLM_QUEUE_LIMIT": str(max(64, args.concurrency * 4)),
+    })
+    # No state carried over from earlier runs or a developer's .env
+    os.environ.setdefault("LLM_CACHE_PATH", "")
+    os.environ.setdefault("SESSION_SPILL_DIR", "")
+    os.environ.setdefault("PRECOMPUTED_ADVICE_PATH", os.path.join(ROOT, "bench", ".no-precomputed.db"))
+    sys.path.insert(0, ROOT)
+
+
+def percentile(ordered: list, q: float) -> float:
+    if not ordered:
+        return float("nan")
+    return ordered[min(len(ordered) - 1, max(0, round(q * len(ordered)) - 1))]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+async def drive(client: httpx.AsyncClient, path: str, payload_for, args) -> dict:
+    latencies = []
+    statuses = {}
+    next_index = iter(range(args.requests))
+
+    async def worker():
+        for i in next_index:
+            payload = payload_for(i % args.unique)
+            start = time.perf_counter()
+            try:
+                response = await client.post(path, json=payload)
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": args.requests,
+        "seconds": elapsed,
+        "throughput": args.requests / elapsed,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "mean": statistics.fmean(latencies),
+        "statuses": statuses,
+    }
+
+
+async def run(args) -> dict:
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=None)
+    else:
+        import server
+
+        transport = httpx.ASGITransport(app=server.app)
+        client = httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None)
+
+    results = {}
+    async with client:
+        for name in args.endpoints:
+            path, payload_for = ENDPOINTS[name]
+            if args.tracemalloc:
+                tracemalloc.start()
+            tokens_before = prompt_token_totals(args)
+            result = await drive(client, path, payload_for, args)
+            if not args.url:
+                result["peak_rss_mb"] = peak_rss_mb()
+                sent, cached = (after - before for after, before in zip(prompt_token_totals(args), tokens_before))
+                result["prompt_tokens_per_request"] = sent / args.requests
+                result["cached_prompt_share"] = cached / sent if sent else 0.0
+            if args.tracemalloc:
+                result["peak_heap_mb"] = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+                tracemalloc.stop()
+            results[name] = result
+            report(name, result)
+    return results
+
+
+def prompt_token_totals(args) -> tuple:
+    """Prompt tokens sent to the model so far, and how many of them it had cached"""
+    if args.url:
+        return 0.0, 0.0
+    from common.metrics import registry
+
+    return registry.total("llm_prompt_tokens_total"), registry.total("llm_cached_prompt_tokens_total")
+
+
+def report(name: str, result: dict) -> None:
+    statuses = " ".join(f"{code}:{count}" for code, count in sorted(result["statuses"].items()))
+    memory = ""
+    if "peak_rss_mb" in result:
+        memory += f"  rss {result['peak_rss_mb']:.0f} MB"
+    if "peak_heap_mb" in result:
+        memory += f"  heap {result['peak_heap_mb']:.1f} MB"
+    if "prompt_tokens_per_request" in result:
+        memory += (f"  prompt {result['prompt_tokens_per_request']:.0f} tok/req"
+                   f" ({result['cached_prompt_share']:.0%} cached)")
+    print(f"{name:>21}: {result['throughput']:7.1f} req/s  p50 {result['p50'] * 1000:7.0f} ms  "
+          f"p95 {result['p95'] * 1000:7.0f} ms  p99 {result['p99'] * 1000:7.0f} ms  [{statuses}]{memory}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--endpoints", nargs="+", choices=list(ENDPOINTS), default=list(ENDPOINTS))
+    parser.add_argument("--requests", type=int, default=100, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=16, help="requests in flight per endpoint")
+    parser.add_argument("--unique", type=int, default=0, help="distinct payloads per endpoint (default: all)")
+    parser.add_argument("--ttft", type=float, default=0.3, help="fake model seconds to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=200, help="fake model output speed")
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=4000,
+                        help="fake model prompt reading speed; uncached prompt tokens add to time to first token")
+    parser.add_argument("--output-tokens", type=int, default=300, help="median fake answer length")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of fake model calls that fail")
+    parser.add_argument("--rpm", type=float, default=100000, help="scheduler requests-per-minute budget")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--tracemalloc", action="store_true", help="also report the peak Python heap (slower)")
+    parser.add_argument("--url", help="benchmark a running server.py instead of an in-process one")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+    args.unique = args.unique or args.requests
+
+    if not args.url:
+        configure_offline(args)
+    print(f"{args.requests} requests per endpoint, concurrency {args.concurrency}, "
+          f"{args.unique} distinct payloads" + ("" if args.url else f", fake model ttft {args.ttft:g}s "
+                                                f"at {args.tokens_per_second:g} tok/s, error rate {args.error_rate:g}"))
+    results = asyncio.run(run(args))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
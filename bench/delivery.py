@@ -0,0 +1,181 @@
+"""Bytes on the wire and server CPU per request for pages and advice JSON.
+
+Calls the combined service in ``server.py`` directly over ASGI, in-process
+and with the local model stand-in, so the CPU time measured is the
+server's own and not an HTTP client's. For every case it reports the
+response bytes sent, CPU milliseconds per request and wall milliseconds per
+request. Cases:
+
+- the home page fetched without compression, with gzip, with brotli (when
+  installed) and revalidated with its ETag (a 304);
+- the same page served the way it was before, read from disk per request by
+  ``FileResponse``, for comparison;
+- cached advice JSON from ``/fy/api/financial-advice`` with and without gzip,
+  for one repeated profile (the compressed body is reused) and for distinct
+  names (every body compressed afresh).
+
+    python bench/delivery.py --requests 500
+    python bench/delivery.py --json delivery.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+PROFILE = {
+    "name": "Sunita",
+    "age": 34,
+    "location": "Puri",
+    "preferred_language": "English",
+    "monthly_income": 12000,
+    "family_size": 4,
+    "business_type": "Tailoring",
+    "existing_savings": 20000,
+    "financial_goal": "Buy a second sewing machine",
+    "risk_tolerance": "low",
+}
+
+
+def configure_offline() -> None:
+    """Environment for the in-process service; must run before ``server`` is imported"""
+    os.environ.update({
+        "LLM_BACKEND": "fake",
+        "FAKE_LLM_TTFT_SECONDS": "0",
+        "FAKE_LLM_TOKENS_PER_SECOND": "1000000",
+        "FAKE_LLM_PREFILL_TOKENS_PER_SECOND": "0",
+        "FAKE_LLM_SEED": "1",
+        "LLM_RPM": "1000000",
+        "LLM_TPM": "10000000000",
+    })
+    os.environ.setdefault("LLM_CACHE_PATH", "")
+    os.environ.setdefault("SESSION_SPILL_DIR", "")
+    os.environ.setdefault("PRECOMPUTED_ADVICE_PATH", os.path.join(ROOT, "bench", ".no-precomputed.db"))
+    sys.path.insert(0, ROOT)
+
+
+async def call(app, method: str, path: str, headers: dict, body: bytes = b"") -> tuple:
+    """(status, headers, body bytes) of one request sent straight to an ASGI app"""
+    if body:
+        headers = dict(headers, **{"content-length": str(len(body))})
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+        "client": ("127.0.0.1", 1234), "server": ("bench", 80),
+    }
+    sent = {"body": []}
+    received = False
+
+    async def receive():
+        nonlocal received
+        if received:
+            await asyncio.sleep(3600)
+        received = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            sent["status"] = message["status"]
+            sent["headers"] = {name.decode().lower(): value.decode() for name, value in message["headers"]}
+        elif message["type"] == "http.response.body":
+            sent["body"].append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return sent["status"], sent["headers"], b"".join(sent["body"])
+
+
+async def measure(app, requests: int, method: str, path: str, headers: dict, body_for) -> dict:
+    statuses = {}
+    size = 0
+    cpu = time.process_time()
+    wall = time.perf_counter()
+    for i in range(requests):
+        status, _, body = await call(app, method, path, headers, body_for(i))
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+        size += len(body)
+    wall = time.perf_counter() - wall
+    cpu = time.process_time() - cpu
+    return {
+        "bytes_per_response": size / requests,
+        "cpu_ms_per_request": cpu * 1000 / requests,
+        "wall_ms_per_request": wall * 1000 / requests,
+        "statuses": statuses,
+    }
+
+
+def file_per_request_app(path: str):
+    """The home page as it used to be served, read from disk on every request"""
+    from fastapi import FastAPI
+    from fastapi.responses import FileResponse
+
+    app = FastAPI()
+
+    @app.get("/")
+    async def read_root():
+        return FileResponse(path)
+
+    return app
+
+
+async def run(args) -> dict:
+    import server
+    from common.compression import ENCODINGS
+
+    app = server.app
+    no_body = lambda i: b""
+    _, page_headers, _ = await call(app, "GET", "/", {"accept-encoding": "gzip"})
+    cases = [
+        ("page, file per request (before)", file_per_request_app(
+            os.path.join(ROOT, "financial-advisor", "static", "index.html")), "GET", "/", {}, no_body),
+        ("page, identity", app, "GET", "/", {}, no_body),
+        ("page, gzip", app, "GET", "/", {"accept-encoding": "gzip"}, no_body),
+    ]
+    if "br" in ENCODINGS:
+        cases.append(("page, br", app, "GET", "/", {"accept-encoding": "br, gzip"}, no_body))
+    cases.append(("page, revalidated (304)", app, "GET", "/",
+                  {"accept-encoding": "gzip", "if-none-match": page_headers["etag"]}, no_body))
+
+    same = json.dumps(PROFILE).encode()
+    distinct = lambda i: json.dumps({**PROFILE, "name": f"{PROFILE['name']} {i}"}).encode()
+    json_headers = {"content-type": "application/json"}
+    # Warm the advice cache so the cases measure delivery, not generation
+    await call(app, "POST", "/fy/api/financial-advice", json_headers, same)
+    for label, encoding in (("identity", None), ("gzip", "gzip")):
+        headers = dict(json_headers, **({"accept-encoding": encoding} if encoding else {}))
+        cases.append((f"advice JSON, {label}", app, "POST", "/fy/api/financial-advice", headers, lambda i: same))
+        cases.append((f"advice JSON, {label}, distinct names", app, "POST", "/fy/api/financial-advice",
+                      headers, distinct))
+
+    results = {}
+    for name, target, method, path, headers, body_for in cases:
+        await measure(target, min(20, args.requests), method, path, headers, body_for)
+        results[name] = result = await measure(target, args.requests, method, path, headers, body_for)
+        report(name, result)
+    return results
+
+
+def report(name: str, result: dict) -> None:
+    statuses = " ".join(f"{code}:{count}" for code, count in sorted(result["statuses"].items()))
+    print(f"{name:>38}: {result['bytes_per_response']:8.0f} B  cpu {result['cpu_ms_per_request']:6.3f} ms"
+          f"  wall {result['wall_ms_per_request']:6.3f} ms  [{statuses}]")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=300, help="requests per case")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+    configure_offline()
+    print(f"{args.requests} requests per case; bytes are the response body as sent")
+    results = asyncio.run(run(args))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Load test showing that concurrent advice requests overlap.
+
+Swaps the Gemini model for a stand-in that blocks for a fixed time, fires a
+batch of concurrent requests at both FastAPI apps in-process and reports the
+wall time and the peak number of model calls running at once.
+
+    python bench/load_test_async.py --requests 20 --latency 0.5
+"""
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import httpx
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "financial-advisor")
+sys.path.insert(0, APP_DIR)
+os.environ.setdefault("GEMINI_API_KEY", "offline-load-test")
+
+
+class SlowModel:
+    """Blocking model stand-in that tracks how many calls overlap"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, **kwargs):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            time.sleep(self.latency)
+        finally:
+            with self._lock:
+                self.active -= 1
+        return type("Response", (), {"text": "offline advice"})()
+
+
+ADVANCED_PAYLOAD = {"query_type": "savings", "question": "How do I save on daily wages?"}
+PROFILE_PAYLOAD = {
+    "name": "Asha", "age": 32, "location": "Cuttack", "preferred_language": "English",
+    "monthly_income": 12000, "family_size": 4, "business_type": "Tailoring",
+    "existing_savings": 5000, "financial_goal": "Buy a sewing machine", "risk_tolerance": "low",
+}
+
+
+async def run(module, path: str, payload: dict, args) -> None:
+    from common.llm_client import AsyncLLMClient
+
+    slow = SlowModel(args.latency)
+    module.llm = AsyncLLMClient(slow, max_concurrency=args.concurrency)
+    transport = httpx.ASGITransport(app=module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as client:
+        start = time.perf_counter()
+        responses = await asyncio.gather(*(client.post(path, json=payload) for _ in range(args.requests)))
+        elapsed = time.perf_counter() - start
+
+    ok = sum(r.status_code == 200 for r in responses)
+    serial = args.requests * args.latency
+    print(f"{module.__name__}{path}: {ok}/{args.requests} ok in {elapsed:.2f}s "
+          f"(serial would be {serial:.2f}s), peak overlapping model calls: {slow.peak}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per fake model call")
+    parser.add_argument("--concurrency", type=int, default=8, help="LLM concurrency limit")
+    args = parser.parse_args()
+
+    # The apps resolve static files relative to their own directory
+    os.chdir(APP_DIR)
+    import advanced_financial_advisor
+    import financial_advisor
+
+    asyncio.run(run(advanced_financial_advisor, "/get-advice", ADVANCED_PAYLOAD, args))
+    asyncio.run(run(financial_advisor, "/get-financial-advice", PROFILE_PAYLOAD, args))
+
+
+if __name__ == "__main__":
+    main()
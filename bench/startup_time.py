@@ -0,0 +1,66 @@
+"""Cold-start time of the combined ASGI service.
+
+Starts a fresh interpreter for every run, imports ``server`` and serves a
+first request to each mounted app in-process, then reports the median import
+and ready times. The ``eager`` variant imports the Gemini SDK and NumPy up
+front, as every app used to at import time, for comparison:
+
+    python bench/startup_time.py --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+PROBE = r"""
+import json, sys, time, warnings
+warnings.simplefilter("ignore")
+started = time.perf_counter()
+if sys.argv[1] == "eager":
+    import google.generativeai, numpy
+import server
+imported = time.perf_counter()
+
+import asyncio, httpx
+
+async def first_requests():
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        for path in ("/healthz", "/supported-query-types", "/basic/business-types",
+                     "/fy/api/business-types", "/gov/api/scheme-suggest?q=mudra"):
+            response = await client.get(path)
+            assert response.status_code == 200, (path, response.status_code)
+
+asyncio.run(first_requests())
+ready = time.perf_counter()
+print(json.dumps({"import": imported - started, "ready": ready - started}))
+"""
+
+
+def measure(variant: str) -> dict:
+    env = dict(os.environ, GEMINI_API_KEY=os.environ.get("GEMINI_API_KEY", "offline-startup-test"))
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE, variant], cwd=ROOT, env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    for variant in ("lazy", "eager"):
+        samples = [measure(variant) for _ in range(args.runs)]
+        imported = statistics.median(sample["import"] for sample in samples)
+        ready = statistics.median(sample["ready"] for sample in samples)
+        print(f"{variant:>5}: import {imported * 1000:.0f} ms, first responses from all apps {ready * 1000:.0f} ms "
+              f"(median of {args.runs})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Static pages loaded and precompressed once, then served from memory.
+
+``AssetStore`` reads every file of a directory (or the listed ones) at
+startup and keeps each text file with its gzip and, when available, brotli
+encodings, compressed at the highest setting since that cost is paid only
+once. Responses carry an ETag and ``Cache-Control``. A browser that
+revalidates with ``If-None-Match`` gets an empty 304, so a returning user
+on mobile data downloads a page only when it has changed.
+"""
+import hashlib
+import mimetypes
+import os
+from email.utils import formatdate
+from typing import Dict, Iterable, Optional, Tuple
+
+from common.compression import ENCODINGS, compressible, encode, negotiate
+from common.metrics import registry
+
+STATIC_CACHE_CONTROL = os.getenv("STATIC_CACHE_CONTROL", "public, max-age=600")
+
+registry.describe("static_responses_total", "Static files served from memory, by status and encoding")
+
+
+class Asset:
+    """One file, with its precompressed encodings"""
+
+    __slots__ = ("path", "content_type", "digest", "last_modified", "bodies")
+
+    def __init__(self, path: str, body: bytes, content_type: str, modified: float):
+        self.path = path
+        self.content_type = content_type
+        self.digest = hashlib.sha1(body).hexdigest()[:20]
+        self.last_modified = formatdate(modified, usegmt=True)
+        self.bodies: Dict[Optional[str], bytes] = {None: body}
+        if compressible(content_type):
+            for encoding in ENCODINGS:
+                compressed = encode(body, encoding, best=True)
+                # Tiny files can grow when compressed
+                if len(compressed) < len(body):
+                    self.bodies[encoding] = compressed
+
+    def etag(self, encoding: Optional[str]) -> str:
+        # Each encoding is a different representation, so it gets its own tag
+        return f'"{self.digest}-{encoding}"' if encoding else f'"{self.digest}"'
+
+    def not_modified(self, if_none_match: Optional[str], encoding: Optional[str]) -> bool:
+        """Whether a client holding one of the ``If-None-Match`` tags already has this representation"""
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        # Weak comparison, as If-None-Match calls for: a W/ prefix is ignored, the tag must match exactly
+        etag = self.etag(encoding)
+        return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+    def select(self, accept_encoding: Optional[str]) -> Tuple[Optional[str], bytes]:
+        """(encoding, body) to send to a client with this ``Accept-Encoding``"""
+        encoding = negotiate(accept_encoding, [name for name in ENCODINGS if name in self.bodies])
+        return encoding, self.bodies[encoding]
+
+    def respond(self, accept_encoding: Optional[str], if_none_match: Optional[str]) -> Tuple[int, dict, bytes]:
+        """(status, headers, body) of a GET for this file"""
+        encoding, body = self.select(accept_encoding)
+        headers = {
+            "ETag": self.etag(encoding),
+            "Cache-Control": STATIC_CACHE_CONTROL,
+            "Last-Modified": self.last_modified,
+        }
+        if len(self.bodies) > 1:
+            headers["Vary"] = "Accept-Encoding"
+        if self.not_modified(if_none_match, encoding):
+            registry.inc("static_responses_total", status="304", encoding=encoding or "identity")
+            return 304, headers, b""
+        headers["Content-Type"] = self.content_type
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        registry.inc("static_responses_total", status="200", encoding=encoding or "identity")
+        return 200, headers, body
+
+
+class AssetStore:
+    """The files under ``directory``, or just ``names`` in it, held in memory"""
+
+    def __init__(self, directory: str, names: Optional[Iterable[str]] = None):
+        self.directory = directory
+        self.assets: Dict[str, Asset] = {}
+        if names is None:
+            names = [
+                os.path.relpath(os.path.join(root, name), directory).replace(os.sep, "/")
+                for root, _, files in os.walk(directory) for name in files
+            ]
+        for name in names:
+            self.load(name)
+
+    def load(self, name: str) -> Asset:
+        path = os.path.join(self.directory, name)
+        with open(path, "rb") as f:
+            body = f.read()
+        content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        if content_type.startswith("text/"):
+            content_type += "; charset=utf-8"
+        asset = self.assets[name] = Asset(name, body, content_type, os.path.getmtime(path))
+        return asset
+
+    def get(self, name: str) -> Optional[Asset]:
+        return self.assets.get(name)
+
+    def stats(self) -> dict:
+        return {
+            "files": len(self.assets),
+            "bytes": sum(len(asset.bodies[None]) for asset in self.assets.values()),
+        }
+
+
+def asset_response(asset: Optional[Asset], request):
+    """Starlette response for ``asset`` answering ``request``; a plain 404 when there is no such file"""
+    from starlette.responses import Response
+
+    if asset is None:
+        return Response(status_code=404)
+    status, headers, body = asset.respond(request.headers.get("accept-encoding"),
+                                          request.headers.get("if-none-match"))
+    if status == 200:
+        headers["Content-Length"] = str(len(body))
+    return Response(content=b"" if request.method == "HEAD" else body, status_code=status, headers=headers)
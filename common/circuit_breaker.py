@@ -0,0 +1,128 @@
+"""Circuit breaker for model calls.
+
+Tracks the outcome and latency of recent calls. When too many of them fail or
+run slow, the breaker opens and further calls are refused at once with
+``CircuitOpen`` so the apps can answer from local data instead of tying up
+worker threads on a dead upstream. After a cooldown one probe call is let
+through; if it succeeds the breaker closes again.
+"""
+import os
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+from common.llm_client import Overloaded
+from common.metrics import registry
+
+BREAKER_WINDOW = int(os.getenv("BREAKER_WINDOW", "20"))
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "10"))
+BREAKER_ERROR_RATE = float(os.getenv("BREAKER_ERROR_RATE", "0.5"))
+BREAKER_SLOW_SECONDS = float(os.getenv("BREAKER_SLOW_SECONDS", "20"))
+BREAKER_SLOW_RATE = float(os.getenv("BREAKER_SLOW_RATE", "0.5"))
+BREAKER_COOLDOWN_SECONDS = float(os.getenv("BREAKER_COOLDOWN_SECONDS", "30"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpen(Overloaded):
+    """Raised instead of calling the model while the breaker is open"""
+
+    def __init__(self, retry_after: float):
+        super().__init__("The advice model is temporarily unavailable", 503, retry_after)
+
+
+class CircuitBreaker:
+    """Closed -> open on too many failed or slow calls -> half-open after the cooldown"""
+
+    def __init__(self, window: int = BREAKER_WINDOW, min_calls: int = BREAKER_MIN_CALLS,
+                 error_rate: float = BREAKER_ERROR_RATE, slow_seconds: float = BREAKER_SLOW_SECONDS,
+                 slow_rate: float = BREAKER_SLOW_RATE, cooldown: float = BREAKER_COOLDOWN_SECONDS):
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_seconds = slow_seconds
+        self.slow_rate = slow_rate
+        self.cooldown = cooldown
+        # (failed, slow) for the most recent calls
+        self._outcomes = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self.trips = 0
+        self.refused = 0
+
+    def check(self, probe: bool = True) -> None:
+        """Raise CircuitOpen unless a call may go ahead now.
+
+        With ``probe=False`` nothing is reserved; used to refuse requests early.
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            remaining = self._opened_at + self.cooldown - time.monotonic()
+            if self.state == OPEN and remaining <= 0:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self._probing:
+                # Let exactly one call through to test the upstream
+                self._probing = probe
+                return
+            self.refused += 1
+            raise CircuitOpen(max(remaining, 1.0))
+
+    def release(self) -> None:
+        """Give back a probe slot whose call never reached the model"""
+        with self._lock:
+            self._probing = False
+
+    def record(self, failed: bool, elapsed: float) -> None:
+        slow = elapsed >= self.slow_seconds
+        with self._lock:
+            if self.state == HALF_OPEN and self._probing:
+                self._probing = False
+                if failed or slow:
+                    self._open()
+                else:
+                    self.state = CLOSED
+                    self._outcomes.clear()
+                return
+            self._outcomes.append((failed, slow))
+            if self.state == CLOSED and len(self._outcomes) >= self.min_calls:
+                failures = sum(outcome[0] for outcome in self._outcomes) / len(self._outcomes)
+                slow_calls = sum(outcome[1] for outcome in self._outcomes) / len(self._outcomes)
+                if failures >= self.error_rate or slow_calls >= self.slow_rate:
+                    self._open()
+
+    def _open(self) -> None:
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self.trips += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "state": self.state,
+                "trips": self.trips,
+                "refused": self.refused,
+                "recent_calls": len(self._outcomes),
+                "recent_failures": sum(outcome[0] for outcome in self._outcomes),
+                "recent_slow": sum(outcome[1] for outcome in self._outcomes),
+            }
+
+
+_breaker: Optional[CircuitBreaker] = None
+_breaker_lock = threading.Lock()
+
+
+def get_circuit_breaker() -> CircuitBreaker:
+    """Return the process-wide circuit breaker"""
+    global _breaker
+    if _breaker is None:
+        with _breaker_lock:
+            if _breaker is None:
+                _breaker = CircuitBreaker()
+                breaker = _breaker
+                registry.register_stats("llm_breaker", lambda: {**breaker.stats(), "open": breaker.state != CLOSED})
+    return _breaker
@@ -0,0 +1,165 @@
+"""Response compression for clients on slow or metered connections.
+
+``negotiate`` picks the encoding to send from a request's ``Accept-Encoding``:
+brotli when the optional ``brotli`` package is installed and the client
+accepts it, then gzip. ``compress_flask`` and ``CompressionMiddleware`` (for
+the FastAPI apps) compress complete responses of a text type that are at
+least ``COMPRESS_MIN_BYTES`` long; smaller bodies gain less than the
+encoding costs. Streams such as Server-Sent Events are passed through
+untouched, so their events still arrive as they are written.
+
+Identical bodies are common, since many answers come from the caches, so
+the compressed bytes of recent bodies are kept and reused instead of being
+compressed again.
+"""
+import gzip
+import os
+from functools import lru_cache
+from typing import Optional
+
+from common.metrics import registry, stage
+
+try:
+    import brotli
+except ImportError:
+    # Optional; without it only gzip is offered
+    brotli = None
+
+# Bodies shorter than this are sent as they are
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+# Per-request levels trade a little size for CPU; static files are compressed once at the highest
+COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))
+COMPRESS_BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", "5"))
+# Recently compressed bodies kept for reuse
+COMPRESS_CACHE_ENTRIES = int(os.getenv("COMPRESS_CACHE_ENTRIES", "256"))
+
+BROTLI = "br"
+GZIP = "gzip"
+# In order of preference
+ENCODINGS = (BROTLI, GZIP) if brotli is not None else (GZIP,)
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "image/svg+xml", "application/xml")
+
+registry.describe("http_compressed_responses_total", "Responses sent compressed, by encoding")
+registry.describe("http_compression_input_bytes_total", "Bytes of the responses compressed, before compression")
+registry.describe("http_compression_output_bytes_total", "Bytes of the responses compressed, as sent")
+
+
+def negotiate(accept_encoding: Optional[str], available=ENCODINGS) -> Optional[str]:
+    """The preferred encoding in ``available`` that ``accept_encoding`` allows, or None for identity"""
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    for encoding in available:
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def compressible(content_type: Optional[str]) -> bool:
+    content_type = (content_type or "").lower()
+    return content_type.startswith(COMPRESSIBLE_TYPES) and not content_type.startswith("text/event-stream")
+
+
+def encode(body: bytes, encoding: str, best: bool = False) -> bytes:
+    """``body`` compressed with ``encoding``; ``best`` uses the slowest, smallest setting"""
+    if encoding == BROTLI:
+        return brotli.compress(body, quality=11 if best else COMPRESS_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=9 if best else COMPRESS_GZIP_LEVEL, mtime=0)
+
+
+@lru_cache(maxsize=COMPRESS_CACHE_ENTRIES)
+def _encode_cached(body: bytes, encoding: str) -> bytes:
+    return encode(body, encoding)
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """``body`` compressed for one response, reusing the result for a body seen recently"""
+    with stage("compress"):
+        compressed = _encode_cached(body, encoding)
+    registry.inc("http_compressed_responses_total", encoding=encoding)
+    registry.inc("http_compression_input_bytes_total", len(body), encoding=encoding)
+    registry.inc("http_compression_output_bytes_total", len(compressed), encoding=encoding)
+    return compressed
+
+
+def should_compress(status: int, content_type: Optional[str], content_encoding: Optional[str],
+                    length: Optional[int]) -> bool:
+    return (200 <= status < 300 and status != 204 and not content_encoding and compressible(content_type)
+            and length is not None and length >= COMPRESS_MIN_BYTES)
+
+
+def compress_flask(app) -> None:
+    """Compress a Flask app's large non-streamed responses; call after ``instrument_flask`` so it is timed"""
+    from flask import request
+
+    @app.after_request
+    def _compress(response):
+        if (response.is_streamed or response.direct_passthrough or request.method == "HEAD"
+                or not should_compress(response.status_code, response.content_type,
+                                       response.headers.get("Content-Encoding"), response.content_length)):
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = negotiate(request.headers.get("Accept-Encoding"))
+        if encoding is not None:
+            response.set_data(compress(response.get_data(), encoding))
+            response.headers["Content-Encoding"] = encoding
+        return response
+
+
+class CompressionMiddleware:
+    """ASGI counterpart of ``compress_flask``; add it before ``instrument_fastapi`` so it is timed"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        from starlette.datastructures import Headers, MutableHeaders
+
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding"))
+        start = None
+        parts = []
+
+        async def send_compressed(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=message["headers"])
+                length = headers.get("content-length")
+                if not should_compress(message["status"], headers.get("content-type"),
+                                       headers.get("content-encoding"), int(length) if length else None):
+                    await send(message)
+                    return
+                headers.add_vary_header("Accept-Encoding")
+                if encoding is None:
+                    await send(message)
+                    return
+                # Held back until the whole body is in and its compressed length is known
+                start = message
+                return
+            if start is None or message["type"] != "http.response.body":
+                await send(message)
+                return
+            parts.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            body = compress(b"".join(parts), encoding)
+            headers = MutableHeaders(raw=start["headers"])
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,191 @@
+"""Rule-based scheme eligibility engine.
+
+Scheme rules from the catalog are laid out as NumPy columns so a lookup is a
+handful of vectorized comparisons over every scheme at once instead of a
+model round trip.
+"""
+from __future__ import annotations
+
+import os
+import re
+import threading
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+from common.lazy_import import lazy_import
+from common.scheme_catalog import SchemeCatalog, detect_state, get_scheme_catalog
+
+# Loaded on first use; see common/lazy_import.py
+np = lazy_import("numpy")
+
+# Below this confidence the caller should fall back to the LLM
+ELIGIBILITY_MIN_CONFIDENCE = float(os.getenv("ELIGIBILITY_MIN_CONFIDENCE", "0.5"))
+
+# Occupation keywords -> IncomeSource values used by the catalog
+OCCUPATION_SOURCES = {
+    "agriculture": ("farm", "kisan", "agri", "cultivat", "crop", "paddy", "horticult"),
+    "livestock": ("dairy", "poultry", "goat", "cattle", "livestock", "fish", "piggery", "sheep"),
+    "small_business": ("shop", "business", "vendor", "retail", "store", "trader", "hawker", "entrepreneur"),
+    "handicrafts": ("artisan", "weaver", "craft", "potter", "tailor", "carpenter", "handloom"),
+    "daily_wage": ("labour", "labor", "worker", "wage", "construction", "helper", "driver"),
+}
+
+# Score weights; a perfect match sums to 1.0
+OCCUPATION_WEIGHT = 0.5
+SOURCE_WEIGHT = 0.3
+STATE_WEIGHT = 0.1
+GROUP_WEIGHT = 0.1
+UNKNOWN_GROUP_PENALTY = 0.2
+
+# Weakest match served while the model is unavailable. It is above what state and group hits
+# add up to, so an occupation or income-source hit is needed
+DEGRADED_MIN_CONFIDENCE = STATE_WEIGHT + GROUP_WEIGHT + 0.05
+
+
+def _as_number(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+@lru_cache(maxsize=4096)
+def occupation_sources(occupation: str) -> frozenset:
+    """Map a free-text occupation onto catalog income sources"""
+    text = occupation.lower()
+    return frozenset(
+        source for source, keywords in OCCUPATION_SOURCES.items()
+        if any(keyword in text for keyword in keywords)
+    )
+
+
+class EligibilityTable:
+    """Columnar view of the catalog's eligibility rules"""
+
+    def __init__(self, catalog: SchemeCatalog):
+        self.catalog = catalog
+        schemes = list(catalog.schemes.values())
+        self.ids = [scheme["id"] for scheme in schemes]
+        rules = [scheme["eligibility"] for scheme in schemes]
+
+        self.min_age = np.array([r.get("min_age") or 0 for r in rules], dtype=np.float64)
+        self.max_age = np.array([r.get("max_age") or np.inf for r in rules], dtype=np.float64)
+        self.max_income = np.array([
+            (r["max_monthly_income"] * 12) if r.get("max_monthly_income") else (r.get("max_annual_income") or np.inf)
+            for r in rules
+        ], dtype=np.float64)
+
+        self.states = sorted({state for scheme in schemes for state in scheme["states"]})
+        self.state_specific = np.array([bool(scheme["states"]) for scheme in schemes])
+        self.state_matrix = self._matrix(schemes, self.states, lambda scheme: scheme["states"])
+
+        self.sources = sorted(OCCUPATION_SOURCES)
+        self.source_matrix = self._matrix(schemes, self.sources, lambda scheme: scheme["income_sources"])
+
+        self.occupations = sorted({term for r in rules for term in r.get("occupations", [])})
+        self.occupation_matrix = self._matrix(schemes, self.occupations, lambda scheme: scheme["eligibility"].get("occupations", []))
+
+        self.groups = sorted({group for r in rules for group in r.get("social_categories", [])} | {"women"})
+        self.group_matrix = self._matrix(
+            schemes, self.groups,
+            lambda scheme: scheme["eligibility"].get("social_categories", []) + (["women"] if scheme["eligibility"].get("women") else []),
+        )
+        self.group_restricted = self.group_matrix.any(axis=1)
+
+    @staticmethod
+    def _matrix(schemes, vocabulary, values) -> np.ndarray:
+        index = {term: i for i, term in enumerate(vocabulary)}
+        matrix = np.zeros((len(schemes), len(vocabulary)), dtype=bool)
+        for row, scheme in enumerate(schemes):
+            for term in values(scheme):
+                if term in index:
+                    matrix[row, index[term]] = True
+        return matrix
+
+    def _vector(self, vocabulary, present) -> np.ndarray:
+        return np.array([term in present for term in vocabulary], dtype=bool)
+
+    def score(self, age: Optional[float], annual_income: Optional[float], state: Optional[str],
+              occupation: str, groups: frozenset) -> np.ndarray:
+        """Return a confidence in [0, 1] per scheme, or -1 where the user is ineligible"""
+        eligible = np.ones(len(self.ids), dtype=bool)
+        if age is not None:
+            eligible &= (self.min_age <= age) & (age <= self.max_age)
+        if annual_income is not None:
+            eligible &= annual_income <= self.max_income
+
+        state_hit = self.state_matrix[:, self.states.index(state)] if state in self.states else np.zeros(len(self.ids), dtype=bool)
+        eligible &= ~self.state_specific | state_hit
+
+        occupation_text = occupation.lower()
+        occupation_hit = (self.occupation_matrix & self._vector(self.occupations, {t for t in self.occupations if t in occupation_text})).any(axis=1)
+        source_hit = (self.source_matrix & self._vector(self.sources, occupation_sources(occupation))).any(axis=1)
+
+        if groups:
+            group_hit = (self.group_matrix & self._vector(self.groups, groups)).any(axis=1)
+            eligible &= ~self.group_restricted | group_hit
+            group_score = np.where(group_hit, GROUP_WEIGHT, 0.0)
+        else:
+            # Unknown caste/gender: keep restricted schemes but rank them lower
+            group_score = np.where(self.group_restricted, -UNKNOWN_GROUP_PENALTY, 0.0)
+
+        scores = (
+            OCCUPATION_WEIGHT * occupation_hit
+            + SOURCE_WEIGHT * source_hit
+            + STATE_WEIGHT * state_hit
+            + group_score
+        )
+        return np.where(eligible, np.clip(scores, 0.0, 1.0), -1.0)
+
+
+class EligibilityEngine:
+    """Answers scheme recommendations locally from the catalog"""
+
+    def __init__(self, min_confidence: float = ELIGIBILITY_MIN_CONFIDENCE):
+        self.min_confidence = min_confidence
+        self._table: Optional[EligibilityTable] = None
+        self._lock = threading.Lock()
+
+    def table(self) -> EligibilityTable:
+        catalog = get_scheme_catalog()
+        table = self._table
+        if table is None or table.catalog is not catalog:
+            with self._lock:
+                if self._table is None or self._table.catalog is not catalog:
+                    self._table = EligibilityTable(catalog)
+                table = self._table
+        return table
+
+    def rank(self, user_data: Dict[str, Any], limit: int = 3):
+        """Return up to ``limit`` (scheme, confidence) pairs, best first"""
+        table = self.table()
+        groups = set()
+        category = str(user_data.get("category") or "").strip().lower()
+        if category and category != "general":
+            groups.add(category)
+        if str(user_data.get("gender") or "").strip().lower() in ("female", "woman", "f"):
+            groups.add("women")
+
+        scores = table.score(
+            age=_as_number(user_data.get("age")),
+            annual_income=_as_number(user_data.get("income")),
+            state=detect_state(str(user_data.get("state") or "")),
+            occupation=re.sub(r"\s+", " ", str(user_data.get("occupation") or "")),
+            groups=frozenset(groups),
+        )
+        # Stable sort keeps catalog order among equal scores
+        order = np.argsort(-scores, kind="stable")[:limit]
+        return [
+            (table.catalog.schemes[table.ids[i]], float(scores[i]))
+            for i in order if scores[i] >= 0
+        ]
+
+    def recommend(self, user_data: Dict[str, Any], min_confidence: Optional[float] = None) -> Optional[dict]:
+        """Best matching scheme in the ``/api/recommend-scheme`` format, or None if not confident"""
+        ranked = self.rank(user_data, limit=1)
+        if not ranked:
+            return None
+        scheme, confidence = ranked[0]
+        if confidence < (self.min_confidence if min_confidence is None else min_confidence):
+            return None
+        return {"scheme_name": scheme["name"], "description": scheme["description"]}
@@ -0,0 +1,226 @@
+"""Local stand-in for the Gemini model, for offline load tests and benchmarks.
+
+Selected with ``LLM_BACKEND=fake``. It answers every call without the
+network, taking ``FAKE_LLM_TTFT_SECONDS`` plus the time to read the prompt
+at ``FAKE_LLM_PREFILL_TOKENS_PER_SECOND`` to the first token, and then
+``FAKE_LLM_TOKENS_PER_SECOND``. Like the API's implicit context caching, it
+remembers the cacheable prefixes of recent compiled prompts: a prompt whose
+prefix it has seen skips reading that part and reports it as cached tokens. Output lengths are drawn from a log-normal
+distribution around ``FAKE_LLM_OUTPUT_TOKENS``. A fraction
+``FAKE_LLM_ERROR_RATE`` of calls fail with the same exception types the API
+raises, so retries and the circuit breaker behave as they would in
+production. Calls that ask for a response schema get a JSON document that
+matches it; other calls get filler prose. Translation batches are answered
+with the same segments tagged with the target language.
+"""
+import math
+import os
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from types import SimpleNamespace
+from typing import Iterator, Optional
+
+from common.prompts import cacheable_prefix
+from common.sessions import estimate_tokens
+
+FAKE_LLM_TTFT_SECONDS = float(os.getenv("FAKE_LLM_TTFT_SECONDS", "0.4"))
+FAKE_LLM_TOKENS_PER_SECOND = float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "80"))
+# Prompt tokens read per second before the first token; 0 makes prompt length free
+FAKE_LLM_PREFILL_TOKENS_PER_SECOND = float(os.getenv("FAKE_LLM_PREFILL_TOKENS_PER_SECOND", "4000"))
+# Distinct prompt prefixes the emulated prefix cache holds; 0 disables it
+FAKE_LLM_PREFIX_CACHE_ENTRIES = int(os.getenv("FAKE_LLM_PREFIX_CACHE_ENTRIES", "256"))
+FAKE_LLM_OUTPUT_TOKENS = int(os.getenv("FAKE_LLM_OUTPUT_TOKENS", "400"))
+# Log-normal sigma of the output length; 0 makes every answer the same length
+FAKE_LLM_OUTPUT_TOKENS_SIGMA = float(os.getenv("FAKE_LLM_OUTPUT_TOKENS_SIGMA", "0.4"))
+FAKE_LLM_ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))
+# Comma-separated failures to pick from: rate_limit, unavailable, timeout
+FAKE_LLM_ERRORS = os.getenv("FAKE_LLM_ERRORS", "unavailable")
+FAKE_LLM_CHUNK_TOKENS = int(os.getenv("FAKE_LLM_CHUNK_TOKENS", "20"))
+FAKE_LLM_SEED = os.getenv("FAKE_LLM_SEED", "")
+
+WORDS = (
+    "savings income budget loan scheme bank account monthly expenses family business market "
+    "insurance interest repayment emergency fund credit village shop stock customers profit "
+    "subsidy training registration documents plan target rupees weekly record"
+).split()
+
+
+def _error(kind: str) -> Exception:
+    try:
+        from google.api_core import exceptions as google_exceptions
+    except ImportError:
+        return TimeoutError("fake timeout") if kind == "timeout" else ConnectionError(f"fake {kind}")
+    if kind == "rate_limit":
+        return google_exceptions.ResourceExhausted("429 Quota exceeded (fake backend)")
+    if kind == "timeout":
+        return google_exceptions.DeadlineExceeded("504 Deadline exceeded (fake backend)")
+    return google_exceptions.ServiceUnavailable("503 The model is overloaded (fake backend)")
+
+
+class FakeResponse:
+    """The parts of a ``GenerateContentResponse`` the apps read"""
+
+    def __init__(self, text: str, prompt_tokens: Optional[int] = None, output_tokens: Optional[int] = None,
+                 cached_tokens: Optional[int] = None):
+        self.text = text
+        self.usage_metadata = SimpleNamespace(prompt_token_count=prompt_tokens, candidates_token_count=output_tokens,
+                                              cached_content_token_count=cached_tokens)
+
+
+class FakeModel:
+    """Offline ``GenerativeModel`` with configurable latency, output length and failures"""
+
+    def __init__(self, model_name: str = "fake", ttft: float = FAKE_LLM_TTFT_SECONDS,
+                 tokens_per_second: float = FAKE_LLM_TOKENS_PER_SECOND,
+                 prefill_tokens_per_second: float = FAKE_LLM_PREFILL_TOKENS_PER_SECOND,
+                 prefix_cache_entries: int = FAKE_LLM_PREFIX_CACHE_ENTRIES,
+                 output_tokens: int = FAKE_LLM_OUTPUT_TOKENS, sigma: float = FAKE_LLM_OUTPUT_TOKENS_SIGMA,
+                 error_rate: float = FAKE_LLM_ERROR_RATE, errors: str = FAKE_LLM_ERRORS,
+                 seed: Optional[int] = int(FAKE_LLM_SEED) if FAKE_LLM_SEED else None):
+        self.model_name = model_name
+        self.ttft = ttft
+        self.tokens_per_second = tokens_per_second
+        self.prefill_tokens_per_second = prefill_tokens_per_second
+        self.prefix_cache_entries = prefix_cache_entries
+        self.output_tokens = output_tokens
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self.errors = [kind.strip() for kind in errors.split(",") if kind.strip()] or ["unavailable"]
+        self.calls = 0
+        self.failures = 0
+        self.tokens = 0
+        self.prefix_hits = 0
+        self.prefix_misses = 0
+        # Hashes of the prefixes seen, least recently used first
+        self._prefixes: OrderedDict = OrderedDict()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _draw(self) -> tuple:
+        # One locked draw per call keeps a seeded run reproducible under concurrency
+        with self._lock:
+            self.calls += 1
+            failure = self._random.choice(self.errors) if self._random.random() < self.error_rate else None
+            tokens = max(1, round(self.output_tokens * math.exp(self._random.gauss(0, self.sigma)
+                                                                - self.sigma ** 2 / 2)))
+            seed = self._random.getrandbits(32)
+            if failure:
+                self.failures += 1
+            else:
+                self.tokens += tokens
+        return failure, tokens, random.Random(seed)
+
+    def _cached_tokens(self, prompt) -> int:
+        """Tokens of ``prompt`` served from the emulated prefix cache; the prefix is cached for next time"""
+        prefix = cacheable_prefix(prompt)
+        if not prefix or self.prefix_cache_entries <= 0:
+            return 0
+        key = hash(prefix)
+        with self._lock:
+            if key in self._prefixes:
+                self._prefixes.move_to_end(key)
+                self.prefix_hits += 1
+                return estimate_tokens(prefix)
+            self.prefix_misses += 1
+            self._prefixes[key] = True
+            if len(self._prefixes) > self.prefix_cache_entries:
+                self._prefixes.popitem(last=False)
+        return 0
+
+    def generate_content(self, prompt, stream: bool = False, generation_config=None, **kwargs):
+        failure, tokens, rng = self._draw()
+        schema = (generation_config or {}).get("response_schema") if isinstance(generation_config, dict) else None
+        if isinstance(prompt, str) and prompt.startswith("Translate "):
+            text = _translation(prompt)
+            tokens = estimate_tokens(text)
+        else:
+            text = _document(schema, tokens, rng) if schema else _prose(tokens, rng)
+        prompt_tokens = estimate_tokens(prompt if isinstance(prompt, str) else str(prompt))
+        cached_tokens = self._cached_tokens(prompt)
+        ttft = self.ttft
+        if self.prefill_tokens_per_second > 0:
+            ttft += (prompt_tokens - cached_tokens) / self.prefill_tokens_per_second
+        if stream:
+            return self._stream(text, failure, ttft)
+        time.sleep(ttft)
+        if failure:
+            raise _error(failure)
+        time.sleep(tokens / self.tokens_per_second)
+        return FakeResponse(text, prompt_tokens, tokens, cached_tokens)
+
+    def _stream(self, text: str, failure: Optional[str], ttft: float) -> Iterator[FakeResponse]:
+        time.sleep(ttft)
+        if failure:
+            raise _error(failure)
+        step = FAKE_LLM_CHUNK_TOKENS * 4
+        for start in range(0, len(text), step):
+            chunk = text[start:start + step]
+            time.sleep(estimate_tokens(chunk) / self.tokens_per_second)
+            yield FakeResponse(chunk)
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "output_tokens": self.tokens,
+            "prefix_cache_hits": self.prefix_hits,
+            "prefix_cache_misses": self.prefix_misses,
+        }
+
+
+def _prose(tokens: int, rng: random.Random) -> str:
+    # About four characters per token, as estimate_tokens counts them
+    words = []
+    length = 0
+    while length < tokens * 4:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words).capitalize() + "."
+
+
+def _leaves(schema: dict) -> int:
+    kind = schema.get("type", "").lower()
+    if kind == "object":
+        return sum(_leaves(prop) for prop in schema.get("properties", {}).values()) or 1
+    if kind == "array":
+        return 2 * _leaves(schema.get("items", {}))
+    return 1 if kind == "string" else 0
+
+
+def _fill(schema: dict, words: int, rng: random.Random):
+    kind = schema.get("type", "").lower()
+    if "enum" in schema:
+        return schema["enum"][0]
+    if kind == "object":
+        return {name: _fill(prop, words, rng) for name, prop in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [_fill(schema.get("items", {}), words, rng) for _ in range(2)]
+    if kind == "integer":
+        return rng.randint(1, 60)
+    if kind == "number":
+        return float(rng.randint(1, 50) * 1000)
+    if kind == "boolean":
+        return True
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def _document(schema: dict, tokens: int, rng: random.Random) -> str:
+    """JSON matching ``schema`` with about ``tokens`` tokens of text spread over its strings"""
+    from common.fast_json import dumps
+
+    words = max(1, tokens * 4 // 7 // _leaves(schema))
+    return dumps(_fill(schema, words, rng))
+
+
+def _translation(prompt: str) -> str:
+    # The batch is the JSON array on the prompt's last line
+    from common.fast_json import dumps, loads
+
+    language = re.search(r"into (\w+)", prompt)
+    tag = f"[{language.group(1) if language else 'translated'}]"
+    segments = loads(prompt.rsplit("\n", 1)[-1])
+    return dumps({"translations": [f"{tag} {segment}" for segment in segments]})
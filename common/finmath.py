@@ -0,0 +1,211 @@
+"""Deterministic financial calculations used to ground the prompts.
+
+Everything here is plain NumPy arithmetic that broadcasts over its inputs, so
+one call can evaluate a whole grid of loan rates and tenors or savings
+scenarios. The results are handed to the model as fixed figures, leaving it
+to write the explanation rather than do the arithmetic.
+"""
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Sequence
+
+from common.lazy_import import lazy_import
+
+# Loaded on first use; see common/lazy_import.py
+np = lazy_import("numpy")
+
+# Typical annual interest rates (%) seen by rural borrowers: KCC, MUDRA/bank, SHG, MFI
+LOAN_RATES = (7.0, 10.0, 14.0, 24.0)
+LOAN_TENORS_MONTHS = (12, 24, 36, 60)
+# Share of income that can safely go to loan repayments
+MAX_EMI_SHARE = 0.4
+
+# Assumed terms for converting an outstanding loan balance into a monthly EMI
+EXISTING_LOAN_RATE = 14.0
+EXISTING_LOAN_MONTHS = 36
+
+# Recurring deposit / post office style return used for savings projections
+SAVINGS_RATE = 6.5
+EMERGENCY_FUND_MONTHS = 6
+
+# Baseline budget shares for a family of four; essentials grow with family size
+BUDGET_SHARES = {
+    "Food and household essentials": 0.40,
+    "Housing and utilities": 0.10,
+    "Education and health": 0.10,
+    "Business reinvestment": 0.10,
+    "Savings": 0.20,
+    "Emergency fund": 0.05,
+    "Personal and other": 0.05,
+}
+
+
+def _monthly_rate(annual_rate):
+    return np.asarray(annual_rate, dtype=np.float64) / 12.0 / 100.0
+
+
+def emi(principal, annual_rate, months):
+    """Equated monthly instalment; broadcasts over all three arguments"""
+    principal = np.asarray(principal, dtype=np.float64)
+    months = np.asarray(months, dtype=np.float64)
+    r = _monthly_rate(annual_rate)
+    growth = np.power(1.0 + r, months)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        payment = np.where(r > 0, principal * r * growth / (growth - 1.0), principal / months)
+    return payment
+
+
+def existing_loan_emi(outstanding: Optional[float]) -> float:
+    """Estimate the monthly repayment on an outstanding loan balance"""
+    if not outstanding:
+        return 0.0
+    return float(np.round(emi(outstanding, EXISTING_LOAN_RATE, EXISTING_LOAN_MONTHS)))
+
+
+def affordable_principal(monthly_payment, annual_rate, months):
+    """Largest loan whose EMI fits ``monthly_payment``; inverse of :func:`emi`"""
+    monthly_payment = np.asarray(monthly_payment, dtype=np.float64)
+    months = np.asarray(months, dtype=np.float64)
+    r = _monthly_rate(annual_rate)
+    growth = np.power(1.0 + r, months)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        principal = np.where(r > 0, monthly_payment * (growth - 1.0) / (r * growth), monthly_payment * months)
+    return principal
+
+
+def savings_trajectory(monthly_saving, months, annual_rate=SAVINGS_RATE, initial=0.0):
+    """Balance after ``months`` of monthly deposits; broadcasts over every argument"""
+    monthly_saving = np.asarray(monthly_saving, dtype=np.float64)
+    months = np.asarray(months, dtype=np.float64)
+    initial = np.asarray(initial, dtype=np.float64)
+    r = _monthly_rate(annual_rate)
+    growth = np.power(1.0 + r, months)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        deposits = np.where(r > 0, monthly_saving * (growth - 1.0) / r, monthly_saving * months)
+    return initial * growth + deposits
+
+
+def months_to_target(target, monthly_saving, annual_rate=SAVINGS_RATE, initial=0.0):
+    """Months of deposits needed to reach ``target`` (inf if it is never reached)"""
+    target = np.asarray(target, dtype=np.float64)
+    monthly_saving = np.asarray(monthly_saving, dtype=np.float64)
+    initial = np.asarray(initial, dtype=np.float64)
+    r = _monthly_rate(annual_rate)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        compounded = np.log((target * r + monthly_saving) / (initial * r + monthly_saving)) / np.log1p(r)
+        simple = (target - initial) / monthly_saving
+        months = np.where(r > 0, compounded, simple)
+    months = np.where(target <= initial, 0.0, months)
+    return np.ceil(np.where(np.isfinite(months) & (months >= 0), months, np.inf))
+
+
+def budget_split(monthly_income: float, family_size: Optional[int] = None,
+                 existing_emi: float = 0.0) -> Dict[str, float]:
+    """Split monthly income into budget heads, rounded to the nearest ₹10"""
+    names = list(BUDGET_SHARES)
+    shares = np.array([BUDGET_SHARES[name] for name in names])
+    # Each member beyond four moves 2% from savings/personal into food
+    extra = np.clip(((family_size or 4) - 4) * 0.02, -0.10, 0.10)
+    shares[names.index("Food and household essentials")] += extra
+    shares[names.index("Savings")] -= extra * 0.75
+    shares[names.index("Personal and other")] -= extra * 0.25
+    available = max(monthly_income - existing_emi, 0.0)
+    amounts = np.round(np.clip(shares, 0.0, None) * available / 10.0) * 10.0
+    split = dict(zip(names, amounts.tolist()))
+    if existing_emi:
+        split["Existing loan repayments"] = round(existing_emi, 2)
+    return split
+
+
+def emergency_fund_target(monthly_income: float, family_size: Optional[int] = None,
+                          months: int = EMERGENCY_FUND_MONTHS) -> float:
+    """Essential spending for ``months`` months"""
+    split = budget_split(monthly_income, family_size)
+    essentials = split["Food and household essentials"] + split["Housing and utilities"] + split["Education and health"]
+    return round(essentials * months, -2)
+
+
+def loan_grid(monthly_income: float, existing_emi: float = 0.0,
+              rates: Sequence[float] = LOAN_RATES, tenors: Sequence[int] = LOAN_TENORS_MONTHS) -> List[dict]:
+    """Affordable loan amount for every rate/tenor pair, evaluated in one pass"""
+    capacity = max(monthly_income * MAX_EMI_SHARE - existing_emi, 0.0)
+    rate_grid, tenor_grid = np.meshgrid(np.asarray(rates, dtype=np.float64), np.asarray(tenors, dtype=np.float64), indexing="ij")
+    principal = np.floor(affordable_principal(capacity, rate_grid, tenor_grid) / 1000.0) * 1000.0
+    payment = emi(principal, rate_grid, tenor_grid)
+    interest = payment * tenor_grid - principal
+    return [
+        {
+            "annual_rate": float(rate_grid[i, j]),
+            "months": int(tenor_grid[i, j]),
+            "capacity": round(capacity),
+            "monthly_emi": float(np.round(payment[i, j])),
+            "max_loan": float(principal[i, j]),
+            "total_interest": float(np.round(interest[i, j])),
+        }
+        for i in range(rate_grid.shape[0]) for j in range(rate_grid.shape[1])
+    ]
+
+
+def savings_plan(monthly_income: float, family_size: Optional[int] = None,
+                 existing_savings: float = 0.0, horizons=(12, 36, 60)) -> dict:
+    """Budget, emergency fund and projected savings for a profile"""
+    split = budget_split(monthly_income, family_size)
+    monthly_saving = split["Savings"] + split["Emergency fund"]
+    target = emergency_fund_target(monthly_income, family_size)
+    balances = savings_trajectory(monthly_saving, np.asarray(horizons), initial=existing_savings)
+    return {
+        "budget": split,
+        "monthly_saving": monthly_saving,
+        "emergency_fund_target": target,
+        "months_to_emergency_fund": float(months_to_target(target, monthly_saving, initial=existing_savings)),
+        "projected_savings": {int(h): float(np.round(b)) for h, b in zip(horizons, balances)},
+    }
+
+
+def format_inr(amount: float) -> str:
+    return f"₹{amount:,.0f}"
+
+
+def budget_details(plan: dict) -> List[dict]:
+    """Budget lines in the ``monthlyBudget.details`` format of the advice JSON"""
+    return [{"item": name, "amount": format_inr(amount)} for name, amount in plan["budget"].items()]
+
+
+def plan_figures(plan: dict) -> List[dict]:
+    """Savings and emergency fund figures in the ``financialPlanning.figures`` format of the advice JSON"""
+    figures = [{"item": "Monthly saving (savings + emergency)", "amount": format_inr(plan["monthly_saving"])}]
+    figures.append({"item": f"Emergency fund target ({EMERGENCY_FUND_MONTHS} months of essentials)",
+                    "amount": format_inr(plan["emergency_fund_target"])})
+    if np.isfinite(plan["months_to_emergency_fund"]):
+        figures.append({"item": "Months to reach the emergency fund",
+                        "amount": f"{plan['months_to_emergency_fund']:.0f}"})
+    for months, balance in plan["projected_savings"].items():
+        figures.append({"item": f"Savings after {months} months at {SAVINGS_RATE}% a year",
+                        "amount": format_inr(balance)})
+    return figures
+
+
+def describe_savings_plan(plan: dict) -> str:
+    """Render a savings plan as prompt lines"""
+    lines = ["- Monthly budget: " + "; ".join(f"{name} {format_inr(v)}" for name, v in plan["budget"].items())]
+    lines.append(f"- Monthly saving (savings + emergency): {format_inr(plan['monthly_saving'])}")
+    lines.append(f"- Emergency fund target ({EMERGENCY_FUND_MONTHS} months of essentials): {format_inr(plan['emergency_fund_target'])}")
+    if np.isfinite(plan["months_to_emergency_fund"]):
+        lines.append(f"- Months to reach the emergency fund: {plan['months_to_emergency_fund']:.0f}")
+    lines.append("- Projected savings at " + str(SAVINGS_RATE) + "% a year: " + "; ".join(
+        f"{months} months {format_inr(balance)}" for months, balance in plan["projected_savings"].items()
+    ))
+    return "\n".join(lines)
+
+
+def describe_loan_grid(grid: List[dict]) -> str:
+    """Render a loan affordability grid as prompt lines"""
+    if not grid or grid[0]["capacity"] <= 0:
+        return "- No spare income for a new loan EMI after existing repayments"
+    lines = [f"- Affordable EMI ({MAX_EMI_SHARE:.0%} of income less existing repayments): {format_inr(grid[0]['capacity'])} a month"]
+    for row in grid:
+        lines.append(
+            f"- At {row['annual_rate']:g}% for {row['months']} months: loan up to {format_inr(row['max_loan'])}, "
+            f"EMI {format_inr(row['monthly_emi'])}, total interest {format_inr(row['total_interest'])}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,189 @@
+"""Incremental JSON parsing of streamed model output.
+
+``JSONStreamParser`` is fed text chunks as they arrive and reports, without
+re-scanning earlier text:
+
+* ``("key", path)`` as soon as an object key at most ``emit_depth`` deep has
+  been read, so a caller can abort on a key the schema does not allow;
+* ``("value", path, value)`` as soon as a value exactly ``emit_depth`` deep
+  is complete, decoded.
+
+Paths are tuples of object keys and array indexes from the root. Text before
+the root value (prose, a code fence) and after it is ignored.
+"""
+import re
+from typing import Any, List, Optional, Tuple
+
+from common.fast_json import loads
+
+# Next character that matters outside a string / inside one
+_STRUCTURAL = re.compile(r'[{}\[\]":,]')
+_STRING_END = re.compile(r'["\\]')
+
+Event = Tuple
+
+
+class JSONStreamError(ValueError):
+    """Raised when the streamed text cannot be a single JSON value"""
+
+
+class _Frame:
+    __slots__ = ("kind", "path", "key", "index", "expect_key")
+
+    def __init__(self, kind: str, path: tuple):
+        self.kind = kind
+        self.path = path
+        self.key: Optional[str] = None
+        self.index = 0
+        # Objects alternate key, value; arrays hold values only
+        self.expect_key = kind == "{"
+
+    def child_path(self) -> tuple:
+        return self.path + ((self.key,) if self.kind == "{" else (self.index,))
+
+
+class JSONStreamParser:
+    def __init__(self, emit_depth: int = 1):
+        self.emit_depth = emit_depth
+        self.buf = ""
+        self.pos = 0
+        self.stack: List[_Frame] = []
+        self.started = False
+        self.done = False
+        # Start offset and path of the emit-depth value being read
+        self._pending: Optional[Tuple[int, tuple]] = None
+        # Start offset of the string being read, and whether it is a key
+        self._string: Optional[Tuple[int, bool]] = None
+        self._escaped = False
+
+    def feed(self, chunk: str) -> List[Event]:
+        """Consume ``chunk`` and return the events it completed"""
+        if self.done:
+            return []
+        self.buf += chunk
+        events: List[Event] = []
+        buf = self.buf
+        while self.pos < len(buf) and not self.done:
+            if self._string is not None:
+                if not self._scan_string(buf, events):
+                    break
+                continue
+            if not self.started:
+                start = buf.find("{", self.pos)
+                if start == -1:
+                    self.pos = len(buf)
+                    break
+                self.pos = start + 1
+                self.started = True
+                self.stack.append(_Frame("{", ()))
+                continue
+            match = _STRUCTURAL.search(buf, self.pos)
+            if match is None:
+                self.pos = len(buf)
+                break
+            self.pos = match.end()
+            self._structural(match.group(), match.start(), events)
+        return events
+
+    def close(self) -> None:
+        """Raise unless a complete root value has been read"""
+        if not self.done:
+            raise JSONStreamError("Stream ended before the JSON document was complete")
+
+    def _scan_string(self, buf: str, events: List[Event]) -> bool:
+        pos = self.pos
+        while True:
+            if self._escaped:
+                if pos >= len(buf):
+                    self.pos = pos
+                    return False
+                pos += 1
+                self._escaped = False
+            match = _STRING_END.search(buf, pos)
+            if match is None:
+                self.pos = len(buf)
+                return False
+            if match.group() == "\\":
+                self._escaped = True
+                pos = match.end()
+                continue
+            self.pos = match.end()
+            start, is_key = self._string
+            self._string = None
+            if is_key:
+                frame = self.stack[-1]
+                frame.key = loads(buf[start:self.pos])
+                if len(frame.path) < self.emit_depth:
+                    events.append(("key", frame.path + (frame.key,)))
+            return True
+
+    def _open_slot(self, frame: _Frame, offset: int) -> None:
+        # A value of ``frame`` starts after ``offset``; remember where if it is one to emit
+        if len(frame.path) + 1 == self.emit_depth:
+            self._pending = (offset + 1, frame.child_path())
+
+    def _close_slot(self, frame: _Frame, offset: int, events: List[Event]) -> None:
+        # Strings, numbers and literals end at the next ',' or closing bracket of their parent
+        if self._pending is None or len(self._pending[1]) != len(frame.path) + 1:
+            return
+        if self.buf[self._pending[0]:offset].strip():
+            self._emit_pending(offset, events)
+        else:
+            # Empty array
+            self._pending = None
+
+    def _emit_pending(self, end: int, events: List[Event]) -> None:
+        start, path = self._pending
+        self._pending = None
+        try:
+            value = loads(self.buf[start:end])
+        except ValueError as e:
+            raise JSONStreamError(f"Invalid JSON value at {path}: {e}") from e
+        events.append(("value", path, value))
+
+    def _structural(self, char: str, offset: int, events: List[Event]) -> None:
+        frame = self.stack[-1]
+        if char == '"':
+            is_key = frame.kind == "{" and frame.expect_key
+            if is_key and frame.key is not None:
+                raise JSONStreamError(f"Expected ':' at offset {offset}")
+            self._string = (offset, is_key)
+        elif char == ":":
+            if frame.kind != "{" or not frame.expect_key or frame.key is None:
+                raise JSONStreamError(f"Unexpected ':' at offset {offset}")
+            frame.expect_key = False
+            self._open_slot(frame, offset)
+        elif frame.kind == "{" and frame.expect_key and (char != "}" or frame.key is not None):
+            raise JSONStreamError(f"Expected an object key at offset {offset}")
+        elif char == ",":
+            self._close_slot(frame, offset, events)
+            if frame.kind == "{":
+                frame.key = None
+                frame.expect_key = True
+            else:
+                frame.index += 1
+                self._open_slot(frame, offset)
+        elif char in "{[":
+            child = _Frame(char, frame.child_path())
+            self.stack.append(child)
+            if char == "[":
+                self._open_slot(child, offset)
+        else:
+            expected = "}" if frame.kind == "{" else "]"
+            if char != expected:
+                raise JSONStreamError(f"Unexpected '{char}' at offset {offset}")
+            self._close_slot(frame, offset, events)
+            self.stack.pop()
+            if self._pending is not None and self._pending[1] == frame.path:
+                self._emit_pending(offset + 1, events)
+            if not self.stack:
+                self.done = True
+
+
+def first_object(text: str) -> Any:
+    """The first complete JSON object in ``text``, skipping anything around it, in one scan"""
+    parser = JSONStreamParser(emit_depth=0)
+    parser.feed(text)
+    parser.close()
+    start = text.find("{")
+    return loads(text[start:parser.pos])
@@ -0,0 +1,27 @@
+"""Deferred imports for heavy dependencies.
+
+``np = lazy_import("numpy")`` binds a module object whose code only runs on
+its first attribute access, so services that never touch numpy while starting
+up do not pay for importing it. Modules using this add
+``from __future__ import annotations`` so signature annotations such as
+``np.ndarray`` are not evaluated at import time.
+"""
+import importlib.util
+import sys
+from types import ModuleType
+
+
+def lazy_import(name: str) -> ModuleType:
+    """Return ``name`` as a module that is loaded on first use"""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f"No module named {name!r}")
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
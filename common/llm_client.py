@@ -0,0 +1,175 @@
+"""Async LLM client shared by the FastAPI apps"""
+import asyncio
+import contextvars
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Any, AsyncIterator, Optional
+
+# Global limits, overridable from .env
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+LLM_DISCONNECT_POLL_SECONDS = float(os.getenv("LLM_DISCONNECT_POLL_SECONDS", "0.5"))
+
+
+class LLMTimeoutError(Exception):
+    """Raised when a model call exceeds its timeout"""
+
+
+class ClientDisconnected(Exception):
+    """Raised when the HTTP client goes away before the model answers"""
+
+
+class Overloaded(Exception):
+    """Raised when a call is refused rather than queued; maps to an HTTP 429 or 503"""
+
+    def __init__(self, message: str, status_code: int, retry_after: float):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    @property
+    def headers(self) -> dict:
+        return {"Retry-After": str(max(1, math.ceil(self.retry_after)))}
+
+
+class AsyncLLMClient:
+    """Runs model calls without blocking the event loop.
+
+    Uses the model's native ``generate_content_async`` when it has one and
+    falls back to a dedicated thread pool otherwise. A semaphore caps the
+    number of calls in flight across every request on the worker.
+    """
+
+    def __init__(self, model, max_concurrency: Optional[int] = None, timeout: Optional[float] = None):
+        self.model = model
+        self.max_concurrency = max_concurrency or LLM_MAX_CONCURRENCY
+        self.timeout = timeout or LLM_TIMEOUT_SECONDS
+        self.in_flight = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="llm")
+
+    def _check_admission(self) -> None:
+        # Models behind the scheduler refuse work up front instead of queueing it here
+        check = getattr(self.model, "check_admission", None)
+        if check is not None:
+            check(self.waiting)
+
+    @asynccontextmanager
+    async def _slot(self):
+        self._check_admission()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    async def _call(self, prompt: str, **kwargs) -> Any:
+        if hasattr(self.model, "generate_content_async"):
+            return await self.model.generate_content_async(prompt, **kwargs)
+        loop = asyncio.get_running_loop()
+        # Carry the request's context (priority, metrics route) onto the worker thread
+        call = partial(contextvars.copy_context().run, self.model.generate_content, prompt, **kwargs)
+        return await loop.run_in_executor(self._executor, call)
+
+    async def generate(self, prompt: str, timeout: Optional[float] = None, **kwargs) -> str:
+        """Generate a response for ``prompt`` and return its text"""
+        timeout = timeout or self.timeout
+        async with self._slot():
+            try:
+                response = await asyncio.wait_for(self._call(prompt, **kwargs), timeout)
+            except asyncio.TimeoutError:
+                raise LLMTimeoutError(f"Model did not respond within {timeout:g}s")
+        return response.text
+
+    async def stream(self, prompt: str, timeout: Optional[float] = None, **kwargs) -> AsyncIterator[str]:
+        """Yield the response text chunk by chunk as the model produces it.
+
+        ``timeout`` bounds the wait for each chunk rather than the whole answer.
+        """
+        timeout = timeout or self.timeout
+        async with self._slot():
+            if hasattr(self.model, "generate_content_async"):
+                chunks = self._native_stream(prompt, **kwargs)
+            else:
+                chunks = self._threaded_stream(prompt, **kwargs)
+            try:
+                while True:
+                    try:
+                        text = await asyncio.wait_for(chunks.__anext__(), timeout)
+                    except StopAsyncIteration:
+                        break
+                    except asyncio.TimeoutError:
+                        raise LLMTimeoutError(f"Model stalled for more than {timeout:g}s")
+                    if text:
+                        yield text
+            finally:
+                await chunks.aclose()
+
+    async def _native_stream(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        response = await self.model.generate_content_async(prompt, stream=True, **kwargs)
+        async for chunk in response:
+            yield _chunk_text(chunk)
+
+    async def _threaded_stream(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        # Drain the blocking stream on a worker thread and hand chunks back to the loop
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+        done = object()
+
+        def pump():
+            try:
+                for chunk in self.model.generate_content(prompt, stream=True, **kwargs):
+                    if stop.is_set():
+                        break
+                    loop.call_soon_threadsafe(queue.put_nowait, _chunk_text(chunk))
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, done)
+
+        loop.run_in_executor(self._executor, contextvars.copy_context().run, pump)
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+
+
+def _chunk_text(chunk) -> str:
+    try:
+        return chunk.text
+    except ValueError:
+        # Chunks without text parts (e.g. safety metadata only)
+        return ""
+
+
+async def run_until_disconnect(request, coro, poll_interval: float = LLM_DISCONNECT_POLL_SECONDS):
+    """Await ``coro`` but cancel it as soon as ``request``'s client disconnects"""
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                raise ClientDisconnected("Client disconnected before the response was ready")
+    finally:
+        if not task.done():
+            task.cancel()
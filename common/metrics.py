@@ -0,0 +1,298 @@
+"""Request, stage and model-call metrics in the Prometheus text format.
+
+``instrument_flask`` / ``instrument_fastapi`` time every request, count the
+ones in flight and add a ``/metrics`` route. Inside a request, ``stage`` (or
+the ``timed`` decorator) records how long each step took, labelled with the
+route, so prompt building, the model call, JSON parsing and serialization
+show up as separate histograms. Sending ``X-Profile: 1`` returns the
+request's own stage timings in a ``Server-Timing`` response header, along
+with any values noted with ``annotate`` (such as prompt sizes). For
+streamed responses the headers go out first, so request time and the header
+only cover the work done before the body starts.
+
+Stats from the caches, scheduler and breaker are exported as gauges through
+``register_stats``.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+# Seconds; wide enough for both sub-millisecond lookups and minute-long model calls
+LATENCY_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+PROFILE_HEADER = "X-Profile"
+
+_route: contextvars.ContextVar = contextvars.ContextVar("metrics_route", default="none")
+# (stage, seconds) pairs, and (name, description) notes, for the current request when it asked to be profiled
+_profile: contextvars.ContextVar = contextvars.ContextVar("metrics_profile", default=None)
+
+LabelSet = Tuple[Tuple[str, str], ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(labels: LabelSet, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class Registry:
+    """Counters, gauges and histograms keyed by metric name and labels"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelSet, float]] = {}
+        self._gauges: Dict[str, Dict[LabelSet, float]] = {}
+        self._histograms: Dict[str, Dict[LabelSet, Histogram]] = {}
+        self._help: Dict[str, str] = {}
+        self._collectors: Dict[Tuple[str, LabelSet], Callable[[], dict]] = {}
+
+    def describe(self, name: str, text: str) -> None:
+        self._help[name] = text
+
+    def inc(self, name: str, amount: float = 1.0, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + amount
+
+    def total(self, name: str) -> float:
+        """Sum of counter ``name`` over all its label sets"""
+        with self._lock:
+            return sum(self._counters.get(name, {}).values())
+
+    def set(self, name: str, value: float, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._gauges.setdefault(name, {})[key] = value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(value)
+
+    def register_stats(self, prefix: str, stats: Callable[[], dict], **labels) -> None:
+        """Export the numeric fields of ``stats()`` as ``<prefix>_<field>`` gauges at scrape time"""
+        self._collectors[(prefix, tuple(sorted(labels.items())))] = stats
+
+    def _collect(self) -> Dict[str, Dict[LabelSet, float]]:
+        gauges: Dict[str, Dict[LabelSet, float]] = {}
+        for (prefix, labels), stats in list(self._collectors.items()):
+            try:
+                values = stats()
+            except Exception:
+                continue
+            for field, value in values.items():
+                if isinstance(value, bool):
+                    value = float(value)
+                if isinstance(value, (int, float)):
+                    gauges.setdefault(f"{prefix}_{field}", {})[labels] = float(value)
+        return gauges
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        collected = self._collect()
+        lines = []
+        with self._lock:
+            for kind, metrics in (("counter", self._counters), ("gauge", {**self._gauges, **collected})):
+                for name in sorted(metrics):
+                    if name in self._help:
+                        lines.append(f"# HELP {name} {self._help[name]}")
+                    lines.append(f"# TYPE {name} {kind}")
+                    for labels, value in sorted(metrics[name].items()):
+                        lines.append(f"{name}{_format_labels(labels)} {value:g}")
+            for name in sorted(self._histograms):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for labels, histogram in sorted(self._histograms[name].items()):
+                    cumulative = 0
+                    for bound, count in zip(LATENCY_BUCKETS + (float("inf"),), histogram.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                        bucket_labels = _format_labels(labels, 'le="%s"' % le)
+                        lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {histogram.total:.6f}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+registry.describe("http_request_duration_seconds", "Time to handle a request, by route, method and status")
+registry.describe("http_requests_in_flight", "Requests currently being handled")
+registry.describe("stage_duration_seconds", "Time spent in each stage of a request")
+registry.describe("llm_prompt_tokens_total", "Prompt tokens sent to the model")
+registry.describe("llm_response_tokens_total", "Response tokens received from the model")
+registry.describe("llm_cached_prompt_tokens_total", "Prompt tokens the model served from its prefix cache")
+
+
+def current_route() -> str:
+    return _route.get()
+
+
+@contextmanager
+def stage(name: str):
+    """Time the enclosed block as stage ``name`` of the current route"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        registry.observe("stage_duration_seconds", elapsed, route=_route.get(), stage=name)
+        profile = _profile.get()
+        if profile is not None:
+            profile.append((name, elapsed))
+
+
+def timed(name: str):
+    """Decorator form of :func:`stage`"""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def annotate(name: str, description) -> None:
+    """Report a value for the current request in its ``Server-Timing`` header, when profiled"""
+    profile = _profile.get()
+    if profile is not None:
+        profile.append((name, str(description)))
+
+
+def record_tokens(prompt_tokens: int, response_tokens: int, cached_tokens: int = 0) -> None:
+    route = _route.get()
+    registry.inc("llm_prompt_tokens_total", prompt_tokens, route=route)
+    registry.inc("llm_response_tokens_total", response_tokens, route=route)
+    if cached_tokens:
+        registry.inc("llm_cached_prompt_tokens_total", cached_tokens, route=route)
+
+
+def server_timing(profile: List[Tuple[str, Union[float, str]]], total: float) -> str:
+    entries = [
+        f'{name};desc="{_escape(value)}"' if isinstance(value, str) else f"{name};dur={value * 1000:.2f}"
+        for name, value in profile
+    ]
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(entries)
+
+
+class _RequestTimer:
+    """Shared start/finish bookkeeping for the framework hooks"""
+
+    def __init__(self, app_name: str):
+        self.app_name = app_name
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        registry.register_stats("http_requests", lambda: {"in_flight": self.in_flight}, app=app_name)
+
+    def start(self, route: str, profiled: bool):
+        with self._lock:
+            self.in_flight += 1
+        tokens = (_route.set(route), _profile.set([] if profiled else None))
+        return time.perf_counter(), tokens
+
+    def finish(self, started: float, tokens, route: str, method: str, status: int) -> Tuple[float, Optional[list]]:
+        elapsed = time.perf_counter() - started
+        profile = _profile.get()
+        registry.observe("http_request_duration_seconds", elapsed,
+                         app=self.app_name, route=route, method=method, status=str(status))
+        with self._lock:
+            self.in_flight -= 1
+        try:
+            _route.reset(tokens[0])
+            _profile.reset(tokens[1])
+        except ValueError:
+            # A streamed response can finish in a different context from the one it started in
+            _route.set("none")
+            _profile.set(None)
+        return elapsed, profile
+
+
+def instrument_flask(app, app_name: str) -> None:
+    """Time every request of a Flask app and add ``GET /metrics``"""
+    from flask import Response, g, request
+
+    timer = _RequestTimer(app_name)
+
+    def route() -> str:
+        return request.url_rule.rule if request.url_rule else "unmatched"
+
+    @app.before_request
+    def _start_timer():
+        g._metrics = timer.start(route(), request.headers.get(PROFILE_HEADER) == "1")
+
+    @app.after_request
+    def _add_server_timing(response):
+        g._metrics_status = response.status_code
+        started, _ = g.get("_metrics", (None, None))
+        profile = _profile.get()
+        if started is not None and profile is not None:
+            response.headers["Server-Timing"] = server_timing(profile, time.perf_counter() - started)
+        return response
+
+    # Flask skips after_request when a view raises, but always tears the request down
+    @app.teardown_request
+    def _stop_timer(exc):
+        started, tokens = g.pop("_metrics", (None, None))
+        if started is not None:
+            status = 500 if exc is not None else g.pop("_metrics_status", 500)
+            timer.finish(started, tokens, route(), request.method, status)
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+
+def instrument_fastapi(app, app_name: str) -> None:
+    """Time every request of a FastAPI app and add ``GET /metrics``"""
+    from fastapi import Request
+    from fastapi.responses import PlainTextResponse
+
+    timer = _RequestTimer(app_name)
+
+    @app.middleware("http")
+    async def _time_request(request: Request, call_next):
+        # The matched route is only known after routing; the raw path stands in until then
+        started, tokens = timer.start(request.url.path, request.headers.get(PROFILE_HEADER) == "1")
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+        finally:
+            route = getattr(request.scope.get("route"), "path", "unmatched")
+            elapsed, profile = timer.finish(started, tokens, route, request.method, status)
+        if profile is not None:
+            response.headers["Server-Timing"] = server_timing(profile, elapsed)
+        return response
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def metrics():
+        return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,67 @@
+"""Model clients shared by every app in the process, created on first use.
+
+Importing ``google.generativeai`` takes about a second, so the apps hold a
+``LazyModel`` and the SDK is only imported, configured and checked for an API
+key when the first model call is made. Every app asking for the same model
+name gets the same scheduled client.
+
+``LLM_BACKEND=fake`` swaps the API for the local stand-in in
+``common/fake_model.py``, still behind the scheduler, so the whole service
+can be load tested offline without an API key.
+"""
+import os
+import threading
+from typing import Dict
+
+from common.metrics import registry
+from common.scheduler import ScheduledModel
+
+DEFAULT_MODEL = "gemini-1.5-pro"
+# "gemini" calls the API; "fake" answers locally for tests and benchmarks
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+
+_models: Dict[str, ScheduledModel] = {}
+_models_lock = threading.Lock()
+
+
+def get_model(name: str = DEFAULT_MODEL) -> ScheduledModel:
+    """Return the process-wide scheduled client for model ``name``"""
+    model = _models.get(name)
+    if model is None:
+        with _models_lock:
+            model = _models.get(name)
+            if model is None:
+                # Calls go through the scheduler, which keeps them inside the API quota
+                model = _models[name] = ScheduledModel(_backend_model(name))
+    return model
+
+
+def _backend_model(name: str):
+    if LLM_BACKEND == "fake":
+        from common.fake_model import FakeModel
+
+        fake = FakeModel(name)
+        registry.register_stats("fake_llm", fake.stats, model=name)
+        return fake
+    if LLM_BACKEND != "gemini":
+        raise ValueError(f"Unknown LLM_BACKEND {LLM_BACKEND!r}; use 'gemini' or 'fake'")
+    import google.generativeai as genai
+
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        raise ValueError("Please set GEMINI_API_KEY in .env file")
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel(name)
+
+
+class LazyModel:
+    """Stands in for ``get_model(name)`` until a call actually needs the model"""
+
+    def __init__(self, name: str = DEFAULT_MODEL):
+        self.name = name
+
+    def generate_content(self, prompt, **kwargs):
+        return get_model(self.name).generate_content(prompt, **kwargs)
+
+    def check_admission(self, backlog: int = 0) -> None:
+        get_model(self.name).check_admission(backlog)
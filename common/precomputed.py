@@ -0,0 +1,241 @@
+"""Read-only store of advice precomputed for the common profile grid.
+
+Most traffic is one of the listed business types in one of a few dozen
+districts, with income in one of a handful of bands. ``fin/precompute_advice.py``
+generates advice for every cell of that grid ahead of time and writes it to
+a SQLite file; each worker opens the file read-only and answers requests
+that land on the grid without an LLM call. Cells are stored in English only,
+and other languages are translated from them per request. Cells are generated
+for the representative goal only, so a request with any other goal is off the
+grid and takes the usual cached or live path.
+
+Every entry stores a version hash of the prompts it was generated from and the
+scheme data, so a prompt or catalog change invalidates exactly the cells it
+affects and the job only regenerates those.
+"""
+import hashlib
+import itertools
+import json
+import os
+import sqlite3
+import threading
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Dict, Iterator, Optional, Tuple
+
+from common.response_cache import INCOME_BANDS, normalize_text
+
+PRECOMPUTED_ADVICE_PATH = os.getenv("PRECOMPUTED_ADVICE_PATH", "precomputed_advice.db")
+# Optional JSON file overriding any of the grid dimensions below
+ADVICE_GRID_PATH = os.getenv("ADVICE_GRID_PATH", "")
+
+BUSINESS_TYPES = (
+    "Dairy Farming",
+    "Poultry Farming",
+    "Small Retail Shop",
+    "Handicrafts",
+    "Agricultural Products",
+    "Food Processing",
+    "Tailoring",
+    "Beauty Parlor",
+    "General Store",
+    "Vegetable Vending",
+)
+
+DEFAULT_GRID = {
+    "business_types": list(BUSINESS_TYPES),
+    "districts": [
+        "Khordha", "Cuttack", "Ganjam", "Mayurbhanj", "Sambalpur", "Balasore", "Puri", "Koraput",
+        "Patna", "Gaya", "Varanasi", "Lucknow", "Pune", "Nashik", "Nagpur", "Jaipur",
+        "Udaipur", "Indore", "Ranchi", "Raipur",
+    ],
+    "languages": ["English"],
+    "risk_tolerances": ["low", "medium", "high"],
+}
+
+# Fields not on the grid are fixed to typical values when generating a cell
+REPRESENTATIVE_PROFILE = {
+    "name": "",
+    "age": 35,
+    "family_size": 4,
+    "financial_goal": "Grow the business and build savings",
+}
+# Representative savings, in months of income
+REPRESENTATIVE_SAVINGS_MONTHS = 2
+
+
+def load_grid(path: str = ADVICE_GRID_PATH) -> Dict[str, list]:
+    grid = dict(DEFAULT_GRID)
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            grid.update(json.load(f))
+    return grid
+
+
+def band_midpoint(index: int) -> float:
+    """Representative income for the ``index``-th band of INCOME_BANDS"""
+    if index == len(INCOME_BANDS) - 1:
+        return INCOME_BANDS[-1] * 1.25
+    return (INCOME_BANDS[index] + INCOME_BANDS[index + 1]) / 2.0
+
+
+def representative_profile(canonical: Dict[str, str], band: int) -> dict:
+    income = band_midpoint(band)
+    return {
+        **REPRESENTATIVE_PROFILE,
+        "location": canonical["districts"],
+        "preferred_language": canonical["languages"],
+        "monthly_income": income,
+        "business_type": canonical["business_types"],
+        "existing_savings": income * REPRESENTATIVE_SAVINGS_MONTHS,
+        "risk_tolerance": canonical["risk_tolerances"],
+    }
+
+
+class AdviceGrid:
+    """Membership test and enumeration for the precomputed grid"""
+
+    def __init__(self, grid: Optional[Dict[str, list]] = None):
+        grid = grid or load_grid()
+        # Normalized value -> the spelling used when generating
+        self.dimensions = {
+            name: {normalize_text(value): value for value in values} for name, values in grid.items()
+        }
+
+    def cell(self, business_type: str, location: str, language: str, monthly_income: float,
+             risk_tolerance: str, financial_goal: str) -> Optional[Tuple[str, dict]]:
+        """Store key and representative profile of the cell a request falls in, or None off the grid"""
+        if normalize_text(financial_goal) != normalize_text(REPRESENTATIVE_PROFILE["financial_goal"]):
+            return None
+        parts = {
+            "business_types": business_type,
+            "districts": location,
+            "languages": language,
+            "risk_tolerances": risk_tolerance,
+        }
+        canonical = {}
+        for dimension, value in parts.items():
+            canonical[dimension] = self.dimensions[dimension].get(normalize_text(value))
+            if canonical[dimension] is None:
+                return None
+        band = bisect_right(INCOME_BANDS, monthly_income) - 1
+        if band < 0:
+            return None
+        cell = {name: normalize_text(value) for name, value in canonical.items()}
+        cell["income"] = band
+        key = hashlib.sha1(json.dumps(cell, sort_keys=True).encode("utf-8")).hexdigest()
+        return key, representative_profile(canonical, band)
+
+    def profiles(self) -> Iterator[dict]:
+        """A representative profile for every cell"""
+        dims = self.dimensions
+        for business_type, location, language, risk, band in itertools.product(
+            dims["business_types"].values(), dims["districts"].values(), dims["languages"].values(),
+            dims["risk_tolerances"].values(), range(len(INCOME_BANDS)),
+        ):
+            yield representative_profile({
+                "business_types": business_type,
+                "districts": location,
+                "languages": language,
+                "risk_tolerances": risk,
+            }, band)
+
+    def __len__(self) -> int:
+        count = len(INCOME_BANDS)
+        for values in self.dimensions.values():
+            count *= len(values)
+        return count
+
+
+def content_version(*parts: str) -> str:
+    """Hash of everything that shapes a cell's advice"""
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=4)
+def catalog_fingerprint(catalog) -> str:
+    """Content hash of a scheme catalog snapshot"""
+    return hashlib.sha1(json.dumps(catalog.schemes, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+SCHEMA = "CREATE TABLE IF NOT EXISTS advice (key TEXT PRIMARY KEY, version TEXT NOT NULL, value TEXT NOT NULL)"
+
+
+class PrecomputedStore:
+    """Read-only view of the precomputed advice file, shared by every worker"""
+
+    def __init__(self, path: str = PRECOMPUTED_ADVICE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def available(self) -> bool:
+        return os.path.exists(self.path)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: Optional[str], version: str) -> Optional[str]:
+        """Stored advice for ``key`` if it was generated from the current ``version``"""
+        row = None
+        if key is not None and self.available:
+            try:
+                row = self._conn().execute("SELECT version, value FROM advice WHERE key = ?", (key,)).fetchone()
+            except sqlite3.Error:
+                row = None
+        if row is None or row[0] != version:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[1]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "available": self.available,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class PrecomputedWriter:
+    """Used by the precompute job to fill and refresh the store"""
+
+    def __init__(self, path: str = PRECOMPUTED_ADVICE_PATH):
+        self.conn = sqlite3.connect(path)
+        # WAL lets serving workers keep reading while the job writes
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(SCHEMA)
+        self.conn.commit()
+
+    def versions(self) -> Dict[str, str]:
+        return dict(self.conn.execute("SELECT key, version FROM advice"))
+
+    def put(self, key: str, version: str, value: str) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO advice (key, version, value) VALUES (?, ?, ?)", (key, version, value)
+        )
+
+    def prune(self, keep: set) -> int:
+        """Delete cells that are no longer on the grid"""
+        stale = [key for key in self.versions() if key not in keep]
+        self.conn.executemany("DELETE FROM advice WHERE key = ?", ((key,) for key in stale))
+        return len(stale)
+
+    def commit(self) -> None:
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.commit()
+        self.conn.close()
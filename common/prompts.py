@@ -0,0 +1,122 @@
+"""Prompt templates compiled once at startup, with the request's data last.
+
+A ``PromptTemplate`` is built at import time from its static part (role,
+instructions, response format) and an ordered list of ``Block``s for the
+per-request data. Rendering only joins pre-built strings, and every prompt
+of a template starts with the same prefix, so the model provider's prefix
+(context) cache can reuse the processed instructions across users; Gemini
+caches repeated prompt prefixes implicitly, and the offline model emulates
+that through ``cacheable_prefix``.
+
+Prompts are kept within a per-template token budget, counted with
+``estimate_tokens``. Optional blocks lose lines from their end, starting
+with the last optional block, until the prompt fits; required blocks are
+never cut. Every render records the prompt's size and build time on
+/metrics, and in the ``Server-Timing`` header of profiled requests.
+"""
+import os
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+
+from common.metrics import annotate, current_route, registry
+from common.sessions import CHARS_PER_TOKEN, estimate_tokens
+
+# Token budget of a prompt, unless PROMPT_TOKEN_BUDGETS sets one for its template
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "1500"))
+# Per-template budgets, as "template=tokens,..."
+PROMPT_TOKEN_BUDGETS = {
+    name.strip(): int(tokens)
+    for name, _, tokens in (item.partition("=") for item in os.getenv("PROMPT_TOKEN_BUDGETS", "").split(","))
+    if name.strip() and tokens.strip()
+}
+
+registry.describe("prompt_tokens_total", "Estimated tokens of the prompts built, by template and route")
+registry.describe("prompts_built_total", "Prompts built, by template and route")
+registry.describe("prompt_trimmed_lines_total", "Optional context lines dropped to keep prompts within budget")
+registry.describe("prompt_build_seconds", "Time to render a prompt from its template")
+
+BlockValue = Union[None, str, Iterable[str]]
+
+
+@dataclass(frozen=True)
+class Block:
+    """One piece of per-request data, shown under ``heading``"""
+    name: str
+    heading: str = ""
+    # Optional blocks may be cut, line by line, to fit the budget
+    optional: bool = False
+
+
+class Prompt(str):
+    """Prompt text that also carries its template's name, prefix and size"""
+
+    def __new__(cls, text: str, template: str = "", prefix: str = "", tokens: int = 0, trimmed: int = 0):
+        prompt = super().__new__(cls, text)
+        prompt.template = template
+        prompt.prefix = prefix
+        prompt.tokens = tokens
+        prompt.trimmed = trimmed
+        return prompt
+
+
+def cacheable_prefix(prompt) -> str:
+    """The leading text ``prompt`` shares with every other prompt of its template ('' if unknown)"""
+    return getattr(prompt, "prefix", "")
+
+
+class PromptTemplate:
+    """A static prefix followed by the request's data blocks, in a fixed order"""
+
+    def __init__(self, name: str, prefix: str, blocks: Sequence[Block] = (), budget: Optional[int] = None):
+        self.name = name
+        self.prefix = prefix.rstrip() + "\n\n"
+        self.blocks = tuple(blocks)
+        self.budget = budget or PROMPT_TOKEN_BUDGETS.get(name, PROMPT_TOKEN_BUDGET)
+        # Pre-rendered block openings, and the order optional blocks are cut in
+        self._openings = {block.name: f"{block.heading}:\n" if block.heading else "" for block in self.blocks}
+        self._cut_order = [block.name for block in reversed(self.blocks) if block.optional]
+
+    def render(self, **values: BlockValue) -> Prompt:
+        """The prompt for ``values``, one per block name; empty or missing blocks are left out"""
+        started = time.perf_counter()
+        blocks: Dict[str, List[str]] = {}
+        for block in self.blocks:
+            value = values.get(block.name)
+            lines = [value] if isinstance(value, str) else list(value or ())
+            lines = [line for line in lines if line]
+            if lines:
+                blocks[block.name] = lines
+        trimmed = self._trim(blocks)
+        text = self.prefix + "\n\n".join(
+            self._openings[name] + "\n".join(blocks[name]) for name in self._openings if name in blocks
+        )
+        prompt = Prompt(text, self.name, self.prefix, estimate_tokens(text), trimmed)
+        self._record(prompt, time.perf_counter() - started)
+        return prompt
+
+    def _trim(self, blocks: Dict[str, List[str]]) -> int:
+        # Sizes are counted in characters, as estimate_tokens does
+        size = len(self.prefix) + sum(
+            len(self._openings[name]) + sum(len(line) + 1 for line in lines) + 2 for name, lines in blocks.items()
+        )
+        limit = self.budget * CHARS_PER_TOKEN
+        trimmed = 0
+        for name in self._cut_order:
+            lines = blocks.get(name)
+            while lines and size >= limit:
+                size -= len(lines.pop()) + 1
+                trimmed += 1
+            if name in blocks and not lines:
+                size -= len(self._openings[name]) + 2
+                del blocks[name]
+        return trimmed
+
+    def _record(self, prompt: Prompt, seconds: float) -> None:
+        route = current_route()
+        registry.inc("prompts_built_total", template=self.name, route=route)
+        registry.inc("prompt_tokens_total", prompt.tokens, template=self.name, route=route)
+        if prompt.trimmed:
+            registry.inc("prompt_trimmed_lines_total", prompt.trimmed, template=self.name)
+        registry.observe("prompt_build_seconds", seconds, template=self.name)
+        annotate(f"prompt_tokens.{self.name}", prompt.tokens)
@@ -0,0 +1,201 @@
+"""Profile-keyed cache for LLM responses.
+
+Entries live in a size-bounded in-memory LRU with a TTL. When
+``LLM_CACHE_PATH`` is set they are also written to a SQLite file so the cache
+survives restarts and is shared by every worker process on the host.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Any, Optional, Sequence
+
+from common.metrics import registry
+
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", str(24 * 3600)))
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "")
+LLM_CACHE_MAX_DISK_ENTRIES = int(os.getenv("LLM_CACHE_MAX_DISK_ENTRIES", "100000"))
+
+# Band edges in INR; users within the same band share cached advice
+INCOME_BANDS = (0, 5000, 10000, 15000, 25000, 40000, 60000, 100000)
+SAVINGS_BANDS = (0, 5000, 10000, 25000, 50000, 100000, 250000, 500000)
+
+
+def to_band(value: Optional[float], edges: Sequence[float]) -> Optional[str]:
+    """Bucket a number into a labelled band such as ``"10000-15000"``"""
+    if value is None:
+        return None
+    i = bisect_right(edges, value) - 1
+    if i < 0:
+        return f"<{edges[0]}"
+    if i == len(edges) - 1:
+        return f"{edges[-1]}+"
+    return f"{edges[i]}-{edges[i + 1]}"
+
+
+def normalize_text(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    return " ".join(str(value).split()).casefold()
+
+
+def profile_cache_key(namespace: str, monthly_income: Optional[float] = None,
+                      existing_savings: Optional[float] = None, location: Optional[str] = None,
+                      business_type: Optional[str] = None, language: Optional[str] = None,
+                      **extra: Any) -> str:
+    """Build a cache key from the parts of a profile that shape the advice"""
+    parts = {
+        "income": to_band(monthly_income, INCOME_BANDS),
+        "savings": to_band(existing_savings, SAVINGS_BANDS),
+        "location": normalize_text(location),
+        "business": normalize_text(business_type),
+        "language": normalize_text(language) or "english",
+    }
+    parts.update({name: normalize_text(value) for name, value in extra.items()})
+    digest = hashlib.sha1(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+    return f"{namespace}:{digest}"
+
+
+class SQLiteBackend:
+    """Persistent key/value store shared between processes"""
+
+    def __init__(self, path: str, max_entries: int = LLM_CACHE_MAX_DISK_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        conn = self._conn()
+        conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires_at)")
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections cannot be shared across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str):
+        row = self._conn().execute(
+            "SELECT value, expires_at FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, key: str, value: Any, expires_at: float) -> None:
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value), expires_at),
+        )
+        self._writes += 1
+        if self._writes % 500 == 0:
+            self._prune(conn)
+        conn.commit()
+
+    def _prune(self, conn: sqlite3.Connection) -> None:
+        conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+        conn.execute(
+            "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def clear(self) -> None:
+        conn = self._conn()
+        conn.execute("DELETE FROM cache")
+        conn.commit()
+
+
+class ResponseCache:
+    """LRU + TTL cache with an optional persistent backend and hit/miss counters"""
+
+    def __init__(self, max_entries: int = LLM_CACHE_MAX_ENTRIES, ttl: float = LLM_CACHE_TTL_SECONDS,
+                 backend: Optional[SQLiteBackend] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.backend = backend
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+
+        stored = self.backend.get(key) if self.backend else None
+        with self._lock:
+            if stored is None:
+                self.misses += 1
+                return None
+            value, expires_at = stored
+            self.hits += 1
+            self.disk_hits += 1
+            self._remember(key, value, expires_at)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, value, expires_at)
+        if self.backend:
+            self.backend.set(key, value, expires_at)
+
+    def _remember(self, key: str, value: Any, expires_at: float) -> None:
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        if self.backend:
+            self.backend.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "persistent": self.backend is not None,
+            }
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Return the process-wide response cache"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                backend = SQLiteBackend(LLM_CACHE_PATH) if LLM_CACHE_PATH else None
+                _cache = ResponseCache(backend=backend)
+                registry.register_stats("response_cache", _cache.stats)
+    return _cache
@@ -0,0 +1,154 @@
+"""Model tiering: the fast model for simple calls, the pro model only when needed.
+
+``RoutedModel`` stands in for ``LazyModel`` and picks a tier for every call
+from the request's query type, the size of the prompt, the response schema
+it asks for and a cheap local complexity score, unless the caller pins a
+tier with ``routing_scope(tier=...)``. Calls made inside ``escalate()``
+always go to the pro tier; ``generate_structured`` retries there when
+fast-tier output fails validation. Every decision is counted by
+tier and reason, and each tier's latency is recorded, on /metrics.
+"""
+import contextvars
+import os
+import re
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from typing import Optional, Tuple
+
+from common.metrics import registry
+from common.models import DEFAULT_MODEL, LazyModel
+from common.sessions import estimate_tokens
+
+# Set to 0 to send every call to the pro tier
+MODEL_ROUTING = os.getenv("MODEL_ROUTING", "1") == "1"
+LLM_FAST_MODEL = os.getenv("LLM_FAST_MODEL", "gemini-1.5-flash")
+LLM_PRO_MODEL = os.getenv("LLM_PRO_MODEL", DEFAULT_MODEL)
+# Complexity score from which a call goes to the pro tier
+ROUTING_PRO_SCORE = float(os.getenv("ROUTING_PRO_SCORE", "3"))
+
+FAST = "fast"
+PRO = "pro"
+
+# How much reasoning answers to each query type usually need
+QUERY_TYPE_WEIGHTS = {
+    "general": 0.0,
+    "savings": 0.5,
+    "insurance": 1.0,
+    "government_schemes": 1.0,
+    "loan": 1.5,
+    "investment": 2.0,
+    "business_advice": 2.0,
+    # The complete multi-section plans
+    "financial_plan": 3.0,
+}
+# Phrases that signal comparison or multi-step reasoning
+COMPLEX_PHRASES = re.compile(
+    r"\b(compare|comparison|versus|vs|strategy|calculate|tax|emi|portfolio|diversif\w*|long[- ]term|"
+    r"step[- ]by[- ]step|pros and cons|which is better|trade[- ]?off)\b",
+    re.IGNORECASE,
+)
+_NUMBER = re.compile(r"\d[\d,]*(?:\.\d+)?")
+# Prompt tokens, and response schema properties, worth one point of complexity
+TOKENS_PER_POINT = 500
+PROPERTIES_PER_POINT = 10
+
+registry.describe("llm_route_total", "Model calls by the tier they were routed to and why")
+registry.describe("llm_tier_duration_seconds", "Model call latency by tier")
+
+
+@dataclass(frozen=True)
+class RouteHint:
+    # QueryType value, or "financial_plan" for the full advice documents
+    query_type: Optional[str] = None
+    # The user's own words; scored instead of the whole prompt when given
+    text: Optional[str] = None
+    # FAST or PRO to skip scoring, for calls whose difficulty is known up front
+    tier: Optional[str] = None
+    escalated: bool = False
+
+
+_hint: contextvars.ContextVar = contextvars.ContextVar("route_hint", default=RouteHint())
+
+
+@contextmanager
+def routing_scope(**hint):
+    """Route the enclosed model calls with the given ``RouteHint`` fields"""
+    token = _hint.set(replace(_hint.get(), **hint))
+    try:
+        yield
+    finally:
+        _hint.reset(token)
+
+
+def escalate():
+    """Send the enclosed model calls to the pro tier"""
+    return routing_scope(escalated=True)
+
+
+def _properties(schema) -> int:
+    if isinstance(schema, dict):
+        return len(schema.get("properties", {})) + sum(_properties(value) for value in schema.values())
+    if isinstance(schema, list):
+        return sum(_properties(item) for item in schema)
+    return 0
+
+
+def complexity(text: str, query_type: Optional[str] = None, schema: Optional[dict] = None) -> float:
+    """Cheap estimate of how hard a call is; ``ROUTING_PRO_SCORE`` and above goes to the pro tier"""
+    score = QUERY_TYPE_WEIGHTS.get(query_type, 0.0)
+    score += estimate_tokens(text) / TOKENS_PER_POINT
+    score += _properties(schema) / PROPERTIES_PER_POINT
+    score += min(2.0, 0.5 * len({phrase.lower() for phrase in COMPLEX_PHRASES.findall(text)}))
+    if len(_NUMBER.findall(text)) >= 3:
+        score += 0.5
+    # Several questions at once
+    score += min(1.0, 0.5 * max(0, text.count("?") - 1))
+    return score
+
+
+def choose_tier(prompt, generation_config=None, default_query_type: Optional[str] = None) -> Tuple[str, str]:
+    """(tier, reason) for a call with ``prompt`` under the current routing scope"""
+    hint = _hint.get()
+    if not MODEL_ROUTING:
+        return PRO, "disabled"
+    if hint.escalated:
+        return PRO, "escalated"
+    if hint.tier is not None:
+        return hint.tier, "pinned"
+    schema = generation_config.get("response_schema") if isinstance(generation_config, dict) else None
+    text = hint.text if hint.text is not None else (prompt if isinstance(prompt, str) else "")
+    score = complexity(text, hint.query_type or default_query_type, schema)
+    return (PRO, "complex") if score >= ROUTING_PRO_SCORE else (FAST, "simple")
+
+
+class RoutedModel:
+    """Drop-in for ``LazyModel`` that sends each call to the fast or the pro model"""
+
+    def __init__(self, fast: str = LLM_FAST_MODEL, pro: str = LLM_PRO_MODEL, query_type: Optional[str] = None):
+        self.models = {FAST: LazyModel(fast), PRO: LazyModel(pro)}
+        # Used when the calling request does not say what kind of query it is
+        self.query_type = query_type
+
+    def generate_content(self, prompt, **kwargs):
+        tier, reason = choose_tier(prompt, kwargs.get("generation_config"), self.query_type)
+        registry.inc("llm_route_total", tier=tier, reason=reason)
+        model = self.models[tier]
+        if kwargs.get("stream", False):
+            return self._timed_stream(model, tier, prompt, kwargs)
+        started = time.perf_counter()
+        try:
+            return model.generate_content(prompt, **kwargs)
+        finally:
+            registry.observe("llm_tier_duration_seconds", time.perf_counter() - started, tier=tier)
+
+    def _timed_stream(self, model, tier: str, prompt, kwargs):
+        started = time.perf_counter()
+        try:
+            yield from model.generate_content(prompt, **kwargs)
+        finally:
+            registry.observe("llm_tier_duration_seconds", time.perf_counter() - started, tier=tier)
+
+    def check_admission(self, backlog: int = 0) -> None:
+        # Both tiers share the scheduler and circuit breaker
+        self.models[PRO].check_admission(backlog)
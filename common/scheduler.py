@@ -0,0 +1,376 @@
+"""Quota-aware scheduling of model calls.
+
+Every call to the model passes through one process-wide scheduler that:
+
+* keeps request and token rates inside ``LLM_RPM`` / ``LLM_TPM`` with token
+  buckets, queueing excess calls by priority (interactive before batch);
+* rejects new work straight away with a retry hint once the queue is full or
+  the wait for quota would exceed ``LLM_QUEUE_TIMEOUT_SECONDS``;
+* retries transient API errors with jittered exponential backoff;
+* optionally hedges a call that runs past the observed p95 latency by
+  issuing a second one and taking whichever answers first.
+
+``ScheduledModel`` wraps a ``GenerativeModel`` so existing
+``model.generate_content(...)`` call sites go through the scheduler unchanged.
+"""
+import contextvars
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Callable, Optional, Tuple
+
+from common.circuit_breaker import CircuitBreaker, get_circuit_breaker
+from common.llm_client import Overloaded
+from common.metrics import record_tokens, registry, stage
+from common.sessions import estimate_tokens
+
+LLM_RPM = float(os.getenv("LLM_RPM", "60"))
+LLM_TPM = float(os.getenv("LLM_TPM", "1000000"))
+LLM_QUEUE_LIMIT = int(os.getenv("LLM_QUEUE_LIMIT", "64"))
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "30"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.5"))
+LLM_RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", "8"))
+LLM_HEDGE = os.getenv("LLM_HEDGE", "0") == "1"
+# Output tokens charged up front; corrected from the response's usage metadata
+LLM_EXPECTED_OUTPUT_TOKENS = int(os.getenv("LLM_EXPECTED_OUTPUT_TOKENS", "800"))
+
+INTERACTIVE = 0
+BATCH = 1
+
+# Latency samples needed before hedging starts
+HEDGE_MIN_SAMPLES = 20
+
+
+@lru_cache(maxsize=1)
+def retryable_errors() -> Tuple[tuple, tuple]:
+    """(transient, rate-limit) exception types; resolved on first use to keep the API client off the import path"""
+    try:
+        from google.api_core import exceptions as google_exceptions
+        transient = (
+            google_exceptions.TooManyRequests,
+            google_exceptions.ResourceExhausted,
+            google_exceptions.ServiceUnavailable,
+            google_exceptions.InternalServerError,
+            google_exceptions.DeadlineExceeded,
+        )
+        rate_limit = (google_exceptions.TooManyRequests, google_exceptions.ResourceExhausted)
+    except ImportError:
+        transient = ()
+        rate_limit = ()
+    return transient + (ConnectionError, TimeoutError), rate_limit
+
+
+# Priority of model calls made from the current request or job
+current_priority: contextvars.ContextVar = contextvars.ContextVar("llm_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def priority_scope(priority: int):
+    """Run the enclosed model calls at ``priority``"""
+    token = current_priority.set(priority)
+    try:
+        yield
+    finally:
+        current_priority.reset(token)
+
+
+class TokenBucket:
+    """Refills at ``rate_per_minute``; holds at most one minute's worth"""
+
+    def __init__(self, rate_per_minute: float):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = rate_per_minute
+        self.tokens = rate_per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until ``amount`` tokens are available"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.tokens -= min(amount, self.capacity)
+
+    def adjust(self, amount: float) -> None:
+        # Negative after an underestimate; the debt is paid back by the refill
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class Scheduler:
+    """Rate budgets, priority queue, retries and hedging for model calls"""
+
+    def __init__(self, rpm: float = LLM_RPM, tpm: float = LLM_TPM, queue_limit: int = LLM_QUEUE_LIMIT,
+                 queue_timeout: float = LLM_QUEUE_TIMEOUT_SECONDS, max_retries: int = LLM_MAX_RETRIES,
+                 hedge: bool = LLM_HEDGE):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.queue_limit = queue_limit
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.hedge = hedge
+        self._queue = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._latencies = deque(maxlen=200)
+        self._hedge_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="llm-hedge") if hedge else None
+        self.admitted = 0
+        self.rejected = 0
+        self.retries = 0
+        self.hedged = 0
+
+    def _drain_estimate(self, backlog: int) -> float:
+        return backlog / self.requests.rate
+
+    def check_admission(self, backlog: int = 0) -> None:
+        """Raise Overloaded if ``backlog`` more callers would push the queue past its limit"""
+        with self._cond:
+            depth = len(self._queue) + backlog
+            if depth >= self.queue_limit:
+                self.rejected += 1
+                raise Overloaded("Too many requests are waiting for the model; try again shortly",
+                                 503, self._drain_estimate(depth))
+
+    def _admit(self, priority: int, tokens: int) -> None:
+        """Block until this call may run under the rate budgets, in priority order"""
+        with self._cond:
+            if len(self._queue) >= self.queue_limit:
+                self.rejected += 1
+                raise Overloaded("Too many requests are waiting for the model; try again shortly",
+                                 503, self._drain_estimate(len(self._queue)))
+            ticket = [priority, next(self._seq)]
+            heapq.heappush(self._queue, ticket)
+            deadline = time.monotonic() + self.queue_timeout
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait_for = None
+                    if self._queue[0] is ticket:
+                        wait_for = max(self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+                        if wait_for == 0:
+                            self.requests.take(1)
+                            self.tokens.take(tokens)
+                            heapq.heappop(self._queue)
+                            self.admitted += 1
+                            return
+                        if now + wait_for > deadline:
+                            self.rejected += 1
+                            raise Overloaded("Model quota is exhausted; try again shortly", 429, wait_for)
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self.rejected += 1
+                        raise Overloaded("Timed out waiting for model quota", 503,
+                                         self._drain_estimate(len(self._queue)))
+                    self._cond.wait(min(wait_for, remaining) if wait_for else remaining)
+            finally:
+                if ticket in self._queue:
+                    self._queue.remove(ticket)
+                    heapq.heapify(self._queue)
+                self._cond.notify_all()
+
+    def _settle(self, charged: int, response) -> None:
+        usage = getattr(response, "usage_metadata", None)
+        actual = getattr(usage, "total_token_count", None)
+        if actual:
+            with self._cond:
+                self.tokens.adjust(actual - charged)
+
+    def _call_once(self, call: Callable, priority: int, tokens: int):
+        self._admit(priority, tokens)
+        started = time.monotonic()
+        response = call()
+        with self._cond:
+            self._latencies.append(time.monotonic() - started)
+        self._settle(tokens, response)
+        return response
+
+    def p95_latency(self) -> Optional[float]:
+        with self._cond:
+            samples = sorted(self._latencies)
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return samples[int(0.95 * (len(samples) - 1))]
+
+    def _hedged_call(self, call: Callable, priority: int, tokens: int):
+        deadline = self.p95_latency()
+        if deadline is None:
+            return self._call_once(call, priority, tokens)
+        # Each attempt runs in a copy of the caller's context (metrics route, model tier)
+        first = self._hedge_executor.submit(contextvars.copy_context().run, self._call_once, call, priority, tokens)
+        done, _ = wait([first], timeout=deadline)
+        if done:
+            return first.result()
+        try:
+            second = self._hedge_executor.submit(
+                contextvars.copy_context().run, self._call_once, call, priority, tokens
+            )
+        except RuntimeError:
+            return first.result()
+        self.hedged += 1
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def run(self, call: Callable, prompt: str = "", priority: Optional[int] = None, retry: bool = True,
+            before_retry: Optional[Callable[[], None]] = None):
+        """Run ``call`` (a zero-argument model call) under the scheduler.
+
+        ``before_retry`` is called ahead of every retry and stops the retries by raising,
+        e.g. a circuit breaker's check once the failures have opened it.
+        """
+        priority = current_priority.get() if priority is None else priority
+        tokens = estimate_tokens(prompt) + LLM_EXPECTED_OUTPUT_TOKENS
+        transient_errors, rate_limit_errors = retryable_errors()
+        attempt = 0
+        while True:
+            try:
+                if self.hedge and retry:
+                    return self._hedged_call(call, priority, tokens)
+                return self._call_once(call, priority, tokens)
+            except transient_errors as e:
+                if not retry or attempt >= self.max_retries:
+                    if isinstance(e, rate_limit_errors):
+                        raise Overloaded("Model rate limit reached; try again shortly", 429,
+                                         LLM_RETRY_MAX_SECONDS) from e
+                    raise
+                # Full jitter keeps retries from many workers from lining up
+                delay = random.uniform(0, min(LLM_RETRY_MAX_SECONDS, LLM_RETRY_BASE_SECONDS * 2 ** attempt))
+                attempt += 1
+                self.retries += 1
+                time.sleep(delay)
+                if before_retry is not None:
+                    before_retry()
+
+    def stats(self) -> dict:
+        with self._cond:
+            samples = sorted(self._latencies)
+            return {
+                "queued": len(self._queue),
+                "queue_limit": self.queue_limit,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "retries": self.retries,
+                "hedged": self.hedged,
+                "request_tokens_available": round(self.requests.tokens, 1),
+                "tpm_tokens_available": round(self.tokens.tokens),
+                "latency_p50": round(samples[len(samples) // 2], 3) if samples else None,
+                "latency_p95": round(samples[int(0.95 * (len(samples) - 1))], 3) if samples else None,
+            }
+
+
+class ScheduledModel:
+    """Drop-in stand-in for a GenerativeModel that routes calls through the breaker and scheduler"""
+
+    def __init__(self, model, scheduler: Optional[Scheduler] = None, breaker: Optional[CircuitBreaker] = None):
+        self.model = model
+        self.scheduler = scheduler or get_scheduler()
+        self.breaker = breaker or get_circuit_breaker()
+
+    def generate_content(self, prompt, **kwargs):
+        streaming = kwargs.get("stream", False)
+
+        def call():
+            started = time.monotonic()
+            try:
+                response = self.model.generate_content(prompt, **kwargs)
+            except Exception:
+                self.breaker.record(True, time.monotonic() - started)
+                raise
+            # Whether a stream succeeded is only known once it has been read; _metered_stream records it
+            if not streaming:
+                self.breaker.record(False, time.monotonic() - started)
+            return response
+
+        # Refuse at once while the upstream is known to be failing
+        self.breaker.check()
+        # A stream that has started cannot be replayed, so only its admission is scheduled
+        text_prompt = prompt if isinstance(prompt, str) else ""
+        if streaming:
+            return self._metered_stream(call, text_prompt)
+        with stage("llm"):
+            response = self._run(call, text_prompt, retry=True)
+        _record_usage(text_prompt, response, _response_text(response))
+        return response
+
+    def _run(self, call, prompt: str, retry: bool):
+        try:
+            return self.scheduler.run(call, prompt, retry=retry, before_retry=self.breaker.check)
+        except Overloaded:
+            self.breaker.release()
+            raise
+
+    def _metered_stream(self, call, prompt: str):
+        # Timed and counted as the caller drains it, so the stage covers the whole answer;
+        # a stream the caller closes early is counted up to where it stopped
+        with stage("llm"):
+            started = time.monotonic()
+            response = self._run(call, prompt, retry=False)
+            parts = []
+            failed = False
+            # Latency is judged on the first chunk, as the user sees it; a long answer is not a slow call
+            first_chunk = None
+            try:
+                for chunk in response:
+                    if first_chunk is None:
+                        first_chunk = time.monotonic()
+                    parts.append(_response_text(chunk))
+                    yield chunk
+            except Exception:
+                failed = True
+                raise
+            finally:
+                # A stream the caller stops early was still being served, so only an error counts as a failure
+                self.breaker.record(failed, (first_chunk or time.monotonic()) - started)
+                _record_usage(prompt, None, "".join(parts))
+
+    def check_admission(self, backlog: int = 0) -> None:
+        self.breaker.check(probe=False)
+        self.scheduler.check_admission(backlog)
+
+
+def _response_text(response) -> str:
+    try:
+        return response.text or ""
+    except ValueError:
+        return ""
+
+
+def _record_usage(prompt: str, response, text: str) -> None:
+    # Prefer the API's own counts; estimate when the response carries none
+    usage = getattr(response, "usage_metadata", None)
+    prompt_tokens = getattr(usage, "prompt_token_count", None) or estimate_tokens(prompt)
+    response_tokens = getattr(usage, "candidates_token_count", None) or estimate_tokens(text)
+    record_tokens(prompt_tokens, response_tokens, getattr(usage, "cached_content_token_count", None) or 0)
+
+
+_scheduler: Optional[Scheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> Scheduler:
+    """Return the process-wide scheduler"""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = Scheduler()
+                registry.register_stats("llm_scheduler", _scheduler.stats)
+    return _scheduler
@@ -0,0 +1,125 @@
+"""Typed shapes of the structured model responses.
+
+The same classes are sent to Gemini as the response schema in JSON mode and
+used to validate what comes back, so the prompt templates, the generation
+constraint and the parser cannot drift apart.
+"""
+from typing import List
+
+from pydantic import BaseModel, ConfigDict
+
+
+class _Schema(BaseModel):
+    # Models sometimes answer "cost": 5000; unknown keys are dropped rather than passed to clients
+    model_config = ConfigDict(extra="ignore", coerce_numbers_to_str=True)
+
+
+class CostLine(_Schema):
+    item: str
+    cost: str
+
+
+class InitialInvestment(_Schema):
+    text: str
+    details: List[CostLine] = []
+
+
+class BusinessPlanning(_Schema):
+    initialInvestment: InitialInvestment
+    setupProcess: List[str]
+    localRegulations: str
+
+
+class BudgetLine(_Schema):
+    item: str
+    amount: str
+
+
+class MonthlyBudget(_Schema):
+    text: str
+    # Filled in locally from finmath; the model is not asked for it
+    details: List[BudgetLine] = []
+
+
+class FinancialPlanning(_Schema):
+    monthlyBudget: MonthlyBudget
+    savingsTargets: str
+    emergencyFund: str
+    # This user's savings and emergency fund amounts, filled in locally like the budget lines
+    figures: List[BudgetLine] = []
+
+
+class SchemeMention(_Schema):
+    name: str
+    details: str
+
+
+class GovernmentSchemes(_Schema):
+    text: str
+    schemes: List[SchemeMention]
+
+
+class Strategy(_Schema):
+    point: str
+    details: str
+
+
+class RiskManagement(_Schema):
+    text: str
+    strategies: List[Strategy]
+
+
+class Resource(_Schema):
+    name: str
+    link: str = ""
+
+
+class FinancialEducation(_Schema):
+    text: str
+    resources: List[Resource]
+
+
+class FinancialAdvice(_Schema):
+    businessPlanning: BusinessPlanning
+    financialPlanning: FinancialPlanning
+    governmentSchemes: GovernmentSchemes
+    riskManagement: RiskManagement
+    financialEducation: FinancialEducation
+
+
+class ClientDetails(_Schema):
+    name: str
+    age: int
+    location: str
+    monthlyIncome: float
+    familySize: int
+    businessInterest: str
+    currentSavings: float
+    financialGoal: str
+    riskTolerance: str
+
+
+class AdviceDocument(_Schema):
+    """The /api/financial-advice response"""
+    clientDetails: ClientDetails
+    financialAdvice: FinancialAdvice
+
+
+class SchemeRecommendation(_Schema):
+    """The /api/recommend-scheme response when it comes from the model"""
+    scheme_name: str
+    description: str
+
+
+class SchemeDetails(_Schema):
+    """The /api/scheme-details response"""
+    scheme_name: str
+    description: str
+    eligibility: str
+    benefits: str
+    how_to_apply: str
+
+
+class Translations(_Schema):
+    """A batch of translated segments, in the order they were sent"""
+    translations: List[str]
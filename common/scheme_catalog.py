@@ -0,0 +1,254 @@
+"""In-memory government scheme catalog with lookup indexes"""
+import json
+import os
+import re
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+SCHEME_DATABASE_PATH = os.getenv("SCHEME_DATABASE_PATH", "scheme_database.json")
+BUNDLED_SCHEMES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "schemes.json")
+# How often (seconds) the file's mtime is checked for hot reload
+SCHEME_RELOAD_INTERVAL = float(os.getenv("SCHEME_RELOAD_INTERVAL", "5"))
+
+ALL_STATES = "*"
+ANY_SOURCE = "*"
+
+# Scheme categories that answer each QueryType; empty means every category
+QUERY_TYPE_CATEGORIES = {
+    "business_advice": ("business",),
+    "savings": ("savings", "pension", "financial_inclusion"),
+    "loan": ("credit",),
+    "government_schemes": (),
+    "investment": ("savings", "pension"),
+    "insurance": ("social_security", "health"),
+    "general": (),
+}
+
+INDIAN_STATES = (
+    "andhra pradesh", "arunachal pradesh", "assam", "bihar", "chhattisgarh", "goa", "gujarat",
+    "haryana", "himachal pradesh", "jharkhand", "karnataka", "kerala", "madhya pradesh",
+    "maharashtra", "manipur", "meghalaya", "mizoram", "nagaland", "odisha", "punjab", "rajasthan",
+    "sikkim", "tamil nadu", "telangana", "tripura", "uttar pradesh", "uttarakhand", "west bengal",
+    "andaman and nicobar islands", "chandigarh", "dadra and nagar haveli and daman and diu",
+    "delhi", "jammu and kashmir", "ladakh", "lakshadweep", "puducherry",
+)
+STATE_ALIASES = {"orissa": "odisha", "up": "uttar pradesh", "mp": "madhya pradesh", "j&k": "jammu and kashmir"}
+
+# (label, min_age, max_age) bands used to index age eligibility
+AGE_BANDS = (("minor", 0, 17), ("young", 18, 40), ("middle", 41, 59), ("senior", 60, 200))
+
+
+@lru_cache(maxsize=4096)
+def detect_state(location: Optional[str]) -> Optional[str]:
+    """Pull a canonical state name out of a free-text "State/District" field"""
+    if not location:
+        return None
+    text = location.lower()
+    for state in INDIAN_STATES:
+        if state in text:
+            return state
+    for token in re.split(r"[^a-z&]+", text):
+        if token in STATE_ALIASES:
+            return STATE_ALIASES[token]
+    return None
+
+
+def age_band(age: Optional[int]) -> Optional[str]:
+    if age is None:
+        return None
+    for label, low, high in AGE_BANDS:
+        if low <= age <= high:
+            return label
+    return None
+
+
+def _normalize_records(data) -> List[dict]:
+    """Accept both the rich record list and the legacy {category: [names]} layout"""
+    if isinstance(data, dict):
+        records = []
+        for category, names in data.items():
+            for name in names:
+                records.append({"name": name, "categories": [category]})
+        data = records
+
+    normalized = []
+    for record in data:
+        record = dict(record)
+        record.setdefault("id", re.sub(r"[^a-z0-9]+", "-", record["name"].lower()).strip("-"))
+        record.setdefault("aliases", [])
+        record.setdefault("categories", [])
+        record.setdefault("description", "")
+        record.setdefault("income_sources", [])
+        record["states"] = [state.lower() for state in record.get("states", [])]
+        record.setdefault("eligibility", {})
+        normalized.append(record)
+    return normalized
+
+
+class SchemeCatalog:
+    """Immutable, indexed snapshot of the scheme database"""
+
+    def __init__(self, records: Iterable[dict], source: Optional[str] = None, mtime: float = 0.0):
+        self.source = source
+        self.mtime = mtime
+        self.schemes: Dict[str, dict] = {}
+        self.by_category: Dict[str, set] = {}
+        self.by_income_source: Dict[str, set] = {}
+        self.by_state: Dict[str, set] = {}
+        self.by_age_band: Dict[str, set] = {label: set() for label, _, _ in AGE_BANDS}
+        self.by_attribute: Dict[str, set] = {}
+        # Per-snapshot memo so a reload drops stale answers along with the old indexes
+        self._match = lru_cache(maxsize=2048)(self._match_uncached)
+
+        for record in _normalize_records(records):
+            scheme_id = record["id"]
+            self.schemes[scheme_id] = record
+            for category in record["categories"]:
+                self.by_category.setdefault(category, set()).add(scheme_id)
+            for source_name in record["income_sources"] or [ANY_SOURCE]:
+                self.by_income_source.setdefault(source_name, set()).add(scheme_id)
+            for state in record["states"] or [ALL_STATES]:
+                self.by_state.setdefault(state, set()).add(scheme_id)
+
+            rules = record["eligibility"]
+            min_age, max_age = rules.get("min_age") or 0, rules.get("max_age") or 200
+            for label, low, high in AGE_BANDS:
+                if min_age <= high and max_age >= low:
+                    self.by_age_band[label].add(scheme_id)
+            for attribute in ("women", "requires_bank_account", "for_unbanked"):
+                if rules.get(attribute):
+                    self.by_attribute.setdefault(attribute, set()).add(scheme_id)
+
+    def __len__(self) -> int:
+        return len(self.schemes)
+
+    def get(self, scheme_id: str) -> Optional[dict]:
+        return self.schemes.get(scheme_id)
+
+    def as_category_dict(self) -> Dict[str, List[str]]:
+        """Category -> scheme names, the layout ``load_scheme_database`` used to return"""
+        return {
+            category: sorted(self.schemes[scheme_id]["name"] for scheme_id in ids)
+            for category, ids in self.by_category.items()
+        }
+
+    def _eligible(self, scheme: dict, age: Optional[int], monthly_income: Optional[float]) -> bool:
+        rules = scheme["eligibility"]
+        if age is not None:
+            if rules.get("min_age") and age < rules["min_age"]:
+                return False
+            if rules.get("max_age") and age > rules["max_age"]:
+                return False
+        if monthly_income is not None and rules.get("max_monthly_income") and monthly_income > rules["max_monthly_income"]:
+            return False
+        return True
+
+    def _match_uncached(self, query_type: Optional[str], income_sources: Tuple[str, ...], state: Optional[str],
+                        age: Optional[int], monthly_income: Optional[float], has_bank_account: Optional[bool],
+                        limit: int) -> Tuple[dict, ...]:
+        categories = QUERY_TYPE_CATEGORIES.get(query_type, ())
+        in_category = set().union(*(self.by_category.get(c, ()) for c in categories)) if categories else None
+        source_hits = set().union(*(self.by_income_source.get(s, ()) for s in income_sources))
+        if income_sources:
+            candidates = source_hits | self.by_income_source.get(ANY_SOURCE, set())
+        else:
+            candidates = set(self.schemes)
+        if in_category is not None:
+            candidates &= in_category
+        if state:
+            candidates &= self.by_state.get(state, set()) | self.by_state.get(ALL_STATES, set())
+        else:
+            candidates &= self.by_state.get(ALL_STATES, set())
+        band = age_band(age)
+        if band:
+            candidates &= self.by_age_band[band]
+        if has_bank_account:
+            candidates -= self.by_attribute.get("for_unbanked", set())
+
+        unbanked = self.by_attribute.get("for_unbanked", set())
+
+        def rank(scheme_id):
+            scheme = self.schemes[scheme_id]
+            score = (
+                (2 if scheme_id in source_hits else 0)
+                + (1 if state and state in scheme["states"] else 0)
+                + (1 if has_bank_account is False and scheme_id in unbanked else 0)
+            )
+            return -score, scheme["name"]
+
+        ranked = sorted(
+            (scheme_id for scheme_id in candidates
+             if self._eligible(self.schemes[scheme_id], age, monthly_income)),
+            key=rank,
+        )
+        return tuple(self.schemes[scheme_id] for scheme_id in ranked[:limit])
+
+    def match(self, query_type: Optional[str] = None, income_sources: Iterable[str] = (),
+              location: Optional[str] = None, age: Optional[int] = None,
+              monthly_income: Optional[float] = None, has_bank_account: Optional[bool] = None,
+              limit: int = 3) -> List[dict]:
+        """Return the few schemes most relevant to a user's context"""
+        return list(self._match(
+            query_type, tuple(sorted(income_sources)), detect_state(location),
+            age, monthly_income, has_bank_account, limit,
+        ))
+
+
+def load_scheme_records(path: str) -> Tuple[list, str, float]:
+    """Read the scheme file, falling back to the bundled list if it is missing"""
+    for candidate in (path, BUNDLED_SCHEMES_PATH):
+        try:
+            mtime = os.stat(candidate).st_mtime
+            with open(candidate, "r", encoding="utf-8") as f:
+                return json.load(f), candidate, mtime
+        except FileNotFoundError:
+            continue
+    return [], path, 0.0
+
+
+class CatalogHolder:
+    """Keeps the current catalog and swaps in a fresh one when the file changes"""
+
+    def __init__(self, path: str = SCHEME_DATABASE_PATH, reload_interval: float = SCHEME_RELOAD_INTERVAL):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._checked_at = time.monotonic()
+        self._catalog = SchemeCatalog(*load_scheme_records(path))
+
+    def _stale(self) -> bool:
+        current = self._catalog
+        try:
+            # A database file appearing next to the app takes over from the bundled list
+            if current.source != self.path and os.path.exists(self.path):
+                return True
+            return os.stat(current.source).st_mtime != current.mtime
+        except (OSError, TypeError):
+            return False
+
+    def get(self) -> SchemeCatalog:
+        now = time.monotonic()
+        if now - self._checked_at >= self.reload_interval:
+            with self._lock:
+                if now - self._checked_at >= self.reload_interval:
+                    self._checked_at = now
+                    if self._stale():
+                        try:
+                            self._catalog = SchemeCatalog(*load_scheme_records(self.path))
+                        except ValueError:
+                            # Half-written file; keep serving the last good snapshot
+                            pass
+        return self._catalog
+
+
+_holder: Optional[CatalogHolder] = None
+
+
+def get_scheme_catalog() -> SchemeCatalog:
+    """Return the process-wide catalog, reloading it if the file changed"""
+    global _holder
+    if _holder is None:
+        _holder = CatalogHolder()
+    return _holder.get()
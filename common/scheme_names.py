@@ -0,0 +1,180 @@
+"""Canonical scheme names from free-text input.
+
+Every scheme's name, aliases and ID are normalized into compact keys
+("PM-KISAN", "pm kisan" and "PMKisan" all become ``pmkisan``). Lookups try an
+exact key first, then trigram candidates confirmed by edit distance, so
+spelling variants resolve to one scheme ID that can be cached. Short keys and
+all-caps acronyms must match exactly: one letter is all that separates
+acronyms of unrelated schemes, such as PMAY (housing) and PMJAY (health). A sorted list
+of word-start keys backs prefix autocomplete.
+"""
+import re
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Optional, Set, Tuple
+
+from common.scheme_catalog import SchemeCatalog, get_scheme_catalog
+
+# Spelled-out forms folded to the short form used in most names
+EXPANSIONS = (
+    (re.compile(r"\bpradhan\s*mantri\b"), "pm"),
+    (re.compile(r"\bprime\s*minister'?s?\b"), "pm"),
+)
+# Words that do not tell one scheme from another
+FILLER_WORDS = frozenset(("scheme", "schemes", "yojana", "yojna", "the", "of", "for", "programme", "program"))
+NON_ALNUM = re.compile(r"[^0-9a-z]+")
+# A single token in capitals, e.g. "PMAY" or "PM-KISAN"
+ACRONYM = re.compile(r"^[A-Z0-9][A-Z0-9-]*$")
+
+# Shortest alias that may match as a substring of a longer input
+MIN_CONTAINED_LENGTH = 5
+# Shortest key that may match a name with spelling mistakes
+MIN_FUZZY_LENGTH = 6
+# Trigram overlap (Dice) a candidate needs before edit distance is checked
+MIN_TRIGRAM_SIMILARITY = 0.4
+
+
+def normalize_name(text: str) -> str:
+    """Lowercase words with punctuation, filler and spelled-out prefixes removed"""
+    text = str(text).casefold()
+    for pattern, replacement in EXPANSIONS:
+        text = pattern.sub(replacement, text)
+    words = [word for word in NON_ALNUM.sub(" ", text).split() if word not in FILLER_WORDS]
+    return " ".join(words)
+
+
+def compact_key(text: str) -> str:
+    return normalize_name(text).replace(" ", "")
+
+
+def trigrams(key: str) -> Set[str]:
+    padded = f"#{key}#"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance, or ``limit + 1`` as soon as it must exceed ``limit``"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class SchemeNameIndex:
+    """Name lookup structures for one catalog snapshot"""
+
+    def __init__(self, catalog: SchemeCatalog):
+        self.catalog = catalog
+        self.exact: Dict[str, str] = {}
+        self.by_trigram: Dict[str, Set[str]] = {}
+        self.gram_counts: Dict[str, int] = {}
+        prefixes = set()
+
+        for scheme_id, scheme in catalog.schemes.items():
+            for label in [scheme["name"], scheme_id, *scheme.get("aliases", ())]:
+                key = compact_key(label)
+                if not key:
+                    continue
+                self.exact.setdefault(key, scheme_id)
+                grams = trigrams(key)
+                self.gram_counts[key] = len(grams)
+                for gram in grams:
+                    self.by_trigram.setdefault(gram, set()).add(key)
+                # Every word start, so "kisan" and "samman" both complete "PM Kisan Samman Nidhi"
+                words = normalize_name(label).split()
+                for i in range(len(words)):
+                    prefixes.add(("".join(words[i:]), i, scheme_id))
+
+        # Sorted so a prefix's matches form one contiguous run found by bisect
+        self.prefixes: List[Tuple[str, int, str]] = sorted(prefixes)
+
+    def resolve(self, text: str) -> Optional[str]:
+        """Scheme ID for ``text``, or None when nothing is close enough"""
+        key = compact_key(text)
+        if not key:
+            return None
+        scheme_id = self.exact.get(key)
+        if scheme_id is not None or len(key) < MIN_FUZZY_LENGTH or ACRONYM.match(str(text).strip()):
+            return scheme_id
+
+        # Trigram candidates, best overlap first, confirmed by edit distance
+        grams = trigrams(key)
+        overlap: Dict[str, int] = {}
+        for gram in grams:
+            for candidate in self.by_trigram.get(gram, ()):
+                overlap[candidate] = overlap.get(candidate, 0) + 1
+        ranked = sorted(
+            ((2.0 * shared / (len(grams) + self.gram_counts[candidate]), candidate) for candidate, shared in overlap.items()),
+            reverse=True,
+        )
+        for similarity, candidate in ranked[:10]:
+            if similarity < MIN_TRIGRAM_SIMILARITY:
+                break
+            limit = max(1, min(len(key), len(candidate)) // 5)
+            if edit_distance(key, candidate, limit) <= limit:
+                return self.exact[candidate]
+
+        # Input that wraps a full alias, e.g. "details of pm kisan samman nidhi 2024"
+        contained = [candidate for candidate in self.exact
+                     if len(candidate) >= MIN_CONTAINED_LENGTH and candidate in key]
+        if contained:
+            return self.exact[max(contained, key=len)]
+        return None
+
+    def suggest(self, text: str, limit: int = 8) -> List[dict]:
+        """Schemes whose name or an alias has a word starting with ``text``"""
+        key = compact_key(text)
+        if not key:
+            return []
+        results, seen = [], set()
+        position = bisect_left(self.prefixes, (key,))
+        matches = []
+        while position < len(self.prefixes) and self.prefixes[position][0].startswith(key):
+            matches.append(self.prefixes[position])
+            position += 1
+        # Matches at the start of a name before matches on a later word
+        for _, _, scheme_id in sorted(matches, key=lambda match: match[1]):
+            if scheme_id not in seen:
+                seen.add(scheme_id)
+                results.append(scheme_id)
+                if len(results) == limit:
+                    break
+        if not results:
+            scheme_id = self.resolve(text)
+            if scheme_id is not None:
+                results.append(scheme_id)
+        return [{"id": scheme_id, "name": self.catalog.schemes[scheme_id]["name"]} for scheme_id in results]
+
+
+class SchemeNameResolver:
+    """Keeps a name index in step with the hot-reloaded catalog"""
+
+    def __init__(self):
+        self._index: Optional[SchemeNameIndex] = None
+        self._lock = threading.Lock()
+
+    def index(self) -> SchemeNameIndex:
+        catalog = get_scheme_catalog()
+        index = self._index
+        if index is None or index.catalog is not catalog:
+            with self._lock:
+                if self._index is None or self._index.catalog is not catalog:
+                    self._index = SchemeNameIndex(catalog)
+                index = self._index
+        return index
+
+    def resolve(self, text: str) -> Optional[dict]:
+        """The catalog record ``text`` refers to, if any"""
+        index = self.index()
+        scheme_id = index.resolve(text)
+        return index.catalog.get(scheme_id) if scheme_id else None
+
+    def suggest(self, text: str, limit: int = 8) -> List[dict]:
+        return self.index().suggest(text, limit)
@@ -0,0 +1,229 @@
+"""Similarity cache for free-text questions.
+
+Questions are turned into hashed TF-IDF vectors (word stems plus character
+trigrams) and compared by cosine similarity against earlier questions in the
+same partition, e.g. the same query type, language and coarse profile
+buckets. A stored answer is reused when the best match clears
+``SEMANTIC_CACHE_THRESHOLD``. Everything is local NumPy; nothing is sent over
+the network.
+"""
+from __future__ import annotations
+
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
+from typing import Hashable, List, Optional, Tuple
+
+from common.lazy_import import lazy_import
+from common.metrics import registry
+
+# Loaded on first use; see common/lazy_import.py
+np = lazy_import("numpy")
+
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.72"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "5000"))
+SEMANTIC_CACHE_TTL_SECONDS = float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", str(24 * 3600)))
+# Hashed feature space; 4 KB per stored question at float32
+SEMANTIC_CACHE_DIMENSIONS = 1024
+
+# Words that carry no meaning for matching financial questions, then generic ones every question uses
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from get how i if in is it me my of on or our should so
+the their them there this to was we what when where which who why will with would you your please tell
+""".split()) | frozenset("""
+tips advice help ways way best good need want some any much many more money person people worker workers
+""".split())
+
+TOKEN_PATTERN = re.compile(r"[^\W_]+")
+SUFFIXES = ("ing", "ed", "es", "s")
+# Character trigrams count for less than whole words
+TRIGRAM_WEIGHT = 0.5
+
+
+def _stem(word: str) -> str:
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)]
+            break
+    return word[:-1] if word.endswith("e") and len(word) > 3 else word
+
+
+def features(text: str) -> List[Tuple[str, float]]:
+    """Weighted word-stem and trigram features of ``text``"""
+    stems = [_stem(word) for word in TOKEN_PATTERN.findall(text.casefold()) if word not in STOPWORDS]
+    result = [(stem, 1.0) for stem in stems]
+    for stem in stems:
+        padded = f"#{stem}#"
+        result.extend((padded[i:i + 3], TRIGRAM_WEIGHT) for i in range(len(padded) - 2))
+    return result
+
+
+def vectorize(text: str, dimensions: int = SEMANTIC_CACHE_DIMENSIONS) -> np.ndarray:
+    """Sublinear term-frequency vector of ``text`` in a hashed feature space"""
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for feature, weight in features(text):
+        vector[zlib.crc32(feature.encode("utf-8")) % dimensions] += weight
+    np.log1p(vector, out=vector)
+    return vector
+
+
+class _Partition:
+    """Growable matrix of question vectors with document frequencies for IDF"""
+
+    def __init__(self, dimensions: int):
+        self.vectors = np.zeros((8, dimensions), dtype=np.float32)
+        self.doc_freq = np.zeros(dimensions, dtype=np.float32)
+        self.answers: List[str] = []
+        self.questions: List[str] = []
+        self.expires_at: List[float] = []
+        self.last_used: List[float] = []
+
+    def __len__(self) -> int:
+        return len(self.answers)
+
+    def idf(self) -> np.ndarray:
+        return np.log((1.0 + len(self)) / (1.0 + self.doc_freq)) + 1.0
+
+    def nearest(self, vector: np.ndarray) -> Tuple[int, float]:
+        """Row and cosine similarity of the stored question closest to ``vector``"""
+        size = len(self)
+        if not size or not vector.any():
+            return -1, 0.0
+        weights = self.idf() ** 2
+        rows = self.vectors[:size]
+        norms = np.sqrt((rows * rows) @ weights)
+        query_norm = np.sqrt(float((vector * vector) @ weights))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scores = (rows @ (vector * weights)) / (norms * query_norm)
+        scores = np.nan_to_num(scores)
+        row = int(np.argmax(scores))
+        return row, float(scores[row])
+
+    def add(self, vector: np.ndarray, question: str, answer: str, expires_at: float, now: float) -> None:
+        size = len(self)
+        if size == self.vectors.shape[0]:
+            grown = np.zeros((size * 2, self.vectors.shape[1]), dtype=np.float32)
+            grown[:size] = self.vectors
+            self.vectors = grown
+        self.vectors[size] = vector
+        self.doc_freq += vector > 0
+        self.questions.append(question)
+        self.answers.append(answer)
+        self.expires_at.append(expires_at)
+        self.last_used.append(now)
+
+    def remove(self, row: int) -> None:
+        # Move the last row into the gap so the matrix stays dense
+        last = len(self) - 1
+        self.doc_freq -= self.vectors[row] > 0
+        self.vectors[row] = self.vectors[last]
+        self.vectors[last] = 0.0
+        for column in (self.questions, self.answers, self.expires_at, self.last_used):
+            column[row] = column[last]
+            column.pop()
+
+    def oldest(self) -> int:
+        return int(np.argmin(self.last_used))
+
+
+class SemanticCache:
+    """Nearest-neighbour answer cache, partitioned by exact-match context"""
+
+    def __init__(self, threshold: float = SEMANTIC_CACHE_THRESHOLD, max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+                 ttl: float = SEMANTIC_CACHE_TTL_SECONDS, dimensions: int = SEMANTIC_CACHE_DIMENSIONS):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.dimensions = dimensions
+        self._partitions: "OrderedDict[Hashable, _Partition]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=1000)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, partition: Hashable, question: str) -> Optional[str]:
+        """Stored answer to the most similar earlier question, if it is similar enough"""
+        started = time.perf_counter()
+        vector = vectorize(question, self.dimensions)
+        now = time.time()
+        answer = None
+        with self._lock:
+            bucket = self._partitions.get(partition)
+            if bucket is not None:
+                self._partitions.move_to_end(partition)
+                row, score = bucket.nearest(vector)
+                if row >= 0 and score >= self.threshold:
+                    if bucket.expires_at[row] > now:
+                        bucket.last_used[row] = now
+                        answer = bucket.answers[row]
+                    else:
+                        self._remove(partition, bucket, row)
+            if answer is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            self._latencies.append(time.perf_counter() - started)
+        return answer
+
+    def set(self, partition: Hashable, question: str, answer: str) -> None:
+        vector = vectorize(question, self.dimensions)
+        if not vector.any() or not answer:
+            return
+        now = time.time()
+        with self._lock:
+            bucket = self._partitions.get(partition)
+            if bucket is None:
+                bucket = self._partitions[partition] = _Partition(self.dimensions)
+            self._partitions.move_to_end(partition)
+            bucket.add(vector, question, answer, now + self.ttl, now)
+            self._size += 1
+            # Evict from the least recently used partitions first
+            while self._size > self.max_entries:
+                coldest_key, coldest = next(iter(self._partitions.items()))
+                self._remove(coldest_key, coldest, coldest.oldest())
+
+    def _remove(self, key: Hashable, bucket: _Partition, row: int) -> None:
+        bucket.remove(row)
+        self._size -= 1
+        if not len(bucket):
+            del self._partitions[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._partitions.clear()
+            self._size = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            latencies = np.asarray(self._latencies) * 1000.0
+            return {
+                "entries": self._size,
+                "max_entries": self.max_entries,
+                "partitions": len(self._partitions),
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "lookup_ms_mean": round(float(latencies.mean()), 3) if latencies.size else 0.0,
+                "lookup_ms_p95": round(float(np.percentile(latencies, 95)), 3) if latencies.size else 0.0,
+            }
+
+
+_cache: Optional[SemanticCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_semantic_cache() -> SemanticCache:
+    """Return the process-wide semantic cache"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SemanticCache()
+                registry.register_stats("semantic_cache", _cache.stats)
+    return _cache
@@ -0,0 +1,219 @@
+"""Memory-bounded conversation sessions for follow-up questions.
+
+Each session keeps the user's profile context, a rolling summary of older
+turns and the last few turns verbatim, compacted to stay inside a token
+budget. Sessions are kept in an LRU. Sessions idle for longer than
+``SESSION_IDLE_SECONDS`` expire; when the store is full the least recently
+used are evicted, or spilled to disk when ``SESSION_SPILL_DIR`` is set.
+Spill files expire after the same idle time.
+
+The store lives in the worker process, so a follow-up must reach the worker
+that started the session: run the apps as a single worker (the default for
+``server.py``) or behind sticky routing.
+"""
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from common.metrics import registry, timed
+
+SESSION_MAX = int(os.getenv("SESSION_MAX", "10000"))
+SESSION_TOKEN_BUDGET = int(os.getenv("SESSION_TOKEN_BUDGET", "800"))
+SESSION_IDLE_SECONDS = float(os.getenv("SESSION_IDLE_SECONDS", "1800"))
+SESSION_SPILL_DIR = os.getenv("SESSION_SPILL_DIR", "")
+# Seconds between scans of the spill directory for expired files
+SESSION_SPILL_SWEEP_SECONDS = float(os.getenv("SESSION_SPILL_SWEEP_SECONDS", "60"))
+
+# Longest answer kept verbatim; the full text was already sent to the user
+MAX_TURN_CHARS = 1200
+# Characters of each compacted turn folded into the summary
+SUMMARY_SNIPPET_CHARS = 160
+MAX_SUMMARY_CHARS = 1600
+
+SESSION_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token)"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+class Session:
+    __slots__ = ("id", "context", "summary", "turns", "last_used", "language")
+
+    def __init__(self, session_id: str, context: str = "", summary: str = "",
+                 turns: Optional[List[Tuple[str, str]]] = None, last_used: float = 0.0, language: str = ""):
+        self.id = session_id
+        self.context = context
+        # Language answers are shown in; the turns themselves are kept in English
+        self.language = language
+        self.summary = summary
+        self.turns = turns or []
+        self.last_used = last_used or time.time()
+
+    def tokens(self) -> int:
+        return estimate_tokens(self.context) + estimate_tokens(self.summary) + sum(
+            estimate_tokens(question) + estimate_tokens(answer) for question, answer in self.turns
+        )
+
+    def compact(self, budget: int) -> None:
+        """Fold the oldest turns into the summary until the session fits ``budget``"""
+        while len(self.turns) > 1 and self.tokens() > budget:
+            question, answer = self.turns.pop(0)
+            snippet = f"Asked: {question[:SUMMARY_SNIPPET_CHARS]} | Advised: {answer[:SUMMARY_SNIPPET_CHARS]}"
+            self.summary = (self.summary + "\n" + snippet).strip()[-MAX_SUMMARY_CHARS:]
+
+    @timed("prompt")
+    def follow_up_prompt(self, question: str) -> str:
+        """Short prompt that carries only the conversation state and the new question"""
+        parts = ["You are continuing a conversation as a financial advisor for rural India."]
+        if self.context:
+            parts.append(f"User context:\n{self.context}")
+        if self.summary:
+            parts.append(f"Earlier in the conversation:\n{self.summary}")
+        if self.turns:
+            recent = "\n".join(f"Q: {q}\nA: {a}" for q, a in self.turns)
+            parts.append(f"Recent turns:\n{recent}")
+        parts.append(
+            f"Follow-up question: {question}\n\n"
+            "Answer the follow-up directly in simple language. Build on the advice already given; do not repeat it."
+        )
+        return "\n\n".join(parts)
+
+    def to_dict(self) -> dict:
+        return {"id": self.id, "context": self.context, "summary": self.summary,
+                "turns": self.turns, "last_used": self.last_used, "language": self.language}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Session":
+        return cls(data["id"], data["context"], data["summary"],
+                   [tuple(turn) for turn in data["turns"]], data["last_used"], data.get("language", ""))
+
+
+class SessionStore:
+    """LRU of sessions with idle expiry and optional spill to disk"""
+
+    def __init__(self, max_sessions: int = SESSION_MAX, token_budget: int = SESSION_TOKEN_BUDGET,
+                 idle_seconds: float = SESSION_IDLE_SECONDS, spill_dir: str = SESSION_SPILL_DIR):
+        self.max_sessions = max_sessions
+        self.token_budget = token_budget
+        self.idle_seconds = idle_seconds
+        self.spill_dir = spill_dir
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_spill_sweep = 0.0
+        self.expired = 0
+        self.spilled = 0
+
+    def _spill_path(self, session_id: str) -> str:
+        return os.path.join(self.spill_dir, f"{session_id}.json")
+
+    def _evict(self, session: Session) -> None:
+        if self.spill_dir:
+            with open(self._spill_path(session.id), "w", encoding="utf-8") as f:
+                json.dump(session.to_dict(), f, ensure_ascii=False)
+            self.spilled += 1
+
+    def _load_spilled(self, session_id: str) -> Optional[Session]:
+        if not self.spill_dir:
+            return None
+        path = self._spill_path(session_id)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                session = Session.from_dict(json.load(f))
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+        os.remove(path)
+        if time.time() - session.last_used >= self.idle_seconds:
+            self.expired += 1
+            return None
+        return session
+
+    def _sweep(self, now: float) -> None:
+        # Oldest entries sit at the front of the LRU
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if now - oldest.last_used >= self.idle_seconds:
+                # Expired; dropped rather than spilled
+                self._sessions.popitem(last=False)
+                self.expired += 1
+            elif len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self._evict(oldest)
+            else:
+                break
+        if self.spill_dir and now >= self._next_spill_sweep:
+            self._next_spill_sweep = now + SESSION_SPILL_SWEEP_SECONDS
+            self._sweep_spilled(now)
+
+    def _sweep_spilled(self, now: float) -> None:
+        """Delete spill files of sessions that have expired since they were written"""
+        with os.scandir(self.spill_dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".json"):
+                    continue
+                try:
+                    if now - entry.stat().st_mtime >= self.idle_seconds:
+                        os.remove(entry.path)
+                        self.expired += 1
+                except FileNotFoundError:
+                    # Loaded back by another worker in the meantime
+                    pass
+
+    def create(self, context: str = "", language: str = "") -> Session:
+        session = Session(uuid.uuid4().hex, context=context, language=language)
+        with self._lock:
+            self._sessions[session.id] = session
+            self._sweep(time.time())
+        return session
+
+    def get(self, session_id: Optional[str]) -> Optional[Session]:
+        if not session_id or not SESSION_ID_PATTERN.match(session_id):
+            return None
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._load_spilled(session_id)
+                if session is None:
+                    return None
+                self._sessions[session_id] = session
+            self._sessions.move_to_end(session_id)
+            session.last_used = now
+            self._sweep(now)
+        return session
+
+    def record(self, session: Session, question: str, answer: str) -> None:
+        """Append a turn and compact the session back under the token budget"""
+        with self._lock:
+            session.turns.append((question, answer[:MAX_TURN_CHARS]))
+            session.compact(self.token_budget)
+            session.last_used = time.time()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"sessions": len(self._sessions), "max_sessions": self.max_sessions,
+                    "token_budget": self.token_budget, "expired": self.expired, "spilled": self.spilled}
+
+
+_store: Optional[SessionStore] = None
+_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """Return the process-wide session store"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SessionStore()
+                registry.register_stats("sessions", _store.stats)
+    return _store
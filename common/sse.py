@@ -0,0 +1,19 @@
+"""Server-Sent Events helpers"""
+import json
+from typing import Any, Optional
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    # Stop nginx-style proxies from buffering the stream
+    "X-Accel-Buffering": "no",
+}
+
+
+def sse_event(data: Any, event: Optional[str] = None) -> str:
+    """Format one SSE message with a JSON payload"""
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+# Sent first so proxies and browsers see bytes immediately
+SSE_OPEN = ": stream open\n\n"
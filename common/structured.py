@@ -0,0 +1,166 @@
+"""Schema-constrained generation and single-pass validation of model output.
+
+``generate_structured`` asks the model for JSON mode with a response schema
+derived from a Pydantic class, then validates the text with
+``model_validate_json``, which parses and checks types in one pass. Output
+that still fails gets one cheap local repair (surrounding prose or code
+fences, or the object wrapped under its own name). If that fails too, the
+model is asked again a bounded number of times with the validation error,
+on the pro tier when the call was routed to the fast one.
+
+``iter_structured_sections`` validates a streamed document section by section
+as the model writes it, and stops at the first part that leaves the schema.
+"""
+import os
+from contextlib import nullcontext
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, Optional, Tuple, Type, TypeVar
+
+from pydantic import BaseModel, ValidationError
+
+from common.json_stream import JSONStreamError, JSONStreamParser, first_object
+from common.metrics import registry, timed
+from common.routing import escalate
+
+# Request JSON mode with a response schema (set to 0 for models that do not support it)
+STRUCTURED_JSON_MODE = os.getenv("STRUCTURED_JSON_MODE", "1") == "1"
+# Extra model calls allowed when the output fails validation
+STRUCTURED_MAX_RETRIES = int(os.getenv("STRUCTURED_MAX_RETRIES", "1"))
+# Characters of the validation error quoted back to the model on a retry
+RETRY_ERROR_CHARS = 300
+
+# JSON Schema keywords the Gemini response schema understands
+SCHEMA_KEYS = ("type", "properties", "required", "items", "enum", "description", "format", "nullable")
+
+Schema = TypeVar("Schema", bound=BaseModel)
+
+registry.describe("structured_output_repaired_total", "Responses that validated only after a local repair")
+registry.describe("structured_output_invalid_total", "Responses that failed validation even after repair")
+registry.describe("structured_output_aborted_total", "Streamed responses stopped early because they left the schema")
+
+
+class StructuredOutputError(ValueError):
+    """Raised when model output does not match the expected schema"""
+
+
+def _inline(node, defs: dict):
+    if isinstance(node, list):
+        return [_inline(item, defs) for item in node]
+    if not isinstance(node, dict):
+        return node
+    if "$ref" in node:
+        return _inline(defs[node["$ref"].split("/")[-1]], defs)
+    result = {}
+    for key, value in node.items():
+        if key == "properties":
+            result[key] = {name: _inline(prop, defs) for name, prop in value.items()}
+        elif key in SCHEMA_KEYS:
+            result[key] = _inline(value, defs)
+    return result
+
+
+@lru_cache(maxsize=None)
+def response_schema(schema: Type[BaseModel]) -> dict:
+    """``schema`` as the OpenAPI subset Gemini accepts: refs inlined, defaults and titles dropped"""
+    json_schema = schema.model_json_schema()
+    return _inline(json_schema, json_schema.get("$defs", {}))
+
+
+def json_config(schema: Type[BaseModel]) -> dict:
+    """``generation_config`` asking the model for JSON matching ``schema``"""
+    return {"response_mime_type": "application/json", "response_schema": response_schema(schema)}
+
+
+def _repair(text: str, wrapper: Optional[str]):
+    try:
+        data = first_object(text)
+    except ValueError:
+        return None
+    if wrapper and isinstance(data, dict) and list(data) == [wrapper]:
+        data = data[wrapper]
+    return data
+
+
+@timed("parse")
+def parse_structured(text: str, schema: Type[Schema], wrapper: Optional[str] = None) -> Schema:
+    """Validate model output against ``schema``; ``wrapper`` is a key the object may be nested under"""
+    try:
+        return schema.model_validate_json(text)
+    except ValidationError as e:
+        error = e
+    data = _repair(text, wrapper)
+    if data is not None:
+        try:
+            result = schema.model_validate(data)
+        except ValidationError as e:
+            error = e
+        else:
+            registry.inc("structured_output_repaired_total", schema=schema.__name__)
+            return result
+    registry.inc("structured_output_invalid_total", schema=schema.__name__)
+    raise StructuredOutputError(f"Model output does not match {schema.__name__}: {error}") from error
+
+
+def generate_structured(model, prompt: str, schema: Type[Schema], wrapper: Optional[str] = None,
+                        retries: int = STRUCTURED_MAX_RETRIES) -> Schema:
+    """Generate and validate a ``schema`` instance, re-asking up to ``retries`` times on bad output"""
+    kwargs = {"generation_config": json_config(schema)} if STRUCTURED_JSON_MODE else {}
+    attempt_prompt = prompt
+    for attempt in range(retries + 1):
+        # A retry after invalid output goes to the pro model tier
+        with escalate() if attempt else nullcontext():
+            text = model.generate_content(attempt_prompt, **kwargs).text
+        try:
+            return parse_structured(text, schema, wrapper)
+        except StructuredOutputError as e:
+            if attempt == retries:
+                raise
+            attempt_prompt = _retry_prompt(prompt, e)
+
+
+async def generate_structured_async(llm, prompt: str, schema: Type[Schema], wrapper: Optional[str] = None,
+                                    retries: int = STRUCTURED_MAX_RETRIES) -> Schema:
+    """``generate_structured`` through an ``AsyncLLMClient``, sharing its concurrency limit and timeout"""
+    kwargs = {"generation_config": json_config(schema)} if STRUCTURED_JSON_MODE else {}
+    attempt_prompt = prompt
+    for attempt in range(retries + 1):
+        with escalate() if attempt else nullcontext():
+            text = await llm.generate(attempt_prompt, **kwargs)
+        try:
+            return parse_structured(text, schema, wrapper)
+        except StructuredOutputError as e:
+            if attempt == retries:
+                raise
+            attempt_prompt = _retry_prompt(prompt, e)
+
+
+def _retry_prompt(prompt: str, error: StructuredOutputError) -> str:
+    return (
+        f"{prompt}\n\nYour previous reply could not be used: {str(error)[:RETRY_ERROR_CHARS]}\n"
+        "Reply with only the JSON object in exactly the requested format."
+    )
+
+
+def iter_structured_sections(chunks: Iterable[str], parent: str,
+                             schemas: Dict[str, Type[BaseModel]]) -> Iterator[Tuple[str, BaseModel]]:
+    """Each ``parent.<name>`` object of a streamed document, validated against ``schemas[name]`` as soon as it closes.
+
+    Raises StructuredOutputError at the first unknown section, invalid section
+    or malformed text, so the caller can stop the generation there.
+    """
+    parser = JSONStreamParser(emit_depth=2)
+    try:
+        for chunk in chunks:
+            for event in parser.feed(chunk):
+                path = event[1]
+                if len(path) != 2 or path[0] != parent:
+                    continue
+                schema = schemas.get(path[1])
+                if schema is None:
+                    raise JSONStreamError(f"Unexpected section {path[1]!r} in {parent}")
+                if event[0] == "value":
+                    yield path[1], schema.model_validate(event[2])
+        parser.close()
+    except (JSONStreamError, ValidationError) as e:
+        registry.inc("structured_output_aborted_total", schema=parent)
+        raise StructuredOutputError(f"Streamed {parent} does not match the schema: {e}") from e
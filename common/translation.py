@@ -0,0 +1,233 @@
+"""Localized answers translated from one canonical English generation.
+
+Advice is generated and cached in English only. Other languages are
+produced from it by ``Translator``, which splits the answer into segments
+(markdown lines of prose, string fields of a JSON document) and looks each
+one up in a translation memory keyed on the language and a hash of the
+whitespace-normalized English text. Only segments the memory has not seen
+are sent to the model, in batches, on the fast tier. Boilerplate that
+recurs across answers, such as scheme descriptions and education resources,
+is therefore translated once per language, and a new language costs only
+the translations themselves.
+"""
+import hashlib
+import os
+import re
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from common.fast_json import dumps
+from common.llm_client import LLMTimeoutError, Overloaded
+from common.metrics import registry
+from common.response_cache import ResponseCache, SQLiteBackend, normalize_text
+from common.routing import FAST, routing_scope
+from common.schemas import Translations
+from common.singleflight import AsyncSingleFlight, SingleFlight
+from common.structured import StructuredOutputError, generate_structured, generate_structured_async
+
+CANONICAL_LANGUAGE = "English"
+TM_MAX_ENTRIES = int(os.getenv("TM_MAX_ENTRIES", "50000"))
+TM_TTL_SECONDS = float(os.getenv("TM_TTL_SECONDS", str(30 * 24 * 3600)))
+# SQLite file that keeps the translation memory across restarts and workers
+TM_PATH = os.getenv("TM_PATH", "")
+# Segments sent to the model in one translation call
+TRANSLATION_BATCH_SEGMENTS = int(os.getenv("TRANSLATION_BATCH_SEGMENTS", "40"))
+
+# Markdown structure kept outside the translated text: indentation, headings, bullets, numbering, quotes
+_LINE_PREFIX = re.compile(r"^\s*(?:(?:#{1,6}|[-*+>]|\d+[.)])\s+)*")
+_LETTER = re.compile(r"[^\W\d_]")
+_URL = re.compile(r"^\s*(?:https?://|www\.)\S*\s*$")
+
+# Failures after which an answer is sent in English instead of failing the request;
+# Overloaded covers an open circuit breaker as well as quota refusals
+TRANSLATION_ERRORS = (StructuredOutputError, Overloaded, LLMTimeoutError)
+
+registry.describe("translation_segments_total", "Translated segments by where the translation came from")
+registry.describe("translation_failures_total", "Answers sent in English because translation failed, by error")
+
+
+def is_canonical(language: Optional[str]) -> bool:
+    return normalize_text(language) in (None, "", "english", "en")
+
+
+def translation_failed(error: Exception) -> None:
+    registry.inc("translation_failures_total", error=type(error).__name__)
+
+
+def segment_key(text: str, language: str) -> str:
+    digest = hashlib.sha1(" ".join(text.split()).encode("utf-8")).hexdigest()
+    return f"tm:{normalize_text(language)}:{digest}"
+
+
+def translatable(text: str) -> bool:
+    return bool(_LETTER.search(text)) and not _URL.match(text)
+
+
+def translation_prompt(segments: List[str], language: str) -> str:
+    return f"""Translate each string in the JSON array below from English into {language}, for rural readers.
+Keep numbers, ₹ amounts, scheme and organisation names, URLs and markdown markers such as ** unchanged.
+Reply with only a JSON object {{"translations": [...]}} holding exactly {len(segments)} strings in the same order.
+
+{dumps(segments)}"""
+
+
+def _check_batch(batch: List[str], translations: List[str]) -> List[str]:
+    if len(translations) != len(batch):
+        raise StructuredOutputError(f"Expected {len(batch)} translations, got {len(translations)}")
+    return translations
+
+
+def _split_markdown(text: str) -> List[Tuple[str, str]]:
+    lines = []
+    for line in text.split("\n"):
+        prefix = _LINE_PREFIX.match(line).group()
+        lines.append((prefix, line[len(prefix):]))
+    return lines
+
+
+def _join_markdown(lines: List[Tuple[str, str]], translated: List[str]) -> str:
+    translations = iter(translated)
+    return "\n".join(prefix + (next(translations) if translatable(body) else body) for prefix, body in lines)
+
+
+class Translator:
+    """Translates answers segment by segment through a shared translation memory.
+
+    The ``*_async`` methods send their model calls through ``llm``, the
+    app's shared ``AsyncLLMClient``, so translations count against the same
+    concurrency limit as every other call and are cancelled with the request.
+    """
+
+    def __init__(self, model, memory: Optional[ResponseCache] = None, inflight: Optional[SingleFlight] = None,
+                 llm=None):
+        self.model = model
+        self.llm = llm
+        self.memory = memory or get_translation_memory()
+        self.inflight = inflight or SingleFlight()
+        self.async_inflight = AsyncSingleFlight()
+
+    def _lookup(self, segments: List[str], language: str) -> Tuple[Dict[str, str], List[str]]:
+        """(translations the memory has, distinct segments it lacks)"""
+        translated = {}
+        missing = []
+        for segment in dict.fromkeys(segments):
+            hit = self.memory.get(segment_key(segment, language))
+            if hit is None:
+                missing.append(segment)
+            else:
+                translated[segment] = hit
+        registry.inc("translation_segments_total", len(translated), source="memory")
+        return translated, missing
+
+    def _batches(self, missing: List[str]) -> Iterator[List[str]]:
+        for start in range(0, len(missing), TRANSLATION_BATCH_SEGMENTS):
+            yield missing[start:start + TRANSLATION_BATCH_SEGMENTS]
+
+    def _remember(self, translated: Dict[str, str], batch: List[str], translations: List[str], language: str) -> None:
+        for segment, translation in zip(batch, translations):
+            translated[segment] = translation
+            self.memory.set(segment_key(segment, language), translation)
+        registry.inc("translation_segments_total", len(batch), source="model")
+
+    def translate_segments(self, segments: Iterable[str], language: str) -> List[str]:
+        """``segments`` in ``language``, asking the model only for those the memory lacks"""
+        segments = list(segments)
+        if is_canonical(language) or not segments:
+            return segments
+        translated, missing = self._lookup(segments, language)
+        for batch in self._batches(missing):
+            self._remember(translated, batch, self._translate_batch(batch, language), language)
+        return [translated[segment] for segment in segments]
+
+    async def translate_segments_async(self, segments: Iterable[str], language: str) -> List[str]:
+        segments = list(segments)
+        if is_canonical(language) or not segments:
+            return segments
+        translated, missing = self._lookup(segments, language)
+        for batch in self._batches(missing):
+            self._remember(translated, batch, await self._translate_batch_async(batch, language), language)
+        return [translated[segment] for segment in segments]
+
+    def _translate_batch(self, batch: List[str], language: str) -> List[str]:
+        prompt = translation_prompt(batch, language)
+        # Translation does not need the stronger model
+        with routing_scope(tier=FAST):
+            translations = self.inflight.do(
+                prompt, lambda: generate_structured(self.model, prompt, Translations).translations
+            )
+        return _check_batch(batch, translations)
+
+    async def _translate_batch_async(self, batch: List[str], language: str) -> List[str]:
+        if self.llm is None:
+            raise RuntimeError("Translator needs the app's AsyncLLMClient (llm=) to translate asynchronously")
+        prompt = translation_prompt(batch, language)
+
+        async def translate():
+            return (await generate_structured_async(self.llm, prompt, Translations)).translations
+
+        with routing_scope(tier=FAST):
+            translations = await self.async_inflight.do(prompt, translate)
+        return _check_batch(batch, translations)
+
+    def translate_text(self, text: str, language: str) -> str:
+        """Markdown prose in ``language``, one segment per line, with the markdown structure kept"""
+        if is_canonical(language):
+            return text
+        lines = _split_markdown(text)
+        bodies = [body for _, body in lines if translatable(body)]
+        return _join_markdown(lines, self.translate_segments(bodies, language))
+
+    async def translate_text_async(self, text: str, language: str) -> str:
+        if is_canonical(language):
+            return text
+        lines = _split_markdown(text)
+        bodies = [body for _, body in lines if translatable(body)]
+        return _join_markdown(lines, await self.translate_segments_async(bodies, language))
+
+    def translate_document(self, document: Any, language: str, keep: Iterable[str] = ("link",)) -> Any:
+        """A JSON document with its string values in ``language``; fields named in ``keep`` stay as they are"""
+        if is_canonical(language):
+            return document
+        keep = set(keep)
+        strings = []
+
+        def collect(node):
+            if isinstance(node, dict):
+                for key, value in node.items():
+                    if key not in keep:
+                        collect(value)
+            elif isinstance(node, list):
+                for item in node:
+                    collect(item)
+            elif isinstance(node, str) and translatable(node):
+                strings.append(node)
+
+        collect(document)
+        translations = dict(zip(strings, self.translate_segments(strings, language)))
+
+        def rebuild(node):
+            if isinstance(node, dict):
+                return {name: value if name in keep else rebuild(value) for name, value in node.items()}
+            if isinstance(node, list):
+                return [rebuild(item) for item in node]
+            if isinstance(node, str):
+                return translations.get(node, node)
+            return node
+
+        return rebuild(document)
+
+
+_memory: Optional[ResponseCache] = None
+_memory_lock = threading.Lock()
+
+
+def get_translation_memory() -> ResponseCache:
+    """Return the process-wide translation memory"""
+    global _memory
+    if _memory is None:
+        with _memory_lock:
+            if _memory is None:
+                backend = SQLiteBackend(TM_PATH) if TM_PATH else None
+                _memory = ResponseCache(max_entries=TM_MAX_ENTRIES, ttl=TM_TTL_SECONDS, backend=backend)
+                registry.register_stats("translation_memory", _memory.stats)
+    return _memory
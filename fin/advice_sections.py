@@ -0,0 +1,294 @@
+"""Sectioned generation of the structured financial advice document.
+
+Each top-level section of ``financialAdvice`` is requested as its own small
+prompt, the prompts run concurrently, and every section is cached on only
+the profile fields it depends on.
+"""
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple, Type
+
+from pydantic import BaseModel
+
+from common.finmath import (
+    EMERGENCY_FUND_MONTHS, SAVINGS_RATE, budget_details, format_inr, plan_figures, savings_plan,
+)
+from common.metrics import timed
+from common.prompts import Block, PromptTemplate
+from common.scheme_catalog import get_scheme_catalog
+from common.response_cache import INCOME_BANDS, SAVINGS_BANDS, ResponseCache, profile_cache_key, to_band
+from common.schemas import BusinessPlanning, FinancialEducation, FinancialPlanning, GovernmentSchemes, RiskManagement
+from common.singleflight import SingleFlight
+from common.structured import generate_structured
+
+ADVICE_SECTION_WORKERS = int(os.getenv("ADVICE_SECTION_WORKERS", "10"))
+
+
+@dataclass(frozen=True)
+class Section:
+    name: str
+    # FinancialProfile fields this section's content depends on
+    depends_on: Tuple[str, ...]
+    template: str
+    focus: str
+    # Requested as the response schema and used to validate the section
+    schema: Type[BaseModel]
+    # Merges this user's locally computed figures into content that may be cached for someone else
+    finalize: Optional[Callable] = None
+
+
+def _plan(profile) -> dict:
+    return savings_plan(profile.monthly_income, profile.family_size, profile.existing_savings)
+
+
+def _planning_finalize(content: dict, profile) -> dict:
+    # Exact amounts for this user, whatever profile the prose was cached for; the prose itself
+    # carries none, and overwriting the fields keeps this safe to apply to stored advice again
+    plan = _plan(profile)
+    content = dict(content)
+    budget = dict(content.get("monthlyBudget") or {})
+    budget["details"] = budget_details(plan)
+    content["monthlyBudget"] = budget
+    content["figures"] = plan_figures(plan)
+    return content
+
+
+SECTIONS = (
+    Section(
+        name="businessPlanning",
+        depends_on=("business_type", "location", "monthly_income", "existing_savings"),
+        template="""{
+  "initialInvestment": {
+    "text": "<overview of investment needed>",
+    "details": [
+      {"item": "<item1>", "cost": "<cost1>"},
+      {"item": "<item2>", "cost": "<cost2>"}
+    ]
+  },
+  "setupProcess": [
+    "<step1>",
+    "<step2>"
+  ],
+  "localRegulations": "<regulations text>"
+}""",
+        focus="the investment, setup steps and local regulations for starting this business",
+        schema=BusinessPlanning,
+    ),
+    Section(
+        name="financialPlanning",
+        depends_on=("monthly_income", "existing_savings", "family_size", "financial_goal", "risk_tolerance"),
+        template="""{
+  "monthlyBudget": {
+    "text": "<budget overview>"
+  },
+  "savingsTargets": "<savings advice>",
+  "emergencyFund": "<emergency fund advice>"
+}""",
+        # The prose is cached on income and savings bands, so the exact amounts are added locally
+        focus="a monthly household budget, savings targets and an emergency fund, without quoting rupee "
+              "amounts (this client's exact figures are shown next to your text)",
+        schema=FinancialPlanning,
+        finalize=_planning_finalize,
+    ),
+    Section(
+        name="governmentSchemes",
+        depends_on=("business_type", "location"),
+        template="""{
+  "text": "<schemes overview>",
+  "schemes": [
+    {"name": "<scheme1>", "details": "<details1>"},
+    {"name": "<scheme2>", "details": "<details2>"}
+  ]
+}""",
+        focus="government schemes and support programmes that apply",
+        schema=GovernmentSchemes,
+    ),
+    Section(
+        name="riskManagement",
+        depends_on=("business_type", "location", "risk_tolerance"),
+        template="""{
+  "text": "<risk overview>",
+  "strategies": [
+    {"point": "<strategy1>", "details": "<details1>"},
+    {"point": "<strategy2>", "details": "<details2>"}
+  ]
+}""",
+        focus="the main business and household risks and how to manage them",
+        schema=RiskManagement,
+    ),
+    Section(
+        name="financialEducation",
+        depends_on=("business_type", "location"),
+        template="""{
+  "text": "<education overview>",
+  "resources": [
+    {"name": "<resource1>", "link": "<link1>"},
+    {"name": "<resource2>", "link": "<link2>"}
+  ]
+}""",
+        focus="basic financial education and where to learn more",
+        schema=FinancialEducation,
+    ),
+)
+
+SECTIONS_BY_NAME = {section.name: section for section in SECTIONS}
+
+# Labels used when a field is shown in a section prompt
+FIELD_LABELS = {
+    "age": "Age",
+    "location": "Location",
+    "monthly_income": "Monthly Income (₹)",
+    "family_size": "Family Size",
+    "business_type": "Business Interest",
+    "existing_savings": "Current Savings (₹)",
+    "financial_goal": "Financial Goal",
+    "risk_tolerance": "Risk Tolerance",
+}
+
+# Fields profile_cache_key buckets itself; the rest are passed through as extras
+KEYED_FIELDS = ("monthly_income", "existing_savings", "location", "business_type")
+
+# Amounts the cache keys on bands; a cached prompt shows the band, never this client's exact figure
+BANDED_FIELDS = {"monthly_income": INCOME_BANDS, "existing_savings": SAVINGS_BANDS}
+
+
+def _field_value(profile, field: str, exact: bool):
+    value = getattr(profile, field)
+    if exact or field not in BANDED_FIELDS:
+        return value
+    return to_band(value, BANDED_FIELDS[field])
+
+
+def profile_lines(profile, fields: Iterable[str] = tuple(FIELD_LABELS), exact: bool = False) -> List[str]:
+    """``fields`` of ``profile`` as labelled prompt lines, with amounts banded unless ``exact``"""
+    return [f"- {FIELD_LABELS[field]}: {_field_value(profile, field, exact)}" for field in fields]
+
+
+def _compile_section_prompt(section: Section) -> PromptTemplate:
+    # Everything but the client's own data is fixed per section, so it leads the prompt
+    return PromptTemplate(f"section.{section.name}", f"""Generate the "{section.name}" section of a financial advice JSON response for the rural entrepreneur described at the end.
+
+Respond with only a JSON object in the following format, with no additional text:
+{section.template}
+
+Please provide specific, practical advice on {section.focus} for the client's business and location.""", blocks=(
+        Block("client", "Client details"),
+    ))
+
+
+SECTION_PROMPTS = {section.name: _compile_section_prompt(section) for section in SECTIONS}
+
+
+@timed("prompt")
+def section_prompt(section: Section, profile) -> str:
+    return SECTION_PROMPTS[section.name].render(client=profile_lines(profile, section.depends_on))
+
+
+def section_cache_key(section: Section, profile) -> str:
+    fields = {field: getattr(profile, field) for field in section.depends_on}
+    keyed = {field: fields.pop(field) for field in KEYED_FIELDS if field in fields}
+    return profile_cache_key(f"advice-section:{section.name}", **keyed, **fields)
+
+
+def finish_section(section: Section, content: dict, profile) -> dict:
+    """Validated ``content`` with this user's locally computed figures merged in"""
+    return section.finalize(content, profile) if section.finalize else content
+
+
+def generate_section_content(model, section: Section, prompt: str) -> dict:
+    """One validated section; a ``{"<name>": {...}}`` wrapper added by the model is undone"""
+    return generate_structured(model, prompt, section.schema, wrapper=section.name).model_dump()
+
+
+class SectionedAdviceEngine:
+    """Builds the ``financialAdvice`` object from concurrently generated sections"""
+
+    def __init__(self, model, cache: ResponseCache, inflight: SingleFlight,
+                 max_workers: int = ADVICE_SECTION_WORKERS):
+        self.model = model
+        self.cache = cache
+        self.inflight = inflight
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="advice-section")
+
+    def generate_section(self, section: Section, profile) -> dict:
+        cache_key = section_cache_key(section, profile)
+        content = self.cache.get(cache_key)
+        if content is None:
+            prompt = section_prompt(section, profile)
+            content = self.inflight.do(prompt, lambda: generate_section_content(self.model, section, prompt))
+            self.cache.set(cache_key, content)
+        return finish_section(section, content, profile)
+
+    def iter_sections(self, profile, sections: Iterable[Section] = SECTIONS) -> Iterator[Tuple[str, dict]]:
+        """``(name, content)`` for each of ``sections`` in the order they finish"""
+        # Each section runs in the caller's context so it keeps the request's scheduling priority
+        futures = {
+            self._executor.submit(contextvars.copy_context().run, self.generate_section, section, profile): section.name
+            for section in sections
+        }
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+    def generate(self, profile) -> dict:
+        """Return the merged ``financialAdvice`` object for ``profile``"""
+        advice = dict(self.iter_sections(profile))
+        return {section.name: advice[section.name] for section in SECTIONS}
+
+
+def fallback_advice(profile) -> dict:
+    """A ``financialAdvice`` object built only from local data, for when the model is unavailable"""
+    plan = _plan(profile)
+    schemes = get_scheme_catalog().match(
+        query_type="business_advice", location=profile.location,
+        age=profile.age, monthly_income=profile.monthly_income,
+    )
+    months = plan["months_to_emergency_fund"]
+    reach = f", which you can reach in about {months:.0f} months" if months != float("inf") else ""
+    return {
+        "businessPlanning": {
+            "initialInvestment": {
+                "text": f"Start {profile.business_type} on a small scale and keep the first investment "
+                        f"within your savings of {format_inr(profile.existing_savings)}, leaving the emergency fund untouched.",
+                "details": [],
+            },
+            "setupProcess": [
+                f"Visit two or three {profile.business_type} businesses near {profile.location} to learn costs and prices",
+                "Write down the equipment, stock and monthly expenses you will need",
+                "Register the business on the Udyam portal and open a separate bank account for it",
+                "Start small, keep daily records, and grow from the profits",
+            ],
+            "localRegulations": "Check the licences your business needs with the local panchayat or municipal office.",
+        },
+        "financialPlanning": {
+            "monthlyBudget": {
+                "text": f"A suggested split of your monthly income of {format_inr(profile.monthly_income)}.",
+                "details": budget_details(plan),
+            },
+            "savingsTargets": f"Put aside {format_inr(plan['monthly_saving'])} every month. At {SAVINGS_RATE}% a year "
+                              f"this grows to about {format_inr(plan['projected_savings'][60])} in five years.",
+            "emergencyFund": f"Build an emergency fund of {format_inr(plan['emergency_fund_target'])} "
+                             f"({EMERGENCY_FUND_MONTHS} months of essential spending){reach}.",
+            "figures": plan_figures(plan),
+        },
+        "governmentSchemes": {
+            "text": "Schemes that may apply to you, based on your details.",
+            "schemes": [{"name": scheme["name"], "details": scheme["description"]} for scheme in schemes],
+        },
+        "riskManagement": {
+            "text": "Protect your family and business against common risks.",
+            "strategies": [
+                {"point": "Insurance", "details": "Low-cost cover is available through PMJJBY (life) and PMSBY (accident)."},
+                {"point": "Emergency fund", "details": "Keep the emergency fund in a bank account you can reach quickly."},
+                {"point": "Diversify income", "details": "Avoid depending on a single customer, crop or product."},
+            ],
+        },
+        "financialEducation": {
+            "text": "Learn the basics of saving, credit and insurance.",
+            "resources": [
+                {"name": "RBI Financial Education", "link": "https://rbi.org.in/FinancialEducation/"},
+                {"name": "National Centre for Financial Education", "link": "https://ncfe.org.in"},
+            ],
+        },
+    }
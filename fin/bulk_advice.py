@@ -0,0 +1,143 @@
+"""Generate financial advice for a CSV or JSONL file of profiles.
+
+Rows are streamed through the same prompt builder as /api/financial-advice
+with a bounded number of calls in flight, identical profiles are generated
+once, and results are appended to a JSONL file as they complete. A
+checkpoint file records progress so an interrupted run resumes where it
+stopped:
+
+    python bulk_advice.py survey.csv -o advice.jsonl --concurrency 8
+"""
+import argparse
+import csv
+import json
+import os
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import fields
+from typing import Iterator
+
+from fy import FinancialProfile, advise_record, profile_key
+
+PROFILE_TYPES = {field.name: field.type for field in fields(FinancialProfile)}
+
+
+def coerce_row(row: dict) -> dict:
+    """Convert CSV strings to the FinancialProfile field types"""
+    return {
+        name: PROFILE_TYPES[name](value) if name in PROFILE_TYPES and value != "" else value
+        for name, value in row.items()
+    }
+
+
+def read_profiles(path: str) -> Iterator[dict]:
+    """Yield raw profile dicts one at a time from a .csv or .jsonl file"""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def load_checkpoint(path: str) -> dict:
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"rows_done": 0, "output_offset": 0}
+
+
+def save_checkpoint(path: str, rows_done: int, output_offset: int) -> None:
+    # Write then rename so a crash never leaves a half-written checkpoint
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"rows_done": rows_done, "output_offset": output_offset}, f)
+    os.replace(tmp_path, path)
+
+
+def failed(message: str) -> Future:
+    future = Future()
+    future.set_result({"status": "error", "message": message})
+    return future
+
+
+def run(input_path: str, output_path: str, checkpoint_path: str, concurrency: int,
+        dedupe_window: int, checkpoint_every: int) -> None:
+    checkpoint = load_checkpoint(checkpoint_path)
+    rows_done = checkpoint["rows_done"]
+
+    # Drop anything written after the last checkpoint; those rows are redone
+    mode = "r+" if os.path.exists(output_path) else "w"
+    out = open(output_path, mode, encoding="utf-8")
+    out.truncate(checkpoint["output_offset"])
+    out.seek(checkpoint["output_offset"])
+
+    # Recent results by profile identity; bounded so memory stays flat
+    recent: "OrderedDict[str, object]" = OrderedDict()
+    pending = deque()
+    errors = 0
+    is_csv = input_path.lower().endswith(".csv")
+
+    def drain_one():
+        nonlocal rows_done, errors
+        row, future = pending.popleft()
+        result = future.result()
+        errors += result["status"] == "error"
+        out.write(json.dumps({"row": row, **result}, ensure_ascii=False) + "\n")
+        rows_done = row + 1
+        if rows_done % checkpoint_every == 0:
+            out.flush()
+            save_checkpoint(checkpoint_path, rows_done, out.tell())
+            print(f"{rows_done} rows done ({errors} errors)")
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bulk") as executor:
+        for row, profile in enumerate(read_profiles(input_path)):
+            if row < rows_done:
+                continue
+            key = profile_key(profile)
+            future = recent.get(key)
+            if future is not None:
+                recent.move_to_end(key)
+            else:
+                try:
+                    if is_csv:
+                        profile = coerce_row(profile)
+                    future = executor.submit(advise_record, profile)
+                except ValueError as e:
+                    future = failed(f"Invalid value: {e}")
+                recent[key] = future
+                if len(recent) > dedupe_window:
+                    recent.popitem(last=False)
+            pending.append((row, future))
+            # Keep a small window in flight and write results in input order
+            if len(pending) >= concurrency * 2:
+                drain_one()
+        while pending:
+            drain_one()
+
+    out.flush()
+    save_checkpoint(checkpoint_path, rows_done, out.tell())
+    out.close()
+    print(f"Finished: {rows_done} rows ({errors} errors) written to {output_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate financial advice for a file of profiles")
+    parser.add_argument("input", help="CSV or JSONL file of FinancialProfile records")
+    parser.add_argument("-o", "--output", default="advice.jsonl", help="JSONL file to append results to")
+    parser.add_argument("--checkpoint", help="progress file (default: <output>.checkpoint)")
+    parser.add_argument("--concurrency", type=int, default=4, help="profiles generated at once")
+    parser.add_argument("--dedupe-window", type=int, default=1000, help="recent profiles remembered for dedupe")
+    parser.add_argument("--checkpoint-every", type=int, default=100, help="rows between checkpoints")
+    args = parser.parse_args()
+
+    run(
+        args.input, args.output, args.checkpoint or args.output + ".checkpoint",
+        args.concurrency, args.dedupe_window, args.checkpoint_every,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,64 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 from dataclasses import dataclass
-import google.generativeai as genai
 import os
+import sys
+import json
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.response_cache import get_response_cache, profile_cache_key
+from common.singleflight import SingleFlight
+from common.projections import project
+from common.sessions import get_session_store
+from common.scheduler import BATCH, Overloaded, priority_scope
+from common.routing import RoutedModel, routing_scope
+from common.circuit_breaker import CircuitOpen
+from common.scheme_catalog import get_scheme_catalog
+from common.metrics import instrument_flask, registry, stage, timed
+from common.prompts import Block, PromptTemplate
+from common.compression import compress_flask
+from common.fast_json import FastJSONProvider, dumps, loads
+from common.schemas import AdviceDocument
+from common.sse import SSE_HEADERS, SSE_OPEN, sse_event
+from common.translation import CANONICAL_LANGUAGE, TRANSLATION_ERRORS, Translator, is_canonical, translation_failed
+from common.structured import (
+    STRUCTURED_JSON_MODE, StructuredOutputError, generate_structured, iter_structured_sections, json_config,
+    parse_structured,
+)
+from common.precomputed import BUSINESS_TYPES, AdviceGrid, PrecomputedStore, catalog_fingerprint, content_version
+from advice_sections import (
+    SECTIONS, SECTIONS_BY_NAME, SectionedAdviceEngine, fallback_advice, finish_section, profile_lines, section_prompt,
+)
+
 # Load environment variables
 load_dotenv()
 
-# Configure Gemini API
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
-    raise ValueError("Please set GEMINI_API_KEY in .env file")
+# Each call goes to the fast or pro model tier; clients are created on the first call to each
+model = RoutedModel()
+response_cache = get_response_cache()
+inflight = SingleFlight()
+section_engine = SectionedAdviceEngine(model, response_cache, inflight)
+translator = Translator(model)
+sessions = get_session_store()
+advice_grid = AdviceGrid()
+precomputed = PrecomputedStore()
+
+# Generate the advice sections as separate concurrent calls (set to 0 for one big prompt)
+ADVICE_SECTIONED = os.getenv("ADVICE_SECTIONED", "1") == "1"
 
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel('gemini-1.5-pro')
+# Batch endpoint limits
+BATCH_MAX_PROFILES = int(os.getenv("BATCH_MAX_PROFILES", "100"))
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "4"))
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="batch")
 
 app = Flask(__name__)
-CORS(app)
+app.json = FastJSONProvider(app)
+CORS(app, expose_headers=["X-Session-Id", "Server-Timing"])
+instrument_flask(app, "fy")
+compress_flask(app)
+registry.register_stats("precomputed", precomputed.stats)
 
 @dataclass
 class FinancialProfile:
@@ -32,110 +73,460 @@ class FinancialProfile:
     financial_goal: str
     risk_tolerance: str
 
-def generate_financial_advice_prompt(profile: FinancialProfile) -> str:
-    return f"""Generate a detailed financial advice JSON response for a rural entrepreneur with the following format:
-{{
-  "clientDetails": {{
-    "name": "{profile.name}",
-    "age": {profile.age},
-    "location": "{profile.location}",
-    "monthlyIncome": {profile.monthly_income},
-    "familySize": {profile.family_size},
-    "businessInterest": "{profile.business_type}",
-    "currentSavings": {profile.existing_savings},
-    "financialGoal": "{profile.financial_goal}",
-    "riskTolerance": "{profile.risk_tolerance}"
-  }},
-  "financialAdvice": {{
-    "businessPlanning": {{
-      "initialInvestment": {{
+# Instructions and format first, the same for everyone, so the model can cache them; the client's data goes last
+ADVICE_PROMPT = PromptTemplate("financial_advice", """Generate a detailed financial advice JSON response for the rural entrepreneur described at the end, in the following format:
+{
+  "clientDetails": {
+    "name": "<client name>",
+    "age": <age>,
+    "location": "<location>",
+    "monthlyIncome": <monthly income>,
+    "familySize": <family size>,
+    "businessInterest": "<business interest>",
+    "currentSavings": <current savings>,
+    "financialGoal": "<financial goal>",
+    "riskTolerance": "<risk tolerance>"
+  },
+  "financialAdvice": {
+    "businessPlanning": {
+      "initialInvestment": {
         "text": "<overview of investment needed>",
         "details": [
-          {{"item": "<item1>", "cost": "<cost1>"}},
-          {{"item": "<item2>", "cost": "<cost2>"}}
+          {"item": "<item1>", "cost": "<cost1>"},
+          {"item": "<item2>", "cost": "<cost2>"}
         ]
-      }},
+      },
       "setupProcess": [
         "<step1>",
         "<step2>"
       ],
       "localRegulations": "<regulations text>"
-    }},
-    "financialPlanning": {{
-      "monthlyBudget": {{
+    },
+    "financialPlanning": {
+      "monthlyBudget": {
         "text": "<budget overview>",
         "details": [
-          {{"item": "<expense1>", "amount": "<amount1>"}},
-          {{"item": "<expense2>", "amount": "<amount2>"}}
+          {"item": "<expense1>", "amount": "<amount1>"},
+          {"item": "<expense2>", "amount": "<amount2>"}
         ]
-      }},
+      },
       "savingsTargets": "<savings advice>",
       "emergencyFund": "<emergency fund advice>"
-    }},
-    "governmentSchemes": {{
+    },
+    "governmentSchemes": {
       "text": "<schemes overview>",
       "schemes": [
-        {{"name": "<scheme1>", "details": "<details1>"}},
-        {{"name": "<scheme2>", "details": "<details2>"}}
+        {"name": "<scheme1>", "details": "<details1>"},
+        {"name": "<scheme2>", "details": "<details2>"}
       ]
-    }},
-    "riskManagement": {{
+    },
+    "riskManagement": {
       "text": "<risk overview>",
       "strategies": [
-        {{"point": "<strategy1>", "details": "<details1>"}},
-        {{"point": "<strategy2>", "details": "<details2>"}}
+        {"point": "<strategy1>", "details": "<details1>"},
+        {"point": "<strategy2>", "details": "<details2>"}
       ]
-    }},
-    "financialEducation": {{
+    },
+    "financialEducation": {
       "text": "<education overview>",
       "resources": [
-        {{"name": "<resource1>", "link": "<link1>"}},
-        {{"name": "<resource2>", "link": "<link2>"}}
+        {"name": "<resource1>", "link": "<link1>"},
+        {"name": "<resource2>", "link": "<link2>"}
       ]
-    }}
-  }}
-}}
+    }
+  }
+}
+
+Please provide specific, practical advice for the client's business and location, considering their monthly income and savings.
+Do not quote rupee amounts in financialPlanning; this client's exact budget and savings figures are shown next to it.""", blocks=(
+    Block("client", "Client details"),
+))
+
+@timed("prompt")
+def generate_financial_advice_prompt(profile: FinancialProfile) -> str:
+    return ADVICE_PROMPT.render(client=profile_lines(profile))
+
+def advice_cache_key(profile: FinancialProfile) -> str:
+    return profile_cache_key(
+        "financial-advice",
+        monthly_income=profile.monthly_income,
+        existing_savings=profile.existing_savings,
+        location=profile.location,
+        business_type=profile.business_type,
+        # Advice is cached in English only; other languages are translated from it
+        language=CANONICAL_LANGUAGE,
+        risk_tolerance=profile.risk_tolerance,
+    )
+
+def client_details(profile: FinancialProfile) -> dict:
+    return {
+        "name": profile.name,
+        "age": profile.age,
+        "location": profile.location,
+        "monthlyIncome": profile.monthly_income,
+        "familySize": profile.family_size,
+        "businessInterest": profile.business_type,
+        "currentSavings": profile.existing_savings,
+        "financialGoal": profile.financial_goal,
+        "riskTolerance": profile.risk_tolerance
+    }
+
+@timed("serialize")
+def personalize_advice(advice_text: str, profile: FinancialProfile) -> str:
+    """Swap this user's details into advice that may have been cached for someone else"""
+    try:
+        # Stored advice was validated when it was generated, so a plain parse is enough
+        advice = loads(advice_text)
+    except ValueError:
+        try:
+            # Entries cached before validation may still carry prose around the JSON
+            advice = parse_structured(advice_text, AdviceDocument).model_dump()
+        except ValueError:
+            return advice_text
+    advice["clientDetails"] = client_details(profile)
+    # Budget and savings figures are computed locally rather than trusted from the model
+    planning = advice.get("financialAdvice", {}).get("financialPlanning")
+    if isinstance(planning, dict):
+        advice["financialAdvice"]["financialPlanning"] = finish_section(
+            SECTIONS_BY_NAME["financialPlanning"], planning, profile
+        )
+    return dumps(advice)
+
+def advice_version(profile: FinancialProfile) -> str:
+    """Hash of the prompts that generate advice for ``profile``, plus the scheme data"""
+    if ADVICE_SECTIONED:
+        prompts = [section_prompt(section, profile) for section in SECTIONS]
+    else:
+        prompts = [generate_financial_advice_prompt(profile)]
+    return content_version(*prompts, catalog_fingerprint(get_scheme_catalog()))
+
+def precomputed_cell(profile: FinancialProfile):
+    """Store key and current version of the grid cell ``profile`` falls in, or None off the grid"""
+    cell = advice_grid.cell(
+        profile.business_type, profile.location, CANONICAL_LANGUAGE,
+        profile.monthly_income, profile.risk_tolerance, profile.financial_goal
+    )
+    if cell is None:
+        return None
+    key, representative = cell
+    return key, advice_version(FinancialProfile(**representative))
+
+def build_financial_advice(profile: FinancialProfile) -> str:
+    """Return the advice JSON document for a profile, in the profile's language"""
+    return localize_advice(build_english_advice(profile), profile)
+
+def localize_advice(advice_text: str, profile: FinancialProfile) -> str:
+    if is_canonical(profile.preferred_language):
+        return advice_text
+    advice = loads(advice_text)
+    try:
+        advice["financialAdvice"] = translator.translate_document(advice["financialAdvice"], profile.preferred_language)
+    except TRANSLATION_ERRORS as e:
+        # The English advice is still useful
+        translation_failed(e)
+        advice["translated"] = False
+    return dumps(advice)
+
+def localize_answer(answer: str, language: str) -> tuple:
+    """(text, translated) of a follow-up answer in the session's language, translated like the advice it follows"""
+    try:
+        return translator.translate_text(answer, language), True
+    except TRANSLATION_ERRORS as e:
+        translation_failed(e)
+        return answer, False
+
+def build_english_advice(profile: FinancialProfile) -> str:
+    # Profiles on the common grid are answered from the precomputed store
+    with stage("precomputed"):
+        cell = precomputed_cell(profile)
+        advice_text = precomputed.get(*cell) if cell is not None else None
+    if advice_text is not None:
+        return personalize_advice(advice_text, profile)
+    try:
+        return generate_financial_advice(profile)
+    except CircuitOpen:
+        # The model is failing; answer from local data instead of waiting on it
+        return dumps({
+            "clientDetails": client_details(profile),
+            "financialAdvice": fallback_advice(profile),
+            "degraded": True
+        })
+
+def generate_financial_advice(profile: FinancialProfile) -> str:
+    """Advice JSON for a profile from the cache or the model"""
+    if ADVICE_SECTIONED:
+        # Sections run concurrently and are cached on the fields they depend on
+        advice = section_engine.generate(profile)
+        with stage("serialize"):
+            return dumps({
+                "clientDetails": client_details(profile),
+                "financialAdvice": advice
+            })
 
-Please provide specific, practical advice for {profile.business_type} in {profile.location} considering their monthly income of ₹{profile.monthly_income} and savings of ₹{profile.existing_savings}."""
+    # Users with a similar profile share one cached answer
+    cache_key = advice_cache_key(profile)
+    advice_text = response_cache.get(cache_key)
+    if advice_text is None:
+        # Generate the prompt
+        prompt = generate_financial_advice_prompt(profile)
+        
+        # Get validated JSON from Gemini; identical concurrent prompts share one call
+        advice_text = inflight.do(
+            prompt, lambda: dumps(generate_structured(model, prompt, AdviceDocument).model_dump())
+        )
+        response_cache.set(cache_key, advice_text)
+    
+    # Return the advice JSON with this user's details filled in
+    return personalize_advice(advice_text, profile)
 
 @app.route('/api/financial-advice', methods=['POST'])
 def get_financial_advice():
     try:
         data = request.get_json()
         profile = FinancialProfile(**data)
+        advice_text = build_financial_advice(profile)
+
+        # Start a session so follow-up questions need not resend the profile
+        session = sessions.create(profile_context(profile), profile.preferred_language)
+        sessions.record(session, f"Financial advice for: {profile.financial_goal}", advice_text)
         
-        # Generate the prompt
-        prompt = generate_financial_advice_prompt(profile)
-        
-        # Get response from Gemini
-        response = model.generate_content(prompt)
-        
-        # Parse the response text as JSON and return directly
-        return response.text, 200, {'Content-Type': 'application/json'}
+        return advice_text, 200, {'Content-Type': 'application/json', 'X-Session-Id': session.id}
         
+    except Overloaded as e:
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), e.status_code, e.headers
+    except Exception as e:
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 500
+
+def stream_advice_document(profile: FinancialProfile):
+    """Sections of the one-prompt advice document, validated as each closes in the model's stream"""
+    prompt = generate_financial_advice_prompt(profile)
+    kwargs = {"generation_config": json_config(AdviceDocument)} if STRUCTURED_JSON_MODE else {}
+    chunks = model.generate_content(prompt, stream=True, **kwargs)
+    schemas = {name: section.schema for name, section in SECTIONS_BY_NAME.items()}
+    advice = {}
+    try:
+        for name, content in iter_structured_sections((chunk.text for chunk in chunks), "financialAdvice", schemas):
+            if name in advice:
+                continue
+            advice[name] = finish_section(SECTIONS_BY_NAME[name], content.model_dump(), profile)
+            yield name, advice[name]
+    except StructuredOutputError:
+        # The rest of this generation would be wasted; the sections still missing are asked for one by one
+        pass
+    finally:
+        # Stops the model writing as soon as the output leaves the schema
+        chunks.close()
+
+    missing = [section for section in SECTIONS if section.name not in advice]
+    for name, content in section_engine.iter_sections(profile, missing):
+        advice[name] = content
+        yield name, content
+    response_cache.set(advice_cache_key(profile), dumps({
+        "clientDetails": client_details(profile),
+        "financialAdvice": {section.name: advice[section.name] for section in SECTIONS}
+    }))
+
+def iter_advice_sections(profile: FinancialProfile):
+    """``(name, content)`` for each financialAdvice section as soon as it is ready"""
+    with stage("precomputed"):
+        cell = precomputed_cell(profile)
+        advice_text = precomputed.get(*cell) if cell is not None else None
+    if advice_text is None and not ADVICE_SECTIONED:
+        advice_text = response_cache.get(advice_cache_key(profile))
+    if advice_text is not None:
+        yield from loads(personalize_advice(advice_text, profile))["financialAdvice"].items()
+    elif ADVICE_SECTIONED:
+        yield from section_engine.iter_sections(profile)
+    else:
+        yield from stream_advice_document(profile)
+
+@app.route('/api/financial-advice/stream', methods=['POST'])
+def stream_financial_advice():
+    """The /api/financial-advice document as Server-Sent Events, one ``section`` event per part as it is ready"""
+    data = request.get_json(silent=True) or {}
+    try:
+        profile = FinancialProfile(**data)
+    except TypeError as e:
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 400
+
+    def events():
+        yield SSE_OPEN
+        advice = {}
+        degraded = False
+        translated = True
+        try:
+            try:
+                for name, content in iter_advice_sections(profile):
+                    if translated:
+                        try:
+                            content = translator.translate_document(content, profile.preferred_language)
+                        except TRANSLATION_ERRORS as e:
+                            # The rest of the document is sent in English rather than failing the stream
+                            translation_failed(e)
+                            translated = False
+                    advice[name] = content
+                    yield sse_event({"name": name, "content": content}, event="section")
+            except CircuitOpen:
+                # The model is failing; finish the document from local data
+                degraded = True
+                for name, content in fallback_advice(profile).items():
+                    if name not in advice:
+                        advice[name] = content
+                        yield sse_event({"name": name, "content": content}, event="section")
+
+            document = {"clientDetails": client_details(profile), "financialAdvice": advice}
+            if degraded:
+                document["degraded"] = True
+            if not translated:
+                document["translated"] = False
+            session = sessions.create(profile_context(profile), profile.preferred_language)
+            sessions.record(session, f"Financial advice for: {profile.financial_goal}", dumps(document))
+            yield sse_event({
+                "session_id": session.id,
+                "clientDetails": document["clientDetails"],
+                "degraded": degraded,
+                "translated": translated
+            }, event="done")
+        except Overloaded as e:
+            yield sse_event({"status_code": e.status_code, "detail": str(e), "retry_after": e.retry_after}, event="error")
+        except Exception as e:
+            yield sse_event({"status_code": 500, "detail": str(e)}, event="error")
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream", headers=SSE_HEADERS)
+
+def profile_context(profile: FinancialProfile) -> str:
+    # Follow-ups are answered per session and never shared, so they can see the exact figures
+    return "\n".join(profile_lines(profile, exact=True))
+
+@app.route('/api/follow-up', methods=['POST'])
+def get_follow_up():
+    """Answer a follow-up question within a session, sending only the compacted conversation"""
+    data = request.get_json(silent=True) or {}
+    question = str(data.get('question', '')).strip()
+    if not question:
+        return jsonify({
+            "status": "error",
+            "message": "question is required"
+        }), 400
+    session = sessions.get(data.get('session_id'))
+    if session is None:
+        return jsonify({
+            "status": "error",
+            "message": "Unknown or expired session; request /api/financial-advice again"
+        }), 404
+    try:
+        prompt = session.follow_up_prompt(question)
+        # Routed on the question itself rather than the conversation carried with it
+        with routing_scope(text=question):
+            answer = inflight.do(prompt, lambda: model.generate_content(prompt).text)
+        # The session keeps the English answer that later follow-ups build on
+        sessions.record(session, question, answer)
+        answer, translated = localize_answer(answer, session.language)
+        return jsonify({
+            "status": "success",
+            "session_id": session.id,
+            "answer": answer,
+            "translated": translated
+        })
+    except Overloaded as e:
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), e.status_code, e.headers
     except Exception as e:
         return jsonify({
             "status": "error",
             "message": str(e)
         }), 500
 
+def profile_key(data) -> str:
+    """Identity of a raw profile, used to dedupe repeated submissions"""
+    return json.dumps(data, sort_keys=True)
+
+def advise_record(data: dict) -> dict:
+    """Advice for one raw profile in the batch result format; errors are returned, not raised"""
+    try:
+        # Batch work queues behind interactive requests
+        with priority_scope(BATCH):
+            advice = json.loads(build_financial_advice(FinancialProfile(**data)))
+        return {"status": "success", "advice": advice}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@app.route('/api/financial-advice/batch', methods=['POST'])
+def get_financial_advice_batch():
+    data = request.get_json(silent=True)
+    profiles = data.get("profiles") if isinstance(data, dict) else data
+    if not isinstance(profiles, list) or not profiles:
+        return jsonify({
+            "status": "error",
+            "message": "Request body must contain a non-empty 'profiles' list"
+        }), 400
+    if len(profiles) > BATCH_MAX_PROFILES:
+        return jsonify({
+            "status": "error",
+            "message": f"At most {BATCH_MAX_PROFILES} profiles per batch; use bulk_advice.py for larger files"
+        }), 400
+
+    # Identical profiles are generated once
+    futures = {}
+    for profile in profiles:
+        key = profile_key(profile)
+        if key not in futures:
+            futures[key] = batch_executor.submit(advise_record, profile)
+
+    results = [
+        {"index": index, **futures[profile_key(profile)].result()}
+        for index, profile in enumerate(profiles)
+    ]
+    return jsonify({
+        "status": "success",
+        "results": results
+    })
+
 @app.route('/api/business-types', methods=['GET'])
 def get_business_types():
     return jsonify({
-        "business_types": [
-            "Dairy Farming",
-            "Poultry Farming",
-            "Small Retail Shop",
-            "Handicrafts",
-            "Agricultural Products",
-            "Food Processing",
-            "Tailoring",
-            "Beauty Parlor",
-            "General Store",
-            "Vegetable Vending"
-        ]
+        "business_types": list(BUSINESS_TYPES)
+    })
+
+@app.route('/api/micro-investment-projection', methods=['POST'])
+def get_micro_investment_projection():
+    """Simulated outcomes of a small monthly investment, computed locally without the LLM"""
+    data = request.get_json(silent=True) or {}
+    try:
+        projection = project(
+            monthly_amount=float(data.get('monthly_amount', 0)),
+            horizon_years=int(data.get('horizon_years', 5)),
+            risk_tolerance=str(data.get('risk_tolerance', 'low'))
+        )
+    except (TypeError, ValueError, OverflowError) as e:
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 400
+    return jsonify({
+        "status": "success",
+        "data": projection
     })
 
+@app.route('/api/cache-stats', methods=['GET'])
+def get_cache_stats():
+    return jsonify({**response_cache.stats(), "precomputed": precomputed.stats()})
+
+@app.route('/api/session-stats', methods=['GET'])
+def get_session_stats():
+    return jsonify(sessions.stats())
+
 @app.route('/add', methods=['GET'])
 def add_numbers():
     try:
@@ -147,4 +538,5 @@ def add_numbers():
         return jsonify({'error': 'Invalid input'}), 400    
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=8000, debug=True)
+    # The Werkzeug debugger allows code execution, so it is opt-in
+    app.run(host='0.0.0.0', port=8000, debug=os.getenv("FLASK_DEBUG") == "1")
@@ -1,23 +1,40 @@
 from flask import Flask, request, jsonify
-import google.generativeai as genai
 from functools import wraps
 from dotenv import load_dotenv
 import os
+import sys
 from typing import Dict, Any
-import json
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.eligibility import DEGRADED_MIN_CONFIDENCE, EligibilityEngine
+from common.response_cache import get_response_cache, normalize_text
+from common.scheme_names import SchemeNameResolver
+from common.scheduler import Overloaded
+from common.routing import RoutedModel
+from common.metrics import instrument_flask, stage, timed
+from common.prompts import Block, PromptTemplate
+from common.compression import compress_flask
+from common.fast_json import FastJSONProvider
+from common.schemas import SchemeDetails, SchemeRecommendation
+from common.structured import generate_structured
+from common.circuit_breaker import CircuitOpen
 
 # Load environment variables from .env file
 load_dotenv()
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
+instrument_flask(app, "gov")
+compress_flask(app)
 
-# Configure Gemini AI
-GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
-if not GEMINI_API_KEY:
-    raise ValueError("Please set GEMINI_API_KEY in .env file")
+# Each call goes to the fast or pro model tier; clients are created on the first call to each
+model = RoutedModel()
+eligibility_engine = EligibilityEngine()
+response_cache = get_response_cache()
+scheme_names = SchemeNameResolver()
 
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel('gemini-1.5-pro')
+# Most suggestions returned by /api/scheme-suggest
+SUGGEST_MAX_RESULTS = 10
 
 def validate_input(required_fields: list) -> callable:
     """Decorator to validate request input"""
@@ -39,48 +56,65 @@ def validate_input(required_fields: list) -> callable:
         return decorated_function
     return decorator
 
-def get_scheme_prompt(user_data: Dict[str, Any]) -> str:
-    """Generate prompt for scheme recommendation"""
-    return f"""You are a government scheme recommendation system. Based on the following user details, recommend ONE most relevant Indian government scheme.
-
-User Details:
-- Age: {user_data.get('age')}
-- Income: ₹{user_data.get('income')} per annum
-- State: {user_data.get('state')}
-- Occupation: {user_data.get('occupation')}
-- Category: {user_data.get('category', 'General')}
+SCHEME_PROMPT = PromptTemplate("scheme_recommendation", """You are a government scheme recommendation system. Based on the user details at the end, recommend ONE most relevant Indian government scheme.
 
 Provide your response strictly in the following JSON format, with no additional text:
-{{
+{
     "scheme_name": "Name of the scheme",
     "description": "Brief description of the scheme"
-}}"""
+}""", blocks=(Block("user", "User Details"),))
 
-def get_scheme_details_prompt(scheme_name: str) -> str:
-    """Generate prompt for scheme details"""
-    return f"""Provide detailed information about the Indian government scheme: {scheme_name}
+SCHEME_DETAILS_PROMPT = PromptTemplate("scheme_details", """Provide detailed information about the Indian government scheme named at the end.
 
 Return your response strictly in the following JSON format, with no additional text:
-{{
+{
     "scheme_name": "Name of the scheme",
     "description": "Detailed description",
     "eligibility": "Eligibility criteria",
     "benefits": "Key benefits",
     "how_to_apply": "Application process"
-}}"""
+}""", blocks=(Block("scheme", "Scheme"),))
 
-def extract_json_from_response(response_text: str) -> dict:
-    """Extract JSON from Gemini response text"""
-    try:
-        # Try to find JSON content between curly braces
-        start_idx = response_text.find('{')
-        end_idx = response_text.rfind('}') + 1
-        if start_idx != -1 and end_idx != -1:
-            json_str = response_text[start_idx:end_idx]
-            return json.loads(json_str)
-        raise ValueError("No JSON content found in response")
-    except Exception as e:
-        raise ValueError(f"Failed to extract JSON: {str(e)}")
+@timed("prompt")
+def get_scheme_prompt(user_data: Dict[str, Any]) -> str:
+    """Generate prompt for scheme recommendation"""
+    return SCHEME_PROMPT.render(user=[
+        f"- Age: {user_data.get('age')}",
+        f"- Income: ₹{user_data.get('income')} per annum",
+        f"- State: {user_data.get('state')}",
+        f"- Occupation: {user_data.get('occupation')}",
+        f"- Category: {user_data.get('category', 'General')}",
+    ])
+
+@timed("prompt")
+def get_scheme_details_prompt(scheme_name: str) -> str:
+    """Generate prompt for scheme details"""
+    return SCHEME_DETAILS_PROMPT.render(scheme=scheme_name)
+
+def catalog_scheme_details(scheme: Dict[str, Any]) -> Dict[str, Any]:
+    """Scheme details in the ``/api/scheme-details`` format, from the catalog alone"""
+    rules = scheme["eligibility"]
+    criteria = []
+    if rules.get("min_age") or rules.get("max_age"):
+        criteria.append(f"Age {rules.get('min_age') or 0} to {rules.get('max_age') or 'any'}")
+    if rules.get("max_monthly_income"):
+        criteria.append(f"Monthly income up to ₹{rules['max_monthly_income']:,}")
+    if rules.get("occupations"):
+        criteria.append(f"For {', '.join(rules['occupations'])}")
+    if rules.get("women"):
+        criteria.append("For women")
+    if rules.get("requires_bank_account"):
+        criteria.append("Needs a bank account")
+    if scheme["states"]:
+        criteria.append(f"Residents of {', '.join(state.title() for state in scheme['states'])}")
+    return {
+        "scheme_name": scheme["name"],
+        "scheme_id": scheme["id"],
+        "description": scheme["description"],
+        "eligibility": "; ".join(criteria) or "Open to all citizens",
+        "benefits": scheme["description"],
+        "how_to_apply": "Apply at your nearest bank branch, post office or Common Service Centre (CSC) with your Aadhaar card."
+    }
 
 @app.route('/api/recommend-scheme', methods=['POST'])
 @validate_input(['age', 'income', 'state', 'occupation'])
@@ -88,17 +122,32 @@ def recommend_scheme():
     """Endpoint to recommend government schemes based on user details"""
     try:
         user_data = request.get_json()
+
+        # Answer locally when the rules give a confident match
+        with stage("eligibility"):
+            scheme_data = eligibility_engine.recommend(user_data)
+        if scheme_data is not None:
+            return jsonify(scheme_data), 200
+
         prompt = get_scheme_prompt(user_data)
         
-        # Generate response from Gemini AI
-        response = model.generate_content(prompt)
-        response_text = response.text
-        
-        # Extract and parse JSON from response
-        scheme_data = extract_json_from_response(response_text)
+        # Generate schema-constrained JSON from Gemini AI and validate it
+        scheme_data = generate_structured(model, prompt, SchemeRecommendation).model_dump()
         
         return jsonify(scheme_data), 200
         
+    except CircuitOpen as e:
+        # The model is failing; fall back to the best local match if it fits the user's work
+        scheme_data = eligibility_engine.recommend(user_data, min_confidence=DEGRADED_MIN_CONFIDENCE)
+        if scheme_data is None:
+            return jsonify({
+                "error": str(e)
+            }), e.status_code, e.headers
+        return jsonify({**scheme_data, "degraded": True}), 200
+    except Overloaded as e:
+        return jsonify({
+            "error": str(e)
+        }), e.status_code, e.headers
     except ValueError as e:
         return jsonify({
             "error": f"Failed to process AI response: {str(e)}"
@@ -114,17 +163,36 @@ def get_scheme_details():
     """Endpoint to get detailed information about a specific scheme"""
     try:
         scheme_name = request.get_json()['scheme_name']
-        prompt = get_scheme_details_prompt(scheme_name)
-        
-        # Generate response from Gemini AI
-        response = model.generate_content(prompt)
-        response_text = response.text
-        
-        # Extract and parse JSON from response
-        scheme_details = extract_json_from_response(response_text)
+        # Spelling variants of a known scheme share one canonical cache entry
+        scheme = scheme_names.resolve(scheme_name)
+        if scheme is not None:
+            scheme_name = scheme['name']
+            cache_key = f"scheme-details:id:{scheme['id']}"
+        else:
+            cache_key = f"scheme-details:{normalize_text(scheme_name)}"
+        scheme_details = response_cache.get(cache_key)
+        if scheme_details is None:
+            prompt = get_scheme_details_prompt(scheme_name)
+            
+            # Generate schema-constrained JSON from Gemini AI and validate it
+            scheme_details = generate_structured(model, prompt, SchemeDetails).model_dump()
+            if scheme is not None:
+                scheme_details['scheme_id'] = scheme['id']
+            response_cache.set(cache_key, scheme_details)
         
         return jsonify(scheme_details), 200
         
+    except CircuitOpen as e:
+        # The model is failing; known schemes are described from the catalog
+        if scheme is None:
+            return jsonify({
+                "error": str(e)
+            }), e.status_code, e.headers
+        return jsonify({**catalog_scheme_details(scheme), "degraded": True}), 200
+    except Overloaded as e:
+        return jsonify({
+            "error": str(e)
+        }), e.status_code, e.headers
     except ValueError as e:
         return jsonify({
             "error": f"Failed to process AI response: {str(e)}"
@@ -134,5 +202,20 @@ def get_scheme_details():
             "error": f"An error occurred: {str(e)}"
         }), 500
 
+@app.route('/api/scheme-suggest', methods=['GET'])
+def suggest_schemes():
+    """Autocomplete scheme names from the local catalog"""
+    query = request.args.get('q', '')
+    try:
+        limit = max(1, min(int(request.args.get('limit', 8)), SUGGEST_MAX_RESULTS))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    return jsonify({"suggestions": scheme_names.suggest(query, limit)}), 200
+
+@app.route('/api/cache-stats', methods=['GET'])
+def get_cache_stats():
+    return jsonify(response_cache.stats())
+
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    # The Werkzeug debugger allows code execution, so it is opt-in
+    app.run(debug=os.getenv("FLASK_DEBUG") == "1")
\ No newline at end of file
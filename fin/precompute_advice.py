@@ -0,0 +1,92 @@
+"""Precompute advice for the common business-type x district x income grid.
+
+Each cell's representative profile is generated through the same path as
+/api/financial-advice and written to the read-only store that fy.py checks
+before calling the model. Cells whose stored version still matches the
+current prompts and scheme data are skipped, so re-running after a prompt or
+catalog change only regenerates what changed:
+
+    python precompute_advice.py --store precomputed_advice.db --concurrency 2
+"""
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.precomputed import PRECOMPUTED_ADVICE_PATH, PrecomputedWriter
+from common.scheduler import BATCH, priority_scope
+from fy import FinancialProfile, advice_grid, generate_financial_advice, precomputed_cell
+
+
+def generate(profile: FinancialProfile) -> str:
+    # Batch priority, so the job yields to interactive calls sharing its scheduler
+    with priority_scope(BATCH):
+        return generate_financial_advice(profile)
+
+
+def run(store_path: str, concurrency: int, min_interval: float, limit: int, commit_every: int) -> None:
+    writer = PrecomputedWriter(store_path)
+    stored = writer.versions()
+    on_grid = set()
+    pending = deque()
+    written = skipped = errors = 0
+    last_submit = 0.0
+
+    def drain_one():
+        nonlocal written, errors
+        key, version, future = pending.popleft()
+        try:
+            writer.put(key, version, future.result())
+            written += 1
+        except Exception as e:
+            errors += 1
+            print(f"Failed cell {key}: {e}")
+            return
+        if written % commit_every == 0:
+            writer.commit()
+            print(f"{written} cells written, {skipped} up to date ({errors} errors)")
+
+    print(f"Grid has {len(advice_grid)} cells")
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="precompute") as executor:
+        for data in advice_grid.profiles():
+            profile = FinancialProfile(**data)
+            key, version = precomputed_cell(profile)
+            on_grid.add(key)
+            if stored.get(key) == version:
+                skipped += 1
+                continue
+            if limit and written + len(pending) + errors >= limit:
+                continue
+            # Space out submissions so the job stays under the API quota
+            wait = last_submit + min_interval - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            last_submit = time.monotonic()
+            pending.append((key, version, executor.submit(generate, profile)))
+            if len(pending) >= concurrency * 2:
+                drain_one()
+        while pending:
+            drain_one()
+
+    removed = 0 if limit else writer.prune(on_grid)
+    writer.close()
+    print(f"Finished: {written} cells written, {skipped} up to date, {removed} removed ({errors} errors)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute advice for the common profile grid")
+    parser.add_argument("--store", default=PRECOMPUTED_ADVICE_PATH, help="SQLite file the servers read")
+    parser.add_argument("--concurrency", type=int, default=2, help="cells generated at once")
+    parser.add_argument("--min-interval", type=float, default=0.0, help="seconds between submissions")
+    parser.add_argument("--limit", type=int, default=0, help="stop after this many cells (0 for all)")
+    parser.add_argument("--commit-every", type=int, default=50, help="cells between commits")
+    args = parser.parse_args()
+
+    run(args.store, args.concurrency, args.min_interval, args.limit, args.commit_every)
+
+
+if __name__ == "__main__":
+    main()
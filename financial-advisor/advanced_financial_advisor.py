@@ -1,24 +1,53 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from typing import Optional, List
-import google.generativeai as genai
 from enum import Enum
 import os
+import sys
 from dotenv import load_dotenv
-import json
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.llm_client import AsyncLLMClient, ClientDisconnected, LLMTimeoutError, run_until_disconnect
+from common.singleflight import AsyncSingleFlight
+from common.scheduler import Overloaded
+from common.routing import RoutedModel, routing_scope
+from common.translation import TRANSLATION_ERRORS, Translator, is_canonical, translation_failed
+from common.circuit_breaker import CircuitOpen
+from common.sse import SSE_HEADERS, SSE_OPEN, sse_event
+from common.scheme_catalog import detect_state, get_scheme_catalog
+from common.semantic_cache import get_semantic_cache
+from common.response_cache import INCOME_BANDS, SAVINGS_BANDS, to_band
+from common.sessions import get_session_store
+from common.metrics import instrument_fastapi, registry, stage, timed
+from common.assets import AssetStore, asset_response
+from common.compression import CompressionMiddleware
+from common.prompts import Block, PromptTemplate
+from common.finmath import describe_loan_grid, describe_savings_plan, existing_loan_emi, loan_grid, savings_plan
 
 # Load environment variables
 load_dotenv()
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
-    raise ValueError("Please set GEMINI_API_KEY in .env file")
+# Files are resolved from here so the app also works when mounted by server.py
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+# Each call goes to the fast or pro model tier; clients are created on the first call to each
+model = RoutedModel()
+llm = AsyncLLMClient(model)
+translator = Translator(model, llm=llm)
+inflight = AsyncSingleFlight()
+sessions = get_session_store()
+semantic_cache = get_semantic_cache()
 
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel('gemini-1.5-pro')
+# Load the scheme catalog once at startup; it hot-reloads when the file changes
+get_scheme_catalog()
+# The static directory is read and precompressed once, at startup
+assets = AssetStore(os.path.join(APP_DIR, "static"))
 
 app = FastAPI()
+app.add_middleware(CompressionMiddleware)
+instrument_fastapi(app, "advanced_financial_advisor")
+registry.register_stats("static_assets", assets.stats, app="advanced_financial_advisor")
+registry.register_stats("llm_client", lambda: {"in_flight": llm.in_flight, "waiting": llm.waiting},
+                        app="advanced_financial_advisor")
 
 class IncomeSource(str, Enum):
     AGRICULTURE = "agriculture"
@@ -52,52 +81,27 @@ class FinancialQuery(BaseModel):
     education_level: Optional[str] = Field(None, description="Education level")
     existing_loans: Optional[float] = Field(None, description="Total existing loans in INR")
 
-def load_scheme_database():
-    """Load government scheme database from JSON file"""
-    try:
-        with open("scheme_database.json", "r") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        # Fallback to basic schemes if file not found
-        return {
-            "agriculture": ["PM-KISAN", "Kisan Credit Card", "Soil Health Card Scheme"],
-            "business": ["PMEGP", "MUDRA Loans", "Stand-Up India"],
-            "social_security": ["PM Jeevan Jyoti Bima Yojana", "PM Suraksha Bima Yojana"],
-            "women_specific": ["Mahila Samman Savings Certificate", "STEP Scheme"]
-        }
-
-def generate_context_based_prompt(query: FinancialQuery) -> str:
-    schemes = load_scheme_database()
-    
-    # Build context section
-    context = f"""As an expert financial advisor specialized in rural finance and financial inclusion:
-
-Query Type: {query.query_type.value}
-Question: {query.question}
-Language: {query.language}
+    # Returned by a previous /get-advice call; follow-ups then send only the new question
+    session_id: Optional[str] = Field(None, description="Conversation session to continue")
 
-Available Context:"""
+class AdviceMetadata(BaseModel):
+    language: str
+    location: Optional[str]
+    context_provided: bool
+    cached: bool
+    degraded: bool
 
-    if query.monthly_income:
-        context += f"\n- Monthly Income: ₹{query.monthly_income}"
-    if query.income_sources:
-        context += f"\n- Income Sources: {', '.join(source.value for source in query.income_sources)}"
-    if query.location:
-        context += f"\n- Location: {query.location}"
-    if query.age:
-        context += f"\n- Age: {query.age}"
-    if query.family_size:
-        context += f"\n- Family Size: {query.family_size}"
-    if query.has_bank_account is not None:
-        context += f"\n- Has Bank Account: {'Yes' if query.has_bank_account else 'No'}"
-    if query.education_level:
-        context += f"\n- Education Level: {query.education_level}"
-    if query.existing_loans:
-        context += f"\n- Existing Loans: ₹{query.existing_loans}"
+class AdviceResponse(BaseModel):
+    """/get-advice response; declared so FastAPI validates and serializes it in pydantic-core"""
+    status: str
+    session_id: str
+    query_type: QueryType
+    advice: str
+    metadata: AdviceMetadata
 
-    # Add query-specific guidance
-    prompt_additions = {
-        QueryType.BUSINESS_ADVICE: """
+# Query-specific guidance added to the prompt
+PROMPT_ADDITIONS = {
+    QueryType.BUSINESS_ADVICE: """
 Focus on:
 - Local market opportunities and challenges
 - Initial investment requirements and potential returns
@@ -105,8 +109,8 @@ Focus on:
 - Required licenses and regulations
 - Local success stories and common pitfalls
 - Step-by-step implementation plan""",
-        
-        QueryType.SAVINGS: """
+    
+    QueryType.SAVINGS: """
 Focus on:
 - Practical savings methods for irregular income
 - Priority-based saving goals
@@ -114,8 +118,8 @@ Focus on:
 - Digital banking and mobile money options
 - Emergency fund planning
 - Child education planning""",
-        
-        QueryType.LOAN: """
+    
+    QueryType.LOAN: """
 Focus on:
 - Suitable loan products (priority sector, MUDRA, KCC)
 - Documentation requirements
@@ -123,8 +127,8 @@ Focus on:
 - Risk assessment
 - Alternatives to formal loans
 - Debt management strategies""",
-        
-        QueryType.GOVERNMENT_SCHEMES: """
+    
+    QueryType.GOVERNMENT_SCHEMES: """
 Focus on:
 - Eligibility criteria and benefits
 - Application process and required documents
@@ -132,8 +136,8 @@ Focus on:
 - Common application mistakes to avoid
 - Timeline and follow-up process
 - Alternative schemes if not eligible""",
-        
-        QueryType.INVESTMENT: """
+    
+    QueryType.INVESTMENT: """
 Focus on:
 - Safe and suitable investment options
 - Risk assessment
@@ -141,8 +145,8 @@ Focus on:
 - Avoiding fraud and scams
 - Long-term vs short-term planning
 - Diversification strategies""",
-        
-        QueryType.INSURANCE: """
+    
+    QueryType.INSURANCE: """
 Focus on:
 - Relevant insurance products (crop, health, life)
 - Premium affordability
@@ -150,8 +154,8 @@ Focus on:
 - Coverage understanding
 - Family protection planning
 - Government insurance schemes""",
-        
-        QueryType.GENERAL: """
+    
+    QueryType.GENERAL: """
 Focus on:
 - Practical and actionable advice
 - Local context and cultural considerations
@@ -159,52 +163,263 @@ Focus on:
 - Long-term financial health
 - Available support systems
 - Step-by-step guidance"""
-    }
+}
 
-    context += f"\n\n{prompt_additions[query.query_type]}"
-    
-    context += """
+FIGURES_HEADING = "Figures for your income:"
+
+def computed_figures(query: FinancialQuery) -> str:
+    """Numbers worked out locally so the model does not have to do the arithmetic"""
+    if not query.monthly_income:
+        return ""
+    if query.query_type == QueryType.LOAN:
+        return describe_loan_grid(loan_grid(query.monthly_income, existing_loan_emi(query.existing_loans)))
+    if query.query_type in (QueryType.SAVINGS, QueryType.INVESTMENT, QueryType.BUSINESS_ADVICE):
+        return describe_savings_plan(savings_plan(query.monthly_income, query.family_size))
+    return ""
+
+def with_figures(advice: str, query: FinancialQuery) -> str:
+    """``advice`` followed by this user's own figures; cached answers carry none, as they may be shared"""
+    figures = computed_figures(query)
+    return f"{advice}\n\n{FIGURES_HEADING}\n{figures}" if figures else advice
+
+def profile_context(query: FinancialQuery) -> str:
+    """The user's context as prompt lines; also kept as the base of a follow-up session"""
+    lines = []
+    if query.monthly_income:
+        lines.append(f"- Monthly Income: ₹{query.monthly_income}")
+    if query.income_sources:
+        lines.append(f"- Income Sources: {', '.join(source.value for source in query.income_sources)}")
+    if query.location:
+        lines.append(f"- Location: {query.location}")
+    if query.age:
+        lines.append(f"- Age: {query.age}")
+    if query.family_size:
+        lines.append(f"- Family Size: {query.family_size}")
+    if query.has_bank_account is not None:
+        lines.append(f"- Has Bank Account: {'Yes' if query.has_bank_account else 'No'}")
+    if query.education_level:
+        lines.append(f"- Education Level: {query.education_level}")
+    if query.existing_loans:
+        lines.append(f"- Existing Loans: ₹{query.existing_loans}")
+    return "\n".join(lines)
+
+def relevant_schemes(query: FinancialQuery) -> list:
+    return get_scheme_catalog().match(
+        query_type=query.query_type.value,
+        income_sources=[source.value for source in query.income_sources or []],
+        location=query.location,
+        age=query.age,
+        monthly_income=query.monthly_income,
+        has_bank_account=query.has_bank_account,
+    )
+
+def degraded_advice(query: FinancialQuery) -> str:
+    """General guidance built from local data, served while the model is unavailable"""
+    parts = [
+        "Our advisor is busy right now, so here is general guidance for your question. "
+        "Please ask again later for advice written for you."
+    ]
+    focus = PROMPT_ADDITIONS[query.query_type].replace("Focus on:", "Things to consider:").strip()
+    parts.append(focus)
+    schemes = relevant_schemes(query)
+    if schemes:
+        parts.append("Government schemes that may help:\n" + "\n".join(
+            f"- {scheme['name']}: {scheme['description']}" for scheme in schemes
+        ))
+    return with_figures("\n\n".join(parts), query)
+
+def compile_context_prompt(query_type: QueryType) -> PromptTemplate:
+    # The role, query-type guidance and guidelines are the same for every question of a type,
+    # so they lead the prompt and the user's context and question go last
+    return PromptTemplate("context_advice", f"""As an expert financial advisor specialized in rural finance and financial inclusion, answer the question at the end using the context given with it.
+
+Query Type: {query_type.value}
+{PROMPT_ADDITIONS[query_type]}
 
 Additional Guidelines:
 1. Provide advice in simple, clear language with local examples
-2. Include specific numbers and calculations where relevant
+2. Do not quote rupee amounts or calculations for the user; their exact figures are added after your answer
 3. Suggest both immediate actions and long-term planning
 4. Address common risks and misconceptions
 5. Include relevant government schemes and support programs
 6. Provide alternative solutions for different scenarios
 7. Include contact information for local resources when applicable
 
-Please provide comprehensive advice that is practical, actionable, and sensitive to rural financial realities."""
+Please provide comprehensive advice that is practical, actionable, and sensitive to rural financial realities.""", blocks=(
+        Block("context", "Available Context"),
+        # Dropped from the end first when the prompt is over budget
+        Block("schemes", "Relevant Government Schemes", optional=True),
+        Block("question", "Question"),
+    ))
 
-    return context
-# Mount the static directory
-app.mount("/static", StaticFiles(directory="static"), name="static")
+CONTEXT_PROMPTS = {query_type: compile_context_prompt(query_type) for query_type in QueryType}
+
+@timed("prompt")
+def generate_context_based_prompt(query: FinancialQuery) -> str:
+    return CONTEXT_PROMPTS[query.query_type].render(
+        context=profile_context(query),
+        schemes=[f"- {scheme['name']}: {scheme['description']}" for scheme in relevant_schemes(query)],
+        question=query.question,
+    )
+
+# Static files are served from memory
+@app.api_route("/static/{path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def read_static(path: str, request: Request):
+    return asset_response(assets.get(path), request)
 
 # Add a route for the root path
-@app.get("/")
-async def read_root():
-    return FileResponse("static/index.html")
+@app.api_route("/", methods=["GET", "HEAD"], include_in_schema=False)
+async def read_root(request: Request):
+    return asset_response(assets.get("index.html"), request)
 
     
-@app.post("/get-advice")
-async def get_financial_advice(query: FinancialQuery):
+def semantic_partition(query: FinancialQuery) -> tuple:
+    """Coarse context that must match exactly before two questions can share an answer"""
+    return (
+        query.query_type.value,
+        to_band(query.monthly_income, INCOME_BANDS),
+        to_band(query.existing_loans, SAVINGS_BANDS),
+        query.family_size,
+        detect_state(query.location),
+        tuple(sorted(source.value for source in query.income_sources or [])),
+    )
+
+def query_routing(query: FinancialQuery):
+    """Route the model call on the kind of question and the user's own words, not the whole prompt"""
+    return routing_scope(query_type=query.query_type.value, text=query.question)
+
+async def localize(advice: str, query: FinancialQuery) -> str:
+    """English ``advice`` in the language the user asked for; left in English while the model is unavailable"""
     try:
-        prompt = generate_context_based_prompt(query)
-        response = model.generate_content(prompt)
+        return await translator.translate_text_async(advice, query.language)
+    except TRANSLATION_ERRORS as e:
+        translation_failed(e)
+        return advice
+
+async def generate_advice(request: Request, prompt: str, query: FinancialQuery) -> str:
+    with query_routing(query):
+        return await run_until_disconnect(request, inflight.do(prompt, lambda: llm.generate(prompt)))
+
+@app.post("/get-advice", response_model=AdviceResponse)
+async def get_financial_advice(query: FinancialQuery, request: Request):
+    try:
+        session = sessions.get(query.session_id)
+        cached = degraded = False
+        if session is not None:
+            # Follow-up: only the compacted conversation and the new question are sent
+            prompt = session.follow_up_prompt(query.question)
+            advice = await generate_advice(request, prompt, query)
+        else:
+            session = sessions.create(profile_context(query))
+            # A similar question from a similar profile reuses the earlier answer
+            partition = semantic_partition(query)
+            with stage("semantic_cache"):
+                advice = semantic_cache.get(partition, query.question)
+            cached = advice is not None
+            if not cached:
+                try:
+                    advice = await generate_advice(request, generate_context_based_prompt(query), query)
+                    semantic_cache.set(partition, query.question, advice)
+                except CircuitOpen:
+                    # The model is failing; answer from local data instead of waiting on it
+                    advice = degraded_advice(query)
+                    degraded = True
+            if not degraded:
+                # The cached prose may be shared; the figures are this user's own
+                advice = with_figures(advice, query)
+        # The session keeps the English answer that follow-ups build on
+        sessions.record(session, query.question, advice)
         
         return {
             "status": "success",
+            "session_id": session.id,
             "query_type": query.query_type,
-            "advice": response.text,
+            "advice": await run_until_disconnect(request, localize(advice, query)),
             "metadata": {
                 "language": query.language,
                 "location": query.location,
-                "context_provided": bool(query.monthly_income or query.income_sources)
+                "context_provided": bool(query.monthly_income or query.income_sources),
+                "cached": cached,
+                "degraded": degraded
             }
         }
+    except Overloaded as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers=e.headers)
+    except LLMTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except ClientDisconnected as e:
+        raise HTTPException(status_code=499, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/get-advice/stream")
+async def stream_financial_advice(query: FinancialQuery):
+    """Same as /get-advice but relays the advice as Server-Sent Events while it is generated"""
+    session = sessions.get(query.session_id)
+    partition = cached = None
+    if session is not None:
+        prompt = session.follow_up_prompt(query.question)
+    else:
+        session = sessions.create(profile_context(query))
+        partition = semantic_partition(query)
+        with stage("semantic_cache"):
+            cached = semantic_cache.get(partition, query.question)
+        prompt = generate_context_based_prompt(query)
+
+    async def events():
+        yield SSE_OPEN
+        chunks = []
+        degraded = False
+        try:
+            if cached is not None:
+                chunks.append(with_figures(cached, query))
+                yield sse_event({"text": await localize(chunks[0], query)})
+            else:
+                try:
+                    if is_canonical(query.language):
+                        with query_routing(query):
+                            async for text in llm.stream(prompt):
+                                chunks.append(text)
+                                yield sse_event({"text": text})
+                    else:
+                        # Translation needs the whole English answer, so it is sent in one piece
+                        with query_routing(query):
+                            chunks.append(await llm.generate(prompt))
+                except CircuitOpen:
+                    # Only a first question with nothing sent yet can switch to the local answer
+                    if chunks or partition is None:
+                        raise
+                    degraded = True
+                    chunks.append(degraded_advice(query))
+                    yield sse_event({"text": chunks[0]})
+                else:
+                    if partition is not None:
+                        semantic_cache.set(partition, query.question, "".join(chunks))
+                        # This user's figures go after the prose that was cached
+                        figures = with_figures("", query)
+                        if figures:
+                            chunks.append(figures)
+                            if is_canonical(query.language):
+                                yield sse_event({"text": figures})
+                    if not is_canonical(query.language):
+                        yield sse_event({"text": await localize("".join(chunks), query)})
+            sessions.record(session, query.question, "".join(chunks))
+            yield sse_event({
+                "session_id": session.id,
+                "query_type": query.query_type,
+                "language": query.language,
+                "location": query.location,
+                "degraded": degraded,
+            }, event="done")
+        except Overloaded as e:
+            yield sse_event({"status_code": e.status_code, "detail": str(e), "retry_after": e.retry_after}, event="error")
+        except LLMTimeoutError as e:
+            yield sse_event({"status_code": 504, "detail": str(e)}, event="error")
+        except Exception as e:
+            yield sse_event({"status_code": 500, "detail": str(e)}, event="error")
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
 @app.get("/supported-query-types")
 async def get_query_types():
     return {
@@ -229,6 +444,14 @@ async def get_income_sources():
         ]
     }
 
+@app.get("/cache-stats")
+async def get_cache_stats():
+    return semantic_cache.stats()
+
+@app.get("/session-stats")
+async def get_session_stats():
+    return sessions.stats()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
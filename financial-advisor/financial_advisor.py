@@ -1,25 +1,49 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Optional
-import google.generativeai as genai
 import os
+import sys
 from dotenv import load_dotenv
-from fastapi.responses import HTMLResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import StreamingResponse
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.llm_client import AsyncLLMClient, ClientDisconnected, LLMTimeoutError, run_until_disconnect
+from common.singleflight import AsyncSingleFlight
+from common.scheduler import Overloaded
+from common.routing import RoutedModel
+from common.translation import TRANSLATION_ERRORS, Translator, is_canonical, translation_failed
+from common.sse import SSE_HEADERS, SSE_OPEN, sse_event
+from common.response_cache import INCOME_BANDS, SAVINGS_BANDS, get_response_cache, profile_cache_key, to_band
+from common.finmath import describe_savings_plan, savings_plan
+from common.precomputed import BUSINESS_TYPES
+from common.scheme_catalog import age_band
+from common.metrics import instrument_fastapi, registry, timed
+from common.assets import AssetStore, asset_response
+from common.compression import CompressionMiddleware
+from common.prompts import Block, PromptTemplate
 
 # Load environment variables
 load_dotenv()
 
-# Configure Gemini API
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
-    raise ValueError("Please set GEMINI_API_KEY in .env file")
+# Files are resolved from here so the app also works when mounted by server.py
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
 
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel('gemini-1.5-pro')
+# Each call goes to the fast or pro model tier; clients are created on the first call to each
+model = RoutedModel(query_type="financial_plan")
+llm = AsyncLLMClient(model)
+inflight = AsyncSingleFlight()
+response_cache = get_response_cache()
+translator = Translator(model, llm=llm)
+# The page is read and precompressed once, at startup
+assets = AssetStore(APP_DIR, ["index.html"])
 
 app = FastAPI()
+app.add_middleware(CompressionMiddleware)
+instrument_fastapi(app, "financial_advisor")
+registry.register_stats("static_assets", assets.stats, app="financial_advisor")
+registry.register_stats("llm_client", lambda: {"in_flight": llm.in_flight, "waiting": llm.waiting},
+                        app="financial_advisor")
 
 # Enable CORS
 app.add_middleware(
@@ -28,8 +52,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+class AdviceResponse(BaseModel):
+    """/get-financial-advice response; declared so FastAPI validates and serializes it in pydantic-core"""
+    status: str
+    data: str
+    # False when the advice is sent in English because translation failed
+    translated: bool = True
+
 class FinancialProfile(BaseModel):
     name: str
     age: int
@@ -42,28 +74,18 @@ class FinancialProfile(BaseModel):
     financial_goal: str
     risk_tolerance: str
 
-def generate_financial_advice_prompt(profile: FinancialProfile) -> str:
-    return f"""As a financial advisor for rural India, provide guidance in {profile.preferred_language} for:
-
-Background:
-- Name: {profile.name}
-- Age: {profile.age}
-- Location: {profile.location}
-- Monthly Income: ₹{profile.monthly_income}
-- Family Size: {profile.family_size}
-- Business Interest: {profile.business_type}
-- Current Savings: ₹{profile.existing_savings}
-- Financial Goal: {profile.financial_goal}
-- Risk Tolerance: {profile.risk_tolerance}
+# Generated in English once; other languages are translated from the cached answer.
+# The instructions are the same for everyone and lead the prompt; the client's background goes last
+ADVICE_PROMPT = PromptTemplate("profile_advice", """As a financial advisor for rural India, provide guidance for the client whose background is given at the end.
 
 Please provide detailed advice on:
 1. Business Planning:
-   - Initial investment needed for {profile.business_type}
+   - Initial investment needed for their business
    - Step-by-step setup process
    - Local regulations and requirements
 
 2. Financial Planning:
-   - Monthly budget breakdown
+   - Monthly budget breakdown, as shares of income
    - Savings targets
    - Emergency fund recommendations
 
@@ -71,46 +93,132 @@ Please provide detailed advice on:
 4. Risk Management
 5. Basic Financial Education
 
-Please provide practical, actionable steps in simple language."""
+Please provide practical, actionable steps in simple language.
+Do not quote rupee amounts for the client's budget, savings or emergency fund; their exact figures are added after your advice.""", blocks=(Block("background", "Background"),))
 
-@app.get("/", response_class=HTMLResponse)
-async def get_html():
-    with open("index.html", "r") as f:
-        return HTMLResponse(content=f.read())
+FIGURES_HEADING = "Figures for your income:"
 
-@app.post("/get-financial-advice")
-async def get_financial_advice(profile: FinancialProfile):
+@timed("prompt")
+def generate_financial_advice_prompt(profile: FinancialProfile) -> str:
+    return ADVICE_PROMPT.render(background=[
+        f"- Age group: {age_band(profile.age)}",
+        f"- Location: {profile.location}",
+        # Bands, as in the cache key; the exact amounts are only in the figures added afterwards
+        f"- Monthly Income: ₹{to_band(profile.monthly_income, INCOME_BANDS)}",
+        f"- Family Size: {profile.family_size}",
+        f"- Business Interest: {profile.business_type}",
+        f"- Current Savings: ₹{to_band(profile.existing_savings, SAVINGS_BANDS)}",
+        f"- Financial Goal: {profile.financial_goal}",
+        f"- Risk Tolerance: {profile.risk_tolerance}",
+    ])
+
+def with_figures(advice: str, profile: FinancialProfile) -> str:
+    """``advice`` followed by this user's own figures; cached answers carry none, as they may be shared"""
+    plan = savings_plan(profile.monthly_income, profile.family_size, profile.existing_savings)
+    return f"{advice}\n\n{FIGURES_HEADING}\n{describe_savings_plan(plan)}"
+
+async def localize(advice: str, profile: FinancialProfile) -> tuple:
+    """(text, translated) of English ``advice`` in the user's language; left in English if translation fails"""
     try:
-        # Generate the prompt
-        prompt = generate_financial_advice_prompt(profile)
-        
-        # Get response from Gemini
-        response = model.generate_content(prompt)
+        return await translator.translate_text_async(advice, profile.preferred_language), True
+    except TRANSLATION_ERRORS as e:
+        translation_failed(e)
+        return advice, False
+
+def advice_cache_key(profile: FinancialProfile) -> str:
+    return profile_cache_key(
+        "profile-advice",
+        monthly_income=profile.monthly_income,
+        existing_savings=profile.existing_savings,
+        location=profile.location,
+        business_type=profile.business_type,
+        risk_tolerance=profile.risk_tolerance,
+        # Everything else the prompt is built from, so an answer is only shared when it fits
+        financial_goal=profile.financial_goal,
+        family_size=profile.family_size,
+        age=age_band(profile.age),
+    )
+
+@app.api_route("/", methods=["GET", "HEAD"], include_in_schema=False)
+async def get_html(request: Request):
+    return asset_response(assets.get("index.html"), request)
+
+@app.post("/get-financial-advice", response_model=AdviceResponse)
+async def get_financial_advice(profile: FinancialProfile, request: Request):
+    try:
+        # Users with a similar profile share one cached answer
+        cache_key = advice_cache_key(profile)
+        advice = response_cache.get(cache_key)
+        if advice is None:
+            # Generate the prompt
+            prompt = generate_financial_advice_prompt(profile)
+            
+            # Get response from Gemini without blocking other requests
+            advice = await run_until_disconnect(
+                request, inflight.do(prompt, lambda: llm.generate(prompt))
+            )
+            response_cache.set(cache_key, advice)
         
+        data, translated = await run_until_disconnect(request, localize(with_figures(advice, profile), profile))
         return {
             "status": "success",
-            "data": response.text
+            "data": data,
+            "translated": translated
         }
+    except Overloaded as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers=e.headers)
+    except LLMTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except ClientDisconnected as e:
+        raise HTTPException(status_code=499, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/get-financial-advice/stream")
+async def stream_financial_advice(profile: FinancialProfile):
+    """Same as /get-financial-advice but relays the advice as Server-Sent Events"""
+    cache_key = advice_cache_key(profile)
+
+    async def events():
+        yield SSE_OPEN
+        translated = True
+        try:
+            advice = response_cache.get(cache_key)
+            if advice is None and not is_canonical(profile.preferred_language):
+                # Translation needs the whole English answer, so there is nothing to relay before it
+                advice = await llm.generate(generate_financial_advice_prompt(profile))
+                response_cache.set(cache_key, advice)
+            if advice is not None:
+                text, translated = await localize(with_figures(advice, profile), profile)
+                yield sse_event({"text": text})
+            else:
+                chunks = []
+                async for text in llm.stream(generate_financial_advice_prompt(profile)):
+                    chunks.append(text)
+                    yield sse_event({"text": text})
+                response_cache.set(cache_key, "".join(chunks))
+                # This user's figures go after the prose that was cached
+                yield sse_event({"text": with_figures("", profile)})
+            yield sse_event({"status": "success", "translated": translated}, event="done")
+        except Overloaded as e:
+            yield sse_event({"status_code": e.status_code, "detail": str(e), "retry_after": e.retry_after}, event="error")
+        except LLMTimeoutError as e:
+            yield sse_event({"status_code": 504, "detail": str(e)}, event="error")
+        except Exception as e:
+            yield sse_event({"status_code": 500, "detail": str(e)}, event="error")
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
 @app.get("/business-types")
 async def get_business_types():
     return {
-        "business_types": [
-            "Dairy Farming",
-            "Poultry Farming",
-            "Small Retail Shop",
-            "Handicrafts",
-            "Agricultural Products",
-            "Food Processing",
-            "Tailoring",
-            "Beauty Parlor",
-            "General Store",
-            "Vegetable Vending"
-        ]
+        "business_types": list(BUSINESS_TYPES)
     }
 
+@app.get("/cache-stats")
+async def get_cache_stats():
+    return response_cache.stats()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,68 @@
+"""One ASGI service for all four apps.
+
+Every app is mounted under its own prefix, and all of them share the
+process-wide model client, caches, scheduler and circuit breaker:
+
+    /                  advanced_financial_advisor (FastAPI)
+    /basic             financial_advisor (FastAPI)
+    /fy                fin/fy.py (Flask)
+    /gov               fin/gov.py (Flask)
+
+Install its dependencies with ``pip install -r requirements.txt`` and run it
+under a multi-worker server, e.g.
+
+    uvicorn server:app --workers 4
+    python server.py            # WEB_CONCURRENCY workers on PORT
+
+Each worker is its own process with its own scheduler, so set LLM_RPM and
+LLM_TPM to the per-worker share of the API quota. Follow-up sessions are
+also held per worker (see common/sessions.py): with more than one worker,
+route each client to the same worker (sticky sessions), or follow-ups will
+get a 404 from a worker that does not hold the session.
+"""
+import os
+import sys
+
+from fastapi import FastAPI
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+# The apps import their sibling modules as top-level names
+for app_dir in ("fin", "financial-advisor"):
+    sys.path.insert(0, os.path.join(ROOT, app_dir))
+
+try:
+    from a2wsgi import WSGIMiddleware
+except ImportError:
+    from starlette.middleware.wsgi import WSGIMiddleware
+
+import advanced_financial_advisor
+import financial_advisor
+import fy
+import gov
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+# Follow-up sessions are held per worker, so more than one needs sticky routing
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+app = FastAPI()
+
+
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+
+app.mount("/basic", financial_advisor.app)
+app.mount("/fy", WSGIMiddleware(fy.app))
+app.mount("/gov", WSGIMiddleware(gov.app))
+# Last, so the prefixes above take precedence over its catch-all static routes
+app.mount("/", advanced_financial_advisor.app)
+
+
+if __name__ == "__main__":
+    import uvicorn
+    if WEB_CONCURRENCY > 1:
+        print(f"{WEB_CONCURRENCY} workers: follow-up sessions only work when each client "
+              "is routed to the same worker", file=sys.stderr)
+    uvicorn.run("server:app", host=HOST, port=PORT, workers=WEB_CONCURRENCY)
@@ -0,0 +1,40 @@
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "fin"))
+
+from advice_sections import SECTIONS, profile_lines, section_cache_key, section_prompt  # noqa: E402
+
+
+def profile(**overrides):
+    fields = dict(
+        age=34, location="Cuttack, Odisha", monthly_income=12345, family_size=4, business_type="Dairy",
+        existing_savings=67890, financial_goal="Buy two more cows", risk_tolerance="low",
+    )
+    fields.update(overrides)
+    return SimpleNamespace(**fields)
+
+
+def test_cached_section_prompts_show_bands_not_exact_amounts():
+    client = profile()
+    for section in SECTIONS:
+        prompt = section_prompt(section, client)
+        assert "12345" not in prompt
+        assert "67890" not in prompt
+    business = next(section for section in SECTIONS if section.name == "businessPlanning")
+    prompt = section_prompt(business, client)
+    assert "Monthly Income (₹): 10000-15000" in prompt
+    assert "Current Savings (₹): 50000-100000" in prompt
+
+
+def test_profiles_in_one_band_share_a_section_prompt_and_key():
+    a, b = profile(), profile(monthly_income=14000, existing_savings=99000)
+    for section in SECTIONS:
+        assert section_prompt(section, a) == section_prompt(section, b)
+        assert section_cache_key(section, a) == section_cache_key(section, b)
+
+
+def test_exact_lines_keep_the_figures():
+    lines = profile_lines(profile(), ("monthly_income", "existing_savings"), exact=True)
+    assert lines == ["- Monthly Income (₹): 12345", "- Current Savings (₹): 67890"]
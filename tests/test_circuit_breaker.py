@@ -0,0 +1,125 @@
+import pytest
+
+from common import circuit_breaker
+from common.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker, "time", clock)
+    return clock
+
+
+def make_breaker(**kwargs):
+    options = dict(window=4, min_calls=4, error_rate=0.5, slow_seconds=10, slow_rate=0.5, cooldown=30)
+    options.update(kwargs)
+    return CircuitBreaker(**options)
+
+
+def trip(breaker):
+    for _ in range(breaker.min_calls):
+        breaker.record(True, 0.1)
+    assert breaker.state == OPEN
+
+
+def test_stays_closed_until_min_calls(clock):
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record(True, 0.1)
+    assert breaker.state == CLOSED
+    breaker.check()
+
+
+def test_opens_on_error_rate(clock):
+    breaker = make_breaker()
+    breaker.record(False, 0.1)
+    breaker.record(False, 0.1)
+    breaker.record(True, 0.1)
+    assert breaker.state == CLOSED
+    breaker.record(True, 0.1)
+    assert breaker.state == OPEN
+    assert breaker.trips == 1
+
+
+def test_opens_on_slow_calls(clock):
+    breaker = make_breaker()
+    for elapsed in (0.1, 0.1, 12, 15):
+        breaker.record(False, elapsed)
+    assert breaker.state == OPEN
+
+
+def test_open_refuses_until_cooldown(clock):
+    breaker = make_breaker()
+    trip(breaker)
+    clock.now += 10
+    with pytest.raises(CircuitOpen) as error:
+        breaker.check()
+    assert error.value.status_code == 503
+    assert error.value.retry_after == pytest.approx(20)
+    assert breaker.refused == 1
+
+
+def test_half_open_lets_one_probe_through(clock):
+    breaker = make_breaker()
+    trip(breaker)
+    clock.now += 30
+    breaker.check()
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpen):
+        breaker.check()
+
+
+def test_successful_probe_closes(clock):
+    breaker = make_breaker()
+    trip(breaker)
+    clock.now += 30
+    breaker.check()
+    breaker.record(False, 0.1)
+    assert breaker.state == CLOSED
+    assert breaker.stats()["recent_calls"] == 0
+    breaker.check()
+
+
+@pytest.mark.parametrize("failed, elapsed", [(True, 0.1), (False, 12)])
+def test_failed_or_slow_probe_reopens(clock, failed, elapsed):
+    breaker = make_breaker()
+    trip(breaker)
+    clock.now += 30
+    breaker.check()
+    breaker.record(failed, elapsed)
+    assert breaker.state == OPEN
+    assert breaker.trips == 2
+    # A fresh cooldown starts from the failed probe
+    clock.now += 29
+    with pytest.raises(CircuitOpen):
+        breaker.check()
+
+
+def test_release_frees_the_probe(clock):
+    breaker = make_breaker()
+    trip(breaker)
+    clock.now += 30
+    breaker.check()
+    breaker.release()
+    breaker.check()
+    assert breaker.state == HALF_OPEN
+
+
+def test_admission_check_does_not_take_the_probe(clock):
+    breaker = make_breaker()
+    trip(breaker)
+    clock.now += 30
+    breaker.check(probe=False)
+    breaker.check(probe=False)
+    breaker.check()
+    with pytest.raises(CircuitOpen):
+        breaker.check()
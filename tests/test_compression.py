@@ -0,0 +1,72 @@
+import gzip
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+from flask import Flask, jsonify
+
+from common.assets import AssetStore
+from common.compression import COMPRESS_MIN_BYTES, GZIP, CompressionMiddleware, compress_flask, negotiate
+
+LARGE = "savings " * COMPRESS_MIN_BYTES
+
+
+def test_negotiate_honours_quality_values():
+    assert negotiate(None) is None
+    assert negotiate("gzip, deflate") == GZIP
+    assert negotiate("gzip;q=0, deflate") is None
+    assert negotiate("*") == GZIP
+    assert negotiate("br", available=("br", "gzip")) == "br"
+    assert negotiate("br;q=0, gzip", available=("br", "gzip")) == "gzip"
+
+
+def test_flask_compresses_only_large_responses():
+    app = Flask("compression")
+    app.add_url_rule("/large", "large", lambda: jsonify(text=LARGE))
+    app.add_url_rule("/small", "small", lambda: jsonify(text="ok"))
+    compress_flask(app)
+    client = app.test_client()
+
+    response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == GZIP
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert gzip.decompress(response.data).decode().count("savings") == COMPRESS_MIN_BYTES
+    assert "Content-Encoding" not in client.get("/large").headers
+    assert "Content-Encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+
+
+def test_asgi_middleware_compresses_bodies_but_not_streams():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware)
+
+    @app.get("/large")
+    def large():
+        return PlainTextResponse(LARGE)
+
+    @app.get("/events")
+    def events():
+        return StreamingResponse(iter([LARGE]), media_type="text/event-stream")
+
+    client = TestClient(app)
+    response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == GZIP
+    assert response.text == LARGE
+    assert "content-encoding" not in client.get("/events", headers={"Accept-Encoding": "gzip"}).headers
+
+
+def test_assets_revalidate_per_representation(tmp_path):
+    (tmp_path / "index.html").write_text("<p>" + LARGE + "</p>")
+    asset = AssetStore(str(tmp_path)).get("index.html")
+
+    status, headers, body = asset.respond("gzip", None)
+    assert (status, headers["Content-Encoding"]) == (200, GZIP)
+    assert gzip.decompress(body).decode().startswith("<p>savings")
+    gzip_tag = headers["ETag"]
+
+    assert asset.respond("gzip", gzip_tag)[0] == 304
+    assert asset.respond("gzip", f'"other", W/{gzip_tag}')[0] == 304
+    assert asset.respond("gzip", "*")[0] == 304
+    # The identity body is a different representation, so the gzip tag does not validate it
+    status, headers, body = asset.respond(None, gzip_tag)
+    assert status == 200 and headers["ETag"] != gzip_tag
+    assert asset.respond("gzip", gzip_tag[:-2] + '"')[0] == 200
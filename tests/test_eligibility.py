@@ -0,0 +1,128 @@
+import pytest
+
+from common import eligibility
+from common.eligibility import (
+    DEGRADED_MIN_CONFIDENCE, ELIGIBILITY_MIN_CONFIDENCE, GROUP_WEIGHT, OCCUPATION_WEIGHT, SOURCE_WEIGHT, STATE_WEIGHT,
+    UNKNOWN_GROUP_PENALTY, EligibilityEngine, EligibilityTable, occupation_sources,
+)
+from common.scheme_catalog import SchemeCatalog
+
+RECORDS = [
+    {"id": "kalia", "name": "KALIA", "description": "Odisha farmer support", "income_sources": ["agriculture"],
+     "states": ["Odisha"], "eligibility": {"min_age": 18, "occupations": ["farmer"]}},
+    {"id": "pm-kisan", "name": "PM-KISAN", "description": "Income support for farmers",
+     "income_sources": ["agriculture"], "eligibility": {"occupations": ["farmer"]}},
+    {"id": "mudra", "name": "PM Mudra Yojana", "description": "Small business loans",
+     "income_sources": ["small_business"], "eligibility": {"occupations": ["shopkeeper", "vendor"]}},
+    {"id": "stand-up", "name": "Stand-Up India", "description": "Loans for SC/ST and women entrepreneurs",
+     "income_sources": ["small_business"], "eligibility": {"social_categories": ["sc", "st"], "women": True}},
+    {"id": "pension", "name": "Old Age Pension", "description": "Monthly pension",
+     "eligibility": {"min_age": 60, "max_monthly_income": 10000}},
+]
+
+
+@pytest.fixture
+def catalog():
+    return SchemeCatalog(RECORDS)
+
+
+@pytest.fixture
+def table(catalog):
+    return EligibilityTable(catalog)
+
+
+@pytest.fixture
+def engine(catalog, monkeypatch):
+    monkeypatch.setattr(eligibility, "get_scheme_catalog", lambda: catalog)
+    return EligibilityEngine()
+
+
+def scores(table, age=35, annual_income=100000, state=None, occupation="", groups=frozenset()):
+    return dict(zip(table.ids, table.score(age, annual_income, state, occupation, groups)))
+
+
+def test_occupation_keywords_map_to_income_sources():
+    assert occupation_sources("Paddy farmer") == {"agriculture"}
+    assert occupation_sources("Tailor and shop owner") == {"handicrafts", "small_business"}
+    assert occupation_sources("Teacher") == frozenset()
+
+
+def test_full_match_adds_every_weight(table):
+    result = scores(table, state="odisha", occupation="farmer")
+    assert result["kalia"] == pytest.approx(OCCUPATION_WEIGHT + SOURCE_WEIGHT + STATE_WEIGHT)
+    assert result["pm-kisan"] == pytest.approx(OCCUPATION_WEIGHT + SOURCE_WEIGHT)
+    assert result["mudra"] == 0.0
+
+
+def test_source_without_named_occupation(table):
+    result = scores(table, occupation="dairy and crop work")
+    assert result["pm-kisan"] == pytest.approx(SOURCE_WEIGHT)
+
+
+def test_state_specific_schemes_need_the_state(table):
+    assert scores(table, state="bihar", occupation="farmer")["kalia"] == -1
+    assert scores(table, state=None, occupation="farmer")["kalia"] == -1
+
+
+def test_age_and_income_limits(table):
+    assert scores(table, age=40, annual_income=60000)["pension"] == -1
+    assert scores(table, age=65, annual_income=200000)["pension"] == -1
+    assert scores(table, age=65, annual_income=60000)["pension"] == 0.0
+    assert scores(table, age=16, state="odisha", occupation="farmer")["kalia"] == -1
+
+
+def test_group_restricted_schemes(table):
+    # Unknown groups keep the scheme, ranked lower; a matching group raises it; any other excludes it
+    assert scores(table, occupation="shop")["stand-up"] == pytest.approx(SOURCE_WEIGHT - UNKNOWN_GROUP_PENALTY)
+    assert scores(table, occupation="shop", groups=frozenset({"women"}))["stand-up"] == pytest.approx(
+        SOURCE_WEIGHT + GROUP_WEIGHT)
+    assert scores(table, occupation="shop", groups=frozenset({"obc"}))["stand-up"] == -1
+
+
+def test_state_only_match_scores_the_state_weight(table):
+    result = scores(table, state="odisha", occupation="Mobile Repair")
+    assert result["kalia"] == pytest.approx(STATE_WEIGHT)
+    assert max(result.values()) == pytest.approx(STATE_WEIGHT)
+
+
+def test_recommend_answers_confident_matches(engine):
+    assert engine.recommend({"age": 30, "income": 80000, "state": "Odisha/Puri", "occupation": "Farmer"}) == {
+        "scheme_name": "KALIA", "description": "Odisha farmer support",
+    }
+
+
+def test_below_the_threshold_falls_back_to_the_model(engine):
+    # Source alone (0.3) is under the default threshold, so the caller asks the model
+    user = {"age": 30, "income": 80000, "state": "Bihar", "occupation": "crop work"}
+    assert SOURCE_WEIGHT < ELIGIBILITY_MIN_CONFIDENCE
+    assert engine.recommend(user) is None
+    assert engine.recommend(user, min_confidence=SOURCE_WEIGHT)["scheme_name"] == "PM-KISAN"
+
+
+def test_state_only_match_is_not_a_recommendation(engine):
+    assert engine.recommend({"age": 30, "income": 80000, "state": "Odisha", "occupation": "Teacher"}) is None
+
+
+@pytest.mark.parametrize("occupation", ["Teacher", "Mobile Repair"])
+def test_state_and_group_alone_are_not_served_degraded(engine, occupation):
+    user = {"age": 30, "income": 80000, "state": "Odisha", "occupation": occupation, "gender": "female"}
+    assert engine.recommend(user, min_confidence=DEGRADED_MIN_CONFIDENCE) is None
+
+
+def test_an_income_source_hit_is_served_degraded(engine):
+    user = {"age": 30, "income": 80000, "state": "Bihar", "occupation": "crop work"}
+    assert engine.recommend(user, min_confidence=DEGRADED_MIN_CONFIDENCE)["scheme_name"] == "PM-KISAN"
+
+
+def test_rank_orders_by_confidence_and_drops_ineligible(engine):
+    ranked = engine.rank({"age": 30, "income": 80000, "state": "Odisha", "occupation": "farmer"}, limit=5)
+    assert [scheme["id"] for scheme, _ in ranked][:2] == ["kalia", "pm-kisan"]
+    assert "pension" not in [scheme["id"] for scheme, _ in ranked]
+    assert [confidence for _, confidence in ranked] == sorted((c for _, c in ranked), reverse=True)
+
+
+def test_gender_and_category_become_groups(engine):
+    ranked = dict((scheme["id"], confidence) for scheme, confidence in engine.rank(
+        {"age": 30, "income": 80000, "state": "Bihar", "occupation": "vendor", "gender": "Female",
+         "category": "General"}, limit=5))
+    assert ranked["stand-up"] == pytest.approx(SOURCE_WEIGHT + GROUP_WEIGHT)
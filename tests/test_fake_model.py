@@ -0,0 +1,54 @@
+import pytest
+
+from common.fake_model import FakeModel
+from common.prompts import Block, PromptTemplate
+from common.schemas import FinancialAdvice, RiskManagement
+from common.structured import json_config, parse_structured
+from common.translation import translation_prompt
+
+
+def model(**kwargs):
+    settings = dict(ttft=0, tokens_per_second=1e9, prefill_tokens_per_second=0, seed=7)
+    settings.update(kwargs)
+    return FakeModel(**settings)
+
+
+def test_schema_calls_get_documents_that_validate():
+    fake = model()
+    for schema in (RiskManagement, FinancialAdvice):
+        text = fake.generate_content("Advice", generation_config=json_config(schema)).text
+        parse_structured(text, schema)
+
+
+def test_seeded_runs_are_reproducible():
+    assert model().generate_content("Advice").text == model().generate_content("Advice").text
+    assert model(seed=1).generate_content("Advice").text != model(seed=2).generate_content("Advice").text
+
+
+def test_streams_join_to_the_whole_answer():
+    whole = model().generate_content("Advice").text
+    assert "".join(chunk.text for chunk in model().generate_content("Advice", stream=True)) == whole
+
+
+def test_repeated_prefixes_are_reported_as_cached():
+    fake = model()
+    template = PromptTemplate("test.fake", "You are a financial advisor. " * 20, blocks=(Block("question"),))
+    first = fake.generate_content(template.render(question="How do I save?"))
+    second = fake.generate_content(template.render(question="Which loan?"))
+    assert first.usage_metadata.cached_content_token_count == 0
+    assert second.usage_metadata.cached_content_token_count > 0
+    assert (fake.stats()["prefix_cache_hits"], fake.stats()["prefix_cache_misses"]) == (1, 1)
+
+
+def test_translation_batches_are_tagged_per_segment():
+    text = model().generate_content(translation_prompt(["Save", "Borrow"], "Hindi")).text
+    assert text == '{"translations":["[Hindi] Save","[Hindi] Borrow"]}'
+
+
+def test_failures_are_raised_and_counted():
+    fake = model(error_rate=1.0)
+    with pytest.raises(Exception):
+        fake.generate_content("Advice")
+    with pytest.raises(Exception):
+        list(fake.generate_content("Advice", stream=True))
+    assert fake.stats()["failures"] == 2
@@ -0,0 +1,66 @@
+import math
+
+import numpy as np
+import pytest
+
+from common.finmath import (
+    LOAN_RATES, LOAN_TENORS_MONTHS, MAX_EMI_SHARE, affordable_principal, budget_split, describe_loan_grid,
+    emergency_fund_target, emi, existing_loan_emi, loan_grid, months_to_target, plan_figures, savings_plan,
+    savings_trajectory,
+)
+
+
+def test_emi_matches_the_textbook_formula_and_zero_rate():
+    assert float(emi(100000, 12, 12)) == pytest.approx(8884.88, abs=0.01)
+    assert float(emi(12000, 0, 12)) == pytest.approx(1000)
+
+
+def test_emi_broadcasts_and_affordable_principal_inverts_it():
+    rates = np.array([7.0, 14.0, 24.0])[:, None]
+    tenors = np.array([12, 36])[None, :]
+    payments = emi(50000, rates, tenors)
+    assert payments.shape == (3, 2)
+    np.testing.assert_allclose(affordable_principal(payments, rates, tenors), 50000)
+    assert existing_loan_emi(None) == 0.0
+    assert existing_loan_emi(30000) > 0
+
+
+def test_savings_trajectory_and_months_to_target_agree():
+    balance = float(savings_trajectory(1000, 24, initial=5000))
+    assert balance > 5000 + 24 * 1000
+    assert float(months_to_target(balance, 1000, initial=5000)) == 24
+    assert float(savings_trajectory(1000, 12, annual_rate=0)) == 12000
+    assert float(months_to_target(1000, 500, initial=2000)) == 0
+    assert math.isinf(float(months_to_target(1000, 0)))
+
+
+def test_budget_split_sums_to_income_and_shifts_with_family_size():
+    split = budget_split(20000, 4)
+    assert sum(split.values()) == pytest.approx(20000, abs=50)
+    larger = budget_split(20000, 7)
+    assert larger["Food and household essentials"] > split["Food and household essentials"]
+    assert larger["Savings"] < split["Savings"]
+    with_loan = budget_split(20000, 4, existing_emi=2000)
+    assert with_loan["Existing loan repayments"] == 2000
+    assert sum(with_loan.values()) == pytest.approx(20000, abs=50)
+
+
+def test_loan_grid_keeps_every_emi_within_capacity():
+    grid = loan_grid(20000, existing_emi=1000)
+    assert len(grid) == len(LOAN_RATES) * len(LOAN_TENORS_MONTHS)
+    capacity = 20000 * MAX_EMI_SHARE - 1000
+    for row in grid:
+        assert row["capacity"] == capacity
+        assert row["monthly_emi"] <= capacity
+        assert row["max_loan"] % 1000 == 0
+    assert describe_loan_grid(loan_grid(1000, existing_emi=5000)).startswith("- No spare income")
+
+
+def test_savings_plan_figures_are_consistent():
+    plan = savings_plan(15000, 4, existing_savings=10000)
+    assert plan["monthly_saving"] == plan["budget"]["Savings"] + plan["budget"]["Emergency fund"]
+    assert plan["emergency_fund_target"] == emergency_fund_target(15000, 4)
+    assert list(plan["projected_savings"]) == [12, 36, 60]
+    assert plan["projected_savings"][12] < plan["projected_savings"][36] < plan["projected_savings"][60]
+    amounts = [figure["amount"] for figure in plan_figures(plan)]
+    assert all(amount.startswith("₹") or amount.isdigit() for amount in amounts)
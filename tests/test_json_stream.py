@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+from common.json_stream import JSONStreamError, JSONStreamParser, first_object
+
+DOCUMENT = {
+    "a": {"x": 1, "s": 'he said "hi", ok \\ {not a brace}'},
+    "b": [1, 2.5, {"c": None}],
+    "d": "₹3,000 a month",
+    "e": [],
+    "f": True,
+}
+TEXT = "Here is the advice:\n```json\n" + json.dumps(DOCUMENT, ensure_ascii=False, indent=1) + "\n```\nThanks"
+
+
+def feed_all(chunks, emit_depth=1):
+    parser = JSONStreamParser(emit_depth=emit_depth)
+    events = []
+    for chunk in chunks:
+        events.extend(parser.feed(chunk))
+    parser.close()
+    return events
+
+
+def values(events):
+    return {event[1]: event[2] for event in events if event[0] == "value"}
+
+
+def test_whole_document():
+    events = feed_all([TEXT])
+    assert [event[1] for event in events if event[0] == "key"] == [(key,) for key in DOCUMENT]
+    assert values(events) == {(key,): value for key, value in DOCUMENT.items()}
+
+
+def test_every_split_point_gives_the_same_events():
+    expected = feed_all([TEXT])
+    for i in range(len(TEXT) + 1):
+        assert feed_all([TEXT[:i], TEXT[i:]]) == expected, f"split at {i}: {TEXT[i - 5:i + 5]!r}"
+
+
+def test_one_character_at_a_time():
+    assert feed_all(list(TEXT)) == feed_all([TEXT])
+
+
+def test_values_are_emitted_as_soon_as_they_close():
+    parser = JSONStreamParser(emit_depth=1)
+    assert parser.feed('{"a": {"x": 1') == [("key", ("a",))]
+    assert parser.feed("}") == [("value", ("a",), {"x": 1})]
+    assert parser.feed(', "b": "t') == [("key", ("b",))]
+    assert parser.feed('wo"') == []
+    assert parser.feed("}") == [("value", ("b",), "two")]
+
+
+def test_nested_sections():
+    text = '{"financialAdvice": {"one": {"k": "v"}, "two": [1, 2]}}'
+    events = feed_all([text[:17], text[17:31], text[31:]], emit_depth=2)
+    assert values(events) == {("financialAdvice", "one"): {"k": "v"}, ("financialAdvice", "two"): [1, 2]}
+
+
+def test_escape_split_from_the_escaped_character():
+    events = feed_all(['{"q": "a \\', '"quoted\\', '" b"}'])
+    assert values(events) == {("q",): 'a "quoted" b'}
+
+
+def test_missing_colon_is_an_error():
+    parser = JSONStreamParser()
+    with pytest.raises(JSONStreamError):
+        parser.feed('{"a" "b"}')
+
+
+def test_truncated_stream_fails_on_close():
+    parser = JSONStreamParser()
+    parser.feed('{"a": [1, 2')
+    with pytest.raises(JSONStreamError):
+        parser.close()
+
+
+def test_first_object_skips_surrounding_text():
+    assert first_object(TEXT) == DOCUMENT
@@ -0,0 +1,52 @@
+import pytest
+from flask import Flask
+
+from common.metrics import PROFILE_HEADER, registry, instrument_flask, stage
+
+
+def sample(app_name, line_start):
+    for line in registry.render().splitlines():
+        if line.startswith(line_start) and f'app="{app_name}"' in line:
+            return float(line.rsplit(" ", 1)[1])
+    return None
+
+
+def make_app(name, testing):
+    app = Flask(name)
+    app.testing = testing
+
+    @app.route("/ok")
+    def ok():
+        with stage("work"):
+            return "fine"
+
+    @app.route("/boom")
+    def boom():
+        raise RuntimeError("boom")
+
+    instrument_flask(app, name)
+    return app
+
+
+def test_requests_are_timed_and_profiled():
+    client = make_app("metrics-ok", testing=False).test_client()
+    response = client.get("/ok", headers={PROFILE_HEADER: "1"})
+    assert response.status_code == 200
+    assert "work;dur=" in response.headers["Server-Timing"]
+    assert sample("metrics-ok", "http_request_duration_seconds_count") == 1
+    assert sample("metrics-ok", "http_requests_in_flight") == 0
+
+
+def test_a_failing_view_is_still_counted_and_leaves_no_request_in_flight():
+    client = make_app("metrics-error", testing=False).test_client()
+    assert client.get("/boom").status_code == 500
+    assert sample("metrics-error", 'http_request_duration_seconds_count{app="metrics-error",method="GET",route="/boom",status="500"}') == 1
+    assert sample("metrics-error", "http_requests_in_flight") == 0
+
+
+def test_a_propagated_exception_is_still_counted():
+    client = make_app("metrics-propagate", testing=True).test_client()
+    with pytest.raises(RuntimeError):
+        client.get("/boom")
+    assert sample("metrics-propagate", "http_request_duration_seconds_count") == 1
+    assert sample("metrics-propagate", "http_requests_in_flight") == 0
@@ -0,0 +1,42 @@
+from common.precomputed import REPRESENTATIVE_PROFILE, AdviceGrid
+
+GOAL = REPRESENTATIVE_PROFILE["financial_goal"]
+
+
+def grid():
+    return AdviceGrid({
+        "business_types": ["Dairy Farming"],
+        "districts": ["Cuttack"],
+        "languages": ["English"],
+        "risk_tolerances": ["low", "high"],
+    })
+
+
+def test_requests_on_the_grid_share_a_cell():
+    key, representative = grid().cell("dairy  farming", "CUTTACK", "English", 12000, "low", GOAL.upper())
+    other_key, _ = grid().cell("Dairy Farming", "Cuttack", "english", 14999, "Low", GOAL)
+    assert key == other_key
+    assert representative["financial_goal"] == GOAL
+    assert representative["business_type"] == "Dairy Farming"
+
+
+def test_a_different_goal_is_off_the_grid():
+    assert grid().cell("Dairy Farming", "Cuttack", "English", 12000, "low", "Send my daughter to college") is None
+
+
+def test_other_dimensions_and_income_bands_split_cells():
+    low = grid().cell("Dairy Farming", "Cuttack", "English", 12000, "low", GOAL)[0]
+    assert grid().cell("Dairy Farming", "Cuttack", "English", 12000, "high", GOAL)[0] != low
+    assert grid().cell("Dairy Farming", "Cuttack", "English", 16000, "low", GOAL)[0] != low
+    assert grid().cell("Tailoring", "Cuttack", "English", 12000, "low", GOAL) is None
+    assert grid().cell("Dairy Farming", "Cuttack", "English", -1, "low", GOAL) is None
+
+
+def test_every_enumerated_profile_falls_in_its_own_cell():
+    g = grid()
+    keys = {
+        g.cell(p["business_type"], p["location"], p["preferred_language"], p["monthly_income"],
+               p["risk_tolerance"], p["financial_goal"])[0]
+        for p in g.profiles()
+    }
+    assert len(keys) == len(g)
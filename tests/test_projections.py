@@ -0,0 +1,49 @@
+import math
+
+import pytest
+
+from common.projections import INSTRUMENTS, MAX_HORIZON_YEARS, MAX_MONTHLY_AMOUNT, PERCENTILES, project
+
+
+def by_instrument(projection):
+    return {item["instrument"]: item for item in projection["instruments"]}
+
+
+@pytest.mark.parametrize("amount", [0, -100, math.inf, -math.inf, math.nan, 1e400, MAX_MONTHLY_AMOUNT * 2])
+def test_rejects_amounts_that_are_not_positive_finite_and_bounded(amount):
+    with pytest.raises(ValueError):
+        project(amount, 5, "low", paths=200)
+
+
+@pytest.mark.parametrize("horizon, risk", [(0, "low"), (MAX_HORIZON_YEARS + 1, "low"), (5, "reckless")])
+def test_rejects_unknown_horizons_and_risk_profiles(horizon, risk):
+    with pytest.raises(ValueError):
+        project(500, horizon, risk, paths=200)
+
+
+def test_fixed_rate_deposit_matches_monthly_compounding():
+    projection = project(1000, 2, "low", paths=200)
+    growth = (1 + INSTRUMENTS["rd"][1] / 100.0) ** (1 / 12.0)
+    for row in by_instrument(projection)["rd"]["projection"]:
+        expected = 1000 * sum(growth ** k for k in range(1, row["year"] * 12 + 1))
+        assert row["invested"] == 12000 * row["year"]
+        assert all(row[f"p{p}"] == pytest.approx(expected, rel=1e-3) for p in PERCENTILES)
+
+
+def test_bands_are_ordered_and_scale_with_the_amount():
+    small = project(100, 5, "high", paths=500)
+    large = project(1000, 5, "high", paths=500)
+    for row_small, row_large in zip(small["portfolio"], large["portfolio"]):
+        values = [row_small[f"p{p}"] for p in PERCENTILES]
+        assert values == sorted(values)
+        assert row_large["p50"] == pytest.approx(row_small["p50"] * 10, rel=1e-2)
+    assert [row["year"] for row in small["portfolio"]] == [1, 2, 3, 4, 5]
+
+
+def test_results_are_reproducible_and_flag_minimums():
+    first = project(500, 3, " Medium ", paths=300)
+    assert first == project(500, 3, "medium", paths=300)
+    instruments = by_instrument(first)
+    assert first["risk_tolerance"] == "medium"
+    assert not instruments["fd"]["eligible"]
+    assert instruments["rd"]["eligible"]
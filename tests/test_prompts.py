@@ -0,0 +1,42 @@
+from common.prompts import Block, PromptTemplate, cacheable_prefix
+from common.sessions import estimate_tokens
+
+
+def template(budget=1500):
+    return PromptTemplate("test.advice", "You are a financial advisor.\nAnswer briefly.", blocks=(
+        Block("client", "Client details"),
+        Block("history", "Earlier conversation", optional=True),
+        Block("question", "Question"),
+    ), budget=budget)
+
+
+def test_every_prompt_starts_with_the_same_prefix():
+    advisor = template()
+    first = advisor.render(client=["- Location: Puri"], question="How do I save?")
+    second = advisor.render(client=["- Location: Gaya"], question="Which loan?")
+    assert cacheable_prefix(first) == cacheable_prefix(second) == advisor.prefix
+    assert first.startswith(advisor.prefix) and second.startswith(advisor.prefix)
+    assert cacheable_prefix("plain text") == ""
+
+
+def test_blocks_keep_their_order_and_empty_ones_are_left_out():
+    prompt = template().render(question="How do I save?", client=["- Location: Puri", ""], history=[])
+    assert prompt.endswith("Client details:\n- Location: Puri\n\nQuestion:\nHow do I save?")
+    assert "Earlier conversation" not in prompt
+    assert prompt.tokens == estimate_tokens(prompt)
+
+
+def test_optional_blocks_lose_their_last_lines_to_fit_the_budget():
+    history = [f"Turn {i}: " + "words " * 20 for i in range(40)]
+    prompt = template(budget=300).render(client=["- Location: Puri"], history=history, question="How do I save?")
+    assert prompt.trimmed > 0
+    assert prompt.tokens <= 300
+    assert "Turn 0:" in prompt and "Turn 39:" not in prompt
+    assert prompt.endswith("Question:\nHow do I save?")
+
+
+def test_required_blocks_are_never_cut():
+    client = [f"- Detail {i}: " + "x" * 100 for i in range(20)]
+    prompt = template(budget=50).render(client=client, history=["Turn 0"], question="How do I save?")
+    assert all(line in prompt for line in client)
+    assert "Earlier conversation" not in prompt
@@ -0,0 +1,56 @@
+import time
+
+from common.response_cache import INCOME_BANDS, ResponseCache, SQLiteBackend, profile_cache_key, to_band
+
+
+def key(**overrides):
+    fields = dict(monthly_income=12000, existing_savings=30000, location="Puri", business_type="Tailoring")
+    fields.update(overrides)
+    return profile_cache_key("advice", **fields)
+
+
+def test_bands_label_each_side_of_an_edge():
+    assert to_band(None, INCOME_BANDS) is None
+    assert to_band(-1, INCOME_BANDS) == "<0"
+    assert to_band(9999, INCOME_BANDS) == "5000-10000"
+    assert to_band(10000, INCOME_BANDS) == "10000-15000"
+    assert to_band(250000, INCOME_BANDS) == "100000+"
+
+
+def test_profiles_in_the_same_bands_share_a_key():
+    assert key() == key(monthly_income=14999, existing_savings=49000, location="  PURI ", business_type="tailoring")
+    assert key() == key(language="English")
+
+
+def test_any_keyed_difference_changes_the_key():
+    assert key() != key(monthly_income=15000)
+    assert key() != key(existing_savings=50000)
+    assert key() != key(location="Gaya")
+    assert key() != key(language="Hindi")
+    assert key() != key(risk_tolerance="high")
+    assert key() != profile_cache_key("other", monthly_income=12000, existing_savings=30000,
+                                      location="Puri", business_type="Tailoring")
+
+
+def test_entries_expire_and_the_least_recent_is_evicted():
+    cache = ResponseCache(max_entries=2, ttl=60)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == ("1", "3")
+
+    short = ResponseCache(ttl=0.01)
+    short.set("a", "1")
+    time.sleep(0.02)
+    assert short.get("a") is None
+    assert short.stats()["misses"] == 1
+
+
+def test_a_persistent_backend_is_shared_across_caches(tmp_path):
+    path = str(tmp_path / "cache.db")
+    ResponseCache(backend=SQLiteBackend(path)).set("a", {"advice": "save"})
+    other = ResponseCache(backend=SQLiteBackend(path))
+    assert other.get("a") == {"advice": "save"}
+    assert other.stats()["disk_hits"] == 1
@@ -0,0 +1,39 @@
+from common.routing import FAST, PRO, ROUTING_PRO_SCORE, choose_tier, complexity, escalate, routing_scope
+from common.schemas import FinancialAdvice, Translations
+from common.structured import json_config
+
+
+def test_simple_questions_go_to_the_fast_tier():
+    assert choose_tier("How do I open a savings account?") == (FAST, "simple")
+    with routing_scope(query_type="savings"):
+        assert choose_tier("How do I open a savings account?")[0] == FAST
+
+
+def test_hard_questions_and_full_plans_go_to_the_pro_tier():
+    question = "Compare a KCC loan versus a MUDRA loan: which is better for 50,000 over 3 years at 7% or 10%?"
+    assert complexity(question) < ROUTING_PRO_SCORE <= complexity(question, "loan")
+    with routing_scope(query_type="loan"):
+        assert choose_tier(question) == (PRO, "complex")
+    with routing_scope(query_type="financial_plan"):
+        assert choose_tier("Plan for me") == (PRO, "complex")
+
+
+def test_the_users_words_are_scored_instead_of_the_prompt():
+    long_prompt = "Background. " * 2000
+    assert choose_tier(long_prompt)[0] == PRO
+    with routing_scope(text="How do I open a savings account?"):
+        assert choose_tier(long_prompt)[0] == FAST
+
+
+def test_large_response_schemas_count_towards_complexity():
+    assert complexity("Advice", schema=json_config(FinancialAdvice)["response_schema"]) > complexity(
+        "Advice", schema=json_config(Translations)["response_schema"]
+    )
+
+
+def test_pinned_and_escalated_scopes_override_scoring():
+    with routing_scope(tier=FAST, query_type="financial_plan"):
+        assert choose_tier("Plan for me") == (FAST, "pinned")
+        with escalate():
+            assert choose_tier("Plan for me") == (PRO, "escalated")
+    assert choose_tier("Plan for me") == (FAST, "simple")
@@ -0,0 +1,231 @@
+import contextvars
+import threading
+import time
+
+import pytest
+
+from common import scheduler
+from common.circuit_breaker import CircuitBreaker, CircuitOpen
+from common.scheduler import BATCH, HEDGE_MIN_SAMPLES, INTERACTIVE, ScheduledModel, Scheduler
+
+request_label = contextvars.ContextVar("request_label", default=None)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(scheduler, "LLM_RETRY_BASE_SECONDS", 0.0)
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+class Flaky:
+    """A model call that fails ``failures`` times with a transient error, then answers"""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError("upstream reset")
+        return "ok"
+
+
+def test_interactive_calls_are_admitted_before_batch():
+    # Four requests a second, with the bucket empty, so both calls queue
+    sched = Scheduler(rpm=240, tpm=1e9, queue_timeout=5, max_retries=0)
+    sched.requests.tokens = 0
+    order = []
+
+    def run(priority, name):
+        sched.run(lambda: order.append(name), priority=priority)
+
+    batch = threading.Thread(target=run, args=(BATCH, "batch"))
+    batch.start()
+    wait_until(lambda: len(sched._queue) == 1)
+    interactive = threading.Thread(target=run, args=(INTERACTIVE, "interactive"))
+    interactive.start()
+    batch.join()
+    interactive.join()
+    assert order == ["interactive", "batch"]
+    assert sched.admitted == 2
+
+
+def test_retries_transient_errors_up_to_the_limit():
+    sched = Scheduler(rpm=6000, tpm=1e9, max_retries=3)
+    call = Flaky(failures=10)
+    with pytest.raises(ConnectionError):
+        sched.run(call)
+    assert call.calls == 4
+    assert sched.retries == 3
+
+
+def test_recovers_within_the_retry_limit():
+    sched = Scheduler(rpm=6000, tpm=1e9, max_retries=3)
+    call = Flaky(failures=2)
+    assert sched.run(call) == "ok"
+    assert call.calls == 3
+
+
+def test_no_retry_when_disabled():
+    sched = Scheduler(rpm=6000, tpm=1e9, max_retries=3)
+    call = Flaky(failures=1)
+    with pytest.raises(ConnectionError):
+        sched.run(call, retry=False)
+    assert call.calls == 1
+    assert sched.retries == 0
+
+
+def test_errors_other_than_transient_are_not_retried():
+    sched = Scheduler(rpm=6000, tpm=1e9, max_retries=3)
+    calls = []
+
+    def call():
+        calls.append(1)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        sched.run(call)
+    assert len(calls) == 1
+
+
+class SlowFirst:
+    """The first call stalls; every later one answers at once"""
+
+    def __init__(self, stall):
+        self.stall = stall
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        with self.lock:
+            self.calls += 1
+            first = self.calls == 1
+        if first:
+            time.sleep(self.stall)
+            return "slow"
+        return "fast"
+
+
+def test_hedges_a_slow_call_once():
+    sched = Scheduler(rpm=6000, tpm=1e9, hedge=True)
+    sched._latencies.extend([0.01] * HEDGE_MIN_SAMPLES)
+    call = SlowFirst(stall=0.5)
+    assert sched.run(call) == "fast"
+    assert call.calls == 2
+    assert sched.hedged == 1
+
+
+def test_no_hedge_before_enough_latency_samples():
+    sched = Scheduler(rpm=6000, tpm=1e9, hedge=True)
+    sched._latencies.extend([0.01] * (HEDGE_MIN_SAMPLES - 1))
+    call = SlowFirst(stall=0.05)
+    assert sched.run(call) == "slow"
+    assert call.calls == 1
+    assert sched.hedged == 0
+
+
+def test_queue_limit_rejects_new_work():
+    sched = Scheduler(rpm=6000, tpm=1e9, queue_limit=2)
+    sched.check_admission(backlog=1)
+    with pytest.raises(scheduler.Overloaded) as error:
+        sched.check_admission(backlog=2)
+    assert error.value.status_code == 503
+    assert sched.rejected == 1
+
+
+def test_before_retry_can_stop_the_retries():
+    sched = Scheduler(rpm=6000, tpm=1e9, max_retries=5)
+    call = Flaky(failures=10)
+    checks = []
+
+    def before_retry():
+        checks.append(1)
+        if len(checks) == 2:
+            raise CircuitOpen(30)
+
+    with pytest.raises(CircuitOpen):
+        sched.run(call, before_retry=before_retry)
+    assert call.calls == 2
+
+
+def test_hedged_calls_keep_the_callers_context():
+    sched = Scheduler(rpm=6000, tpm=1e9, hedge=True)
+    sched._latencies.extend([0.01] * HEDGE_MIN_SAMPLES)
+    seen = []
+    slow = SlowFirst(stall=0.3)
+
+    def call():
+        seen.append(request_label.get())
+        return slow()
+
+    token = request_label.set("advice")
+    try:
+        assert sched.run(call) == "fast"
+    finally:
+        request_label.reset(token)
+    assert seen == ["advice", "advice"]
+
+
+class Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FailingModel:
+    def __init__(self):
+        self.calls = 0
+
+    def generate_content(self, prompt, **kwargs):
+        self.calls += 1
+        raise ConnectionError("upstream reset")
+
+
+class StreamingModel:
+    def __init__(self, fail_after=None):
+        self.fail_after = fail_after
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        def chunks():
+            for i in range(3):
+                if i == self.fail_after:
+                    raise ConnectionError("stream reset")
+                yield Chunk(f"part {i} ")
+        return chunks()
+
+
+def breaker(**kwargs):
+    options = dict(window=10, min_calls=2, error_rate=0.5, slow_seconds=10, cooldown=30)
+    options.update(kwargs)
+    return CircuitBreaker(**options)
+
+
+def test_retries_stop_once_the_breaker_opens():
+    model = FailingModel()
+    scheduled = ScheduledModel(model, Scheduler(rpm=6000, tpm=1e9, max_retries=5), breaker())
+    with pytest.raises(CircuitOpen):
+        scheduled.generate_content("prompt")
+    assert model.calls == 2
+
+
+def test_a_stream_that_fails_midway_counts_as_a_failure():
+    model = ScheduledModel(StreamingModel(fail_after=1), Scheduler(rpm=6000, tpm=1e9), breaker(min_calls=5))
+    stream = model.generate_content("prompt", stream=True)
+    assert model.breaker.stats()["recent_calls"] == 0
+    with pytest.raises(ConnectionError):
+        for _ in stream:
+            pass
+    assert model.breaker.stats()["recent_failures"] == 1
+
+
+def test_a_finished_stream_counts_as_a_success():
+    model = ScheduledModel(StreamingModel(), Scheduler(rpm=6000, tpm=1e9), breaker(min_calls=5))
+    assert "".join(chunk.text for chunk in model.generate_content("prompt", stream=True)) == "part 0 part 1 part 2 "
+    stats = model.breaker.stats()
+    assert (stats["recent_calls"], stats["recent_failures"]) == (1, 0)
@@ -0,0 +1,51 @@
+import pytest
+
+from common.scheme_catalog import SchemeCatalog
+from common.scheme_names import SchemeNameIndex
+
+RECORDS = [
+    {"id": "pmjay", "name": "Ayushman Bharat PM-JAY", "aliases": ["PMJAY", "Pradhan Mantri Jan Arogya Yojana"]},
+    {"id": "pm-kisan", "name": "PM-KISAN", "aliases": ["PM Kisan Samman Nidhi"]},
+    {"id": "pmegp", "name": "Prime Minister's Employment Generation Programme", "aliases": ["PMEGP"]},
+]
+
+
+@pytest.fixture(scope="module")
+def index():
+    return SchemeNameIndex(SchemeCatalog(RECORDS))
+
+
+@pytest.mark.parametrize("text, scheme_id", [
+    ("PMJAY", "pmjay"),
+    ("pm-jay", "pmjay"),
+    ("PMEGP", "pmegp"),
+    ("PM Kisan", "pm-kisan"),
+])
+def test_exact_names_and_acronyms(index, text, scheme_id):
+    assert index.resolve(text) == scheme_id
+
+
+@pytest.mark.parametrize("text", [
+    # One letter from PMJAY, but a different scheme
+    "PMAY",
+    "PMEGY",
+    "pmay",
+    # Longer, but written as an acronym
+    "PMKISANN",
+])
+def test_unknown_short_keys_and_acronyms_need_an_exact_match(index, text):
+    assert index.resolve(text) is None
+
+
+@pytest.mark.parametrize("text, scheme_id", [
+    ("pm kisan saman nidhi", "pm-kisan"),
+    ("Pradhan Mantri Jan Aarogya Yojna", "pmjay"),
+    ("details of pm kisan samman nidhi 2024", "pm-kisan"),
+])
+def test_long_misspellings_still_resolve(index, text, scheme_id):
+    assert index.resolve(text) == scheme_id
+
+
+def test_empty_input(index):
+    assert index.resolve("") is None
+    assert index.resolve("  --  ") is None
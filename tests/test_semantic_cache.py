@@ -0,0 +1,53 @@
+import time
+
+from common.semantic_cache import SemanticCache
+
+
+def filled(**kwargs):
+    cache = SemanticCache(**kwargs)
+    cache.set("hi:low", "How can I save money for my daughter's education?", "education answer")
+    cache.set("hi:low", "What loans are available to start a dairy farm?", "dairy answer")
+    return cache
+
+
+def test_paraphrases_hit_and_unrelated_questions_miss():
+    cache = filled()
+    assert cache.get("hi:low", "how do I save for my daughters education") == "education answer"
+    assert cache.get("hi:low", "Which loans can I get for starting a dairy farm?") == "dairy answer"
+    assert cache.get("hi:low", "How do I insure my crops against floods?") is None
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (2, 1)
+
+
+def test_the_threshold_decides_how_close_a_match_must_be():
+    strict = filled(threshold=0.99)
+    assert strict.get("hi:low", "how do I save for my daughters education") is None
+    assert strict.get("hi:low", "How can I save money for my daughter's education?") == "education answer"
+
+
+def test_partitions_never_share_answers():
+    cache = filled()
+    assert cache.get("en:high", "How can I save money for my daughter's education?") is None
+
+
+def test_expired_answers_are_dropped():
+    cache = filled(ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get("hi:low", "How can I save money for my daughter's education?") is None
+    assert cache.stats()["entries"] == 1
+
+
+def test_questions_without_content_words_are_not_stored():
+    cache = SemanticCache()
+    cache.set("p", "what should I do?", "anything")
+    assert cache.stats()["entries"] == 0
+
+
+def test_the_least_recently_used_partition_is_evicted_first():
+    cache = SemanticCache(max_entries=2)
+    cache.set("old", "How do I open a savings account?", "old answer")
+    cache.set("new", "How do I open a savings account?", "new answer")
+    cache.get("new", "How do I open a savings account?")
+    cache.set("new", "Which crops need the least water?", "crop answer")
+    assert cache.get("old", "How do I open a savings account?") is None
+    assert cache.get("new", "How do I open a savings account?") == "new answer"
+    assert cache.stats()["partitions"] == 1
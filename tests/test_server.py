@@ -0,0 +1,33 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# Run in a fresh interpreter, so the import-time checks are not affected by other tests
+CHECK = textwrap.dedent("""
+    import sys
+    sys.path.insert(0, {root!r})
+    import server
+
+    # Heavy dependencies are left for the first request that needs them
+    assert type(sys.modules["numpy"]).__name__ == "_LazyModule"
+    assert "google.generativeai" not in sys.modules
+
+    from fastapi.testclient import TestClient
+    client = TestClient(server.app)
+    assert client.get("/healthz").json() == {{"status": "ok"}}
+    assert "Dairy Farming" in client.get("/fy/api/business-types").json()["business_types"]
+    assert client.get("/gov/api/scheme-suggest", params={{"q": "kisan"}}).status_code == 200
+    assert client.get("/basic/").status_code == 200
+    assert client.get("/").status_code == 200
+""")
+
+
+def test_one_service_mounts_every_app_and_starts_lazily(tmp_path):
+    env = dict(os.environ, LLM_BACKEND="fake", LLM_CACHE_PATH="", TM_PATH="",
+               PRECOMPUTED_ADVICE_PATH=str(tmp_path / "missing.db"))
+    result = subprocess.run([sys.executable, "-c", CHECK.format(root=os.path.abspath(ROOT))],
+                            cwd=tmp_path, env=env, capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
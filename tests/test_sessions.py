@@ -0,0 +1,89 @@
+import os
+import time
+
+import pytest
+
+from common import sessions
+from common.sessions import MAX_SUMMARY_CHARS, MAX_TURN_CHARS, Session, SessionStore, estimate_tokens
+
+
+def test_compaction_folds_old_turns_into_the_summary():
+    store = SessionStore(token_budget=120, spill_dir="")
+    session = store.create("- Location: Puri")
+    for i in range(6):
+        store.record(session, f"question {i}", f"answer {i} " + "x" * 150)
+    # Old turns move to the summary, which has its own cap
+    assert len(session.turns) < 6
+    assert len(session.summary) <= MAX_SUMMARY_CHARS
+    assert session.turns[-1][0] == "question 5"
+    assert "Asked: question 0" in session.summary
+
+
+def test_the_latest_turn_is_kept_even_over_budget():
+    store = SessionStore(token_budget=10, spill_dir="")
+    session = store.create()
+    store.record(session, "q", "a" * 5000)
+    assert len(session.turns) == 1
+    assert len(session.turns[0][1]) == MAX_TURN_CHARS
+
+
+def test_follow_up_prompt_carries_context_summary_and_turns():
+    session = Session("0" * 32, context="- Location: Puri", summary="Asked: loans")
+    session.turns.append(("How much?", "About half."))
+    prompt = session.follow_up_prompt("And the EMI?")
+    assert "- Location: Puri" in prompt and "Asked: loans" in prompt and "Q: How much?" in prompt
+    assert prompt.rstrip().endswith("do not repeat it.")
+    assert estimate_tokens(prompt) > 0
+
+
+def test_unknown_and_malformed_ids():
+    store = SessionStore(spill_dir="")
+    assert store.get(None) is None
+    assert store.get("../../etc/passwd") is None
+    assert store.get("f" * 32) is None
+
+
+def test_capacity_pressure_spills_and_the_session_comes_back(tmp_path):
+    store = SessionStore(max_sessions=1, spill_dir=str(tmp_path))
+    first = store.create("first", language="Hindi")
+    store.record(first, "q", "a")
+    store.create("second")
+    assert os.path.exists(tmp_path / f"{first.id}.json")
+    restored = store.get(first.id)
+    assert (restored.context, restored.language, restored.turns) == ("first", "Hindi", [("q", "a")])
+    assert not os.path.exists(tmp_path / f"{first.id}.json")
+
+
+def test_idle_sessions_expire_instead_of_spilling(tmp_path):
+    store = SessionStore(idle_seconds=60, spill_dir=str(tmp_path))
+    session = store.create("idle")
+    session.last_used -= 120
+    store.create("fresh")
+    assert store.get(session.id) is None
+    assert os.listdir(tmp_path) == []
+    assert store.stats()["expired"] == 1
+
+
+def test_expired_spill_files_are_deleted(tmp_path, monkeypatch):
+    monkeypatch.setattr(sessions, "SESSION_SPILL_SWEEP_SECONDS", 0)
+    store = SessionStore(max_sessions=1, idle_seconds=60, spill_dir=str(tmp_path))
+    spilled = store.create("spilled")
+    store.create("pushes it out")
+    path = tmp_path / f"{spilled.id}.json"
+    assert path.exists()
+    old = time.time() - 120
+    os.utime(path, (old, old))
+    store.create("triggers a sweep")
+    assert not path.exists()
+
+
+def test_a_spilled_session_past_its_idle_time_is_not_restored(tmp_path):
+    store = SessionStore(max_sessions=1, idle_seconds=60, spill_dir=str(tmp_path))
+    spilled = store.create("spilled")
+    spilled.last_used = time.time() - 30
+    store.create("pushes it out")
+    # Read back after it has been idle too long, before a sweep removed the file
+    data_path = tmp_path / f"{spilled.id}.json"
+    text = data_path.read_text(encoding="utf-8").replace(str(spilled.last_used), str(time.time() - 120))
+    data_path.write_text(text, encoding="utf-8")
+    assert store.get(spilled.id) is None
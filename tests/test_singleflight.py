@@ -0,0 +1,103 @@
+import asyncio
+import threading
+
+import pytest
+
+from common.singleflight import AsyncSingleFlight, SingleFlight
+
+
+def test_threads_share_one_call():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        started.set()
+        release.wait(2)
+        return "answer"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("k", fn)))
+    leader.start()
+    started.wait(2)
+    follower = threading.Thread(target=lambda: results.append(flight.do("k", fn)))
+    follower.start()
+    while flight.coalesced == 0:
+        pass
+    release.set()
+    leader.join()
+    follower.join()
+    assert results == ["answer", "answer"]
+    assert len(calls) == 1
+
+
+def test_thread_errors_reach_every_caller():
+    flight = SingleFlight()
+
+    def fn():
+        raise ValueError("upstream")
+
+    with pytest.raises(ValueError):
+        flight.do("k", fn)
+
+
+class Upstream:
+    def __init__(self):
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        return f"answer {self.calls}"
+
+
+def test_async_callers_share_one_call():
+    async def run():
+        flight = AsyncSingleFlight()
+        upstream = Upstream()
+        first = asyncio.ensure_future(flight.do("k", upstream))
+        second = asyncio.ensure_future(flight.do("k", upstream))
+        await asyncio.sleep(0)
+        upstream.release.set()
+        assert await asyncio.gather(first, second) == ["answer 1", "answer 1"]
+        assert upstream.calls == 1
+        assert flight.coalesced == 1
+
+    asyncio.run(run())
+
+
+def test_one_cancelled_caller_leaves_the_shared_call_running():
+    async def run():
+        flight = AsyncSingleFlight()
+        upstream = Upstream()
+        first = asyncio.ensure_future(flight.do("k", upstream))
+        second = asyncio.ensure_future(flight.do("k", upstream))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        upstream.release.set()
+        assert await second == "answer 1"
+        assert first.cancelled()
+
+    asyncio.run(run())
+
+
+def test_caller_after_the_last_cancel_starts_a_new_call():
+    async def run():
+        flight = AsyncSingleFlight()
+        upstream = Upstream()
+        first = asyncio.ensure_future(flight.do("k", upstream))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        # The shared task has been cancelled but has not finished yet
+        second = asyncio.ensure_future(flight.do("k", upstream))
+        await asyncio.sleep(0)
+        upstream.release.set()
+        assert await second == "answer 2"
+        assert upstream.calls == 2
+
+    asyncio.run(run())
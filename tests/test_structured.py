@@ -0,0 +1,76 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from common.routing import FAST, PRO, choose_tier, routing_scope
+from common.schemas import RiskManagement, Strategy
+from common.structured import (
+    StructuredOutputError, generate_structured, iter_structured_sections, parse_structured, response_schema,
+)
+
+RISK = {"text": "Weather and prices", "strategies": [{"point": "Insure", "details": "Take PMFBY cover"}]}
+
+
+class ScriptedModel:
+    """Replies with the given texts in turn, noting the tier each call would be routed to"""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.tiers = []
+        self.prompts = []
+
+    def generate_content(self, prompt, **kwargs):
+        self.tiers.append(choose_tier(prompt, kwargs.get("generation_config"))[0])
+        self.prompts.append(prompt)
+        return SimpleNamespace(text=self.replies.pop(0))
+
+
+def test_response_schema_inlines_references_and_drops_titles():
+    schema = response_schema(RiskManagement)
+    strategy = schema["properties"]["strategies"]["items"]
+    assert set(strategy["properties"]) == set(Strategy.model_fields)
+    assert "$ref" not in json.dumps(schema)
+    assert "title" not in json.dumps(schema)
+
+
+def test_parse_accepts_valid_output_and_coerces_numbers():
+    risk = parse_structured(json.dumps(RISK), RiskManagement)
+    assert risk.strategies[0].point == "Insure"
+    text = dict(RISK, strategies=[{"point": 1, "details": 2, "extra": "dropped"}])
+    assert parse_structured(json.dumps(text), RiskManagement).strategies[0].model_dump() == {"point": "1", "details": "2"}
+
+
+@pytest.mark.parametrize("text", [
+    "Here you go:\n```json\n" + json.dumps(RISK) + "\n```",
+    json.dumps({"riskManagement": RISK}),
+])
+def test_parse_repairs_fences_prose_and_wrappers(text):
+    assert parse_structured(text, RiskManagement, wrapper="riskManagement").text == RISK["text"]
+
+
+def test_parse_rejects_output_that_leaves_the_schema():
+    with pytest.raises(StructuredOutputError):
+        parse_structured(json.dumps({"text": "no strategies"}), RiskManagement)
+
+
+def test_invalid_fast_output_is_retried_once_on_the_pro_tier():
+    model = ScriptedModel("not json", json.dumps(RISK))
+    with routing_scope(tier=FAST):
+        assert generate_structured(model, "Risks?", RiskManagement).text == RISK["text"]
+    assert model.tiers == [FAST, PRO]
+    assert "could not be used" in model.prompts[1]
+
+    model = ScriptedModel("not json", "still not json")
+    with pytest.raises(StructuredOutputError):
+        generate_structured(model, "Risks?", RiskManagement, retries=1)
+
+
+def test_streamed_sections_are_validated_as_they_close():
+    document = json.dumps({"financialAdvice": {"riskManagement": RISK, "unknown": {}}})
+    chunks = [document[i:i + 7] for i in range(0, len(document), 7)]
+    sections = iter_structured_sections(chunks, "financialAdvice", {"riskManagement": RiskManagement})
+    name, risk = next(sections)
+    assert (name, risk.strategies[0].details) == ("riskManagement", "Take PMFBY cover")
+    with pytest.raises(StructuredOutputError):
+        next(sections)
@@ -0,0 +1,91 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from common.response_cache import ResponseCache
+from common.structured import StructuredOutputError
+from common.translation import Translator
+
+
+def segments_in(prompt):
+    return json.loads(prompt[prompt.rindex("\n\n") + 2:].split("\n\nYour previous reply")[0])
+
+
+class TaggingModel:
+    """Translates by tagging each segment, remembering what it was asked"""
+
+    def __init__(self, drop=False):
+        self.asked = []
+        self.drop = drop
+
+    def reply(self, prompt):
+        segments = segments_in(prompt)
+        self.asked.append(segments)
+        translations = [f"[hi] {segment}" for segment in segments]
+        return json.dumps({"translations": translations[:-1] if self.drop else translations})
+
+    def generate_content(self, prompt, **kwargs):
+        return SimpleNamespace(text=self.reply(prompt))
+
+
+class AsyncTaggingLLM(TaggingModel):
+    async def generate(self, prompt, **kwargs):
+        return self.reply(prompt)
+
+
+def translator(model, **kwargs):
+    return Translator(model, memory=ResponseCache(), **kwargs)
+
+
+def test_english_needs_no_model_call():
+    model = TaggingModel()
+    assert translator(model).translate_text("Save every month", "English") == "Save every month"
+    assert model.asked == []
+
+
+def test_markdown_structure_urls_and_numbers_are_kept():
+    model = TaggingModel()
+    text = "## Savings\n- Save **₹500** a month\n  1. Open an account\nhttps://example.org\n42\n"
+    assert translator(model).translate_text(text, "Hindi") == (
+        "## [hi] Savings\n- [hi] Save **₹500** a month\n  1. [hi] Open an account\nhttps://example.org\n42\n"
+    )
+    assert model.asked == [["Savings", "Save **₹500** a month", "Open an account"]]
+
+
+def test_the_memory_only_sends_new_segments():
+    model = TaggingModel()
+    tm = translator(model)
+    tm.translate_text("Open an account\nSave every month", "Hindi")
+    assert tm.translate_text("Save every month\nJoin a self-help group", "Hindi") == (
+        "[hi] Save every month\n[hi] Join a self-help group"
+    )
+    assert model.asked == [["Open an account", "Save every month"], ["Join a self-help group"]]
+    tm.translate_text("Save every month", "Odia")
+    assert model.asked[-1] == ["Save every month"]
+
+
+def test_documents_keep_links_and_non_strings():
+    model = TaggingModel()
+    document = {"text": "Learn more", "resources": [{"name": "RBI", "link": "https://rbi.org.in"}], "count": 2}
+    assert translator(model).translate_document(document, "Hindi") == {
+        "text": "[hi] Learn more", "resources": [{"name": "[hi] RBI", "link": "https://rbi.org.in"}], "count": 2,
+    }
+
+
+def test_a_short_reply_is_an_error_and_is_not_remembered():
+    model = TaggingModel(drop=True)
+    tm = translator(model)
+    with pytest.raises(StructuredOutputError):
+        tm.translate_text("Open an account\nSave every month", "Hindi")
+    assert tm.memory.stats()["entries"] == 0
+
+
+def test_async_translation_shares_the_memory():
+    llm = AsyncTaggingLLM()
+    tm = translator(TaggingModel(), llm=llm)
+    tm.translate_text("Open an account", "Hindi")
+    result = asyncio.run(tm.translate_text_async("Open an account\nSave every month", "Hindi"))
+    assert result == "[hi] Open an account\n[hi] Save every month"
+    assert llm.asked == [["Save every month"]]